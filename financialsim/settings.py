@@ -44,6 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.MetricsMiddleware',
+    'main.query_budget.QueryBudgetMiddleware',
+    'main.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +86,115 @@ DATABASES = {
     }
 }
 
+# Blue/green Route storage (operational_functions.route_db)
+# When enabled, Route lives in its own SQLite file, reached through the PATH
+# symlink; regenerate_all_routes builds each full regeneration into a new
+# file under GENERATIONS_DIR and swaps the symlink when it is complete.
+# PARTITION_BY_REGION splits it into one database per origin region
+# (operational_functions.route_partitions, manage.py route_partitions).
+
+ROUTE_DATABASE = {
+    'ENABLED': False,
+    'PATH': BASE_DIR / 'routes.sqlite3',
+    'GENERATIONS_DIR': BASE_DIR / 'route_generations',
+    'KEEP': 2,
+    'PARTITION_BY_REGION': False,
+    'PARTITIONS_DIR': BASE_DIR / 'route_partitions',
+    'PARTITION_WORKERS': 2,
+}
+
+if ROUTE_DATABASE['ENABLED']:
+    DATABASES['routes'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ROUTE_DATABASE['PATH'],
+    }
+    DATABASE_ROUTERS = ['main.db_routers.RouteRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# File-based so every worker process shares cached API responses and the
+# data version counters in main.versioning.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.django_cache',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+
+# Async API views
+# Serve the read-heavy JSON endpoints (route records, airport lists, airport
+# lookup) from main.async_views. Turn on when running under an ASGI server
+# (financialsim.asgi); under WSGI each async view would need its own event loop.
+# ROUTE_COMPUTE_WORKERS bounds concurrent on-the-fly route computations.
+
+ASYNC_API_VIEWS = False
+ROUTE_COMPUTE_WORKERS = 2
+
+# Lock files for operational_functions.single_flight. Must be shared by every
+# worker process (local disk; flock is unreliable on network filesystems).
+
+SINGLE_FLIGHT_LOCK_DIR = BASE_DIR / '.locks'
+
+# Versioned snapshots of the route pipeline's airports/aircraft/providers
+# (operational_functions.world_snapshot), read by load_all_data(use_snapshot=True).
+
+WORLD_SNAPSHOT_DIR = BASE_DIR / '.snapshots'
+
+
+# Versioned .npy matrix sets (distances, cheapest route per leg) memory-mapped
+# by every worker process (operational_functions.shared_matrices).
+
+SHARED_MATRICES_DIR = BASE_DIR / '.matrices'
+
+
+# Query budgets
+# Enforced by main.query_budget.QueryBudgetMiddleware when DEBUG is on (or
+# QUERY_BUDGET_ENABLED is set) and by assert_query_budget() in tests.
+# Max queries per request, by URL name, not counting INSERTs and savepoints.
+# Views that regenerate routes on POST include the Layer 1 loads in their
+# budget.
+
+QUERY_BUDGETS = {
+    'home': 5,
+    'mode_tab': 14,
+    'edit_charter_provider': 15,
+    'add_aircraft': 12,
+    'edit_aircraft': 12,
+    'add_airport': 12,
+    'edit_airport': 12,
+    'delete_aircraft': 10,
+    'delete_airport': 10,
+    'delete_charter_provider': 10,
+    'route_records_api': 10,
+    'airport_list_api': 2,
+    'airports_by_country': 3,
+    'airport_lookup': 1,
+    'metrics': 2,
+    'route_export': 2,
+    'route_query_api': 8,
+    'scenario_api': 11,
+}
+QUERY_BUDGET_N_PLUS_ONE_THRESHOLD = 5
+
+
+# Tracing (operational_functions.tracing)
+# Fraction of requests traced; requests with an "X-Trace: 1" header always
+# are. Recent traces are served at /debug/traces/ while DEBUG is on; set
+# JSONL_PATH to also append them to a file.
+
+TRACING = {
+    'SAMPLE_RATE': 0.01,
+    'BUFFER_SIZE': 200,
+    'JSONL_PATH': None,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -1,23 +1,48 @@
 from django.http import JsonResponse
 from operational_functions.airport_utils import get_airport_coordinates_and_altitude
+from .response_cache import cache_json_response
 
+AIRPORT_LOOKUP_TIMEOUT = 24 * 60 * 60
+
+
+def _airport_lookup_cache_key(request):
+    return (request.GET.get('iata_code', '').strip().upper(),)
+
+
+def _airports_by_country_cache_key(request):
+    return (request.GET.get('country_id'),)
+
+
+def airport_lookup_payload(result):
+    lat, lon, alt, name, city, country = result
+    return {
+        'name': name,
+        'city': city,
+        'country': country,
+        'latitude': lat,
+        'longitude': lon,
+        'altitude_ft': alt
+    }
+
+
+# Lookups come from OpenFlights rather than our tables, so they are not
+# keyed on the data version.
+@cache_json_response(
+    'airport_lookup',
+    key_func=_airport_lookup_cache_key,
+    versioned=False,
+    timeout=AIRPORT_LOOKUP_TIMEOUT,
+)
 def airport_lookup(request):
     iata = request.GET.get('iata_code', '').strip().upper()
     if not iata or len(iata) != 3:
         return JsonResponse({'error': 'Invalid IATA code'}, status=400)
     result = get_airport_coordinates_and_altitude(iata)
     if result:
-        lat, lon, alt, name, city, country = result
-        return JsonResponse({
-            'name': name,
-            'city': city,
-            'country': country,
-            'latitude': lat,
-            'longitude': lon,
-            'altitude_ft': alt
-        })
+        return JsonResponse(airport_lookup_payload(result))
     return JsonResponse({'error': 'Airport not found'}, status=404)
 
+@cache_json_response('airports_by_country', key_func=_airports_by_country_cache_key)
 def airports_by_country(request):
     country_id = request.GET.get('country_id')
     if not country_id:
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class MainConfig(AppConfig):
     name = 'main'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from operational_functions.route_db import prepare_connection
+
+        from . import signals  # noqa: F401
+
+        connection_created.connect(prepare_connection, dispatch_uid='route_db.prepare_connection')
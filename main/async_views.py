@@ -0,0 +1,162 @@
+"""
+Async (ASGI) variants of the read-heavy JSON endpoints.
+
+Served in place of the sync views when settings.ASYNC_API_VIEWS is set (see
+main.urls); responses are identical. ORM reads use the async ORM. Route
+computation for a pair with no routes is CPU-bound, so it runs in a small
+dedicated thread pool (settings.ROUTE_COMPUTE_WORKERS): at most that many
+computations run at once, and the event loop keeps serving lookups meanwhile.
+Concurrent requests for the same pair await a single computation, which goes
+through routes_utils.ensure_pair_routes for de-duplication across processes.
+"""
+
+import asyncio
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from operational_functions.airport_utils import get_airport_coordinates_and_altitude
+from operational_functions.routes_utils import ensure_pair_routes
+from operational_functions.tracing import span
+from .airport_api import (
+	AIRPORT_LOOKUP_TIMEOUT,
+	_airport_lookup_cache_key,
+	_airports_by_country_cache_key,
+	airport_lookup_payload,
+)
+from .models import Airport, Country, Route
+from .response_cache import cache_json_response
+from .views import _route_record, _route_records_cache_key
+
+_executor = None
+_executor_lock = threading.Lock()
+# (event loop, departure, arrival) -> task computing that pair
+_pair_tasks = {}
+
+
+def route_executor():
+	"""Process-wide pool that runs on-the-fly route computations."""
+	global _executor
+	with _executor_lock:
+		if _executor is None:
+			_executor = ThreadPoolExecutor(
+				max_workers=getattr(settings, 'ROUTE_COMPUTE_WORKERS', 2),
+				thread_name_prefix='route-compute',
+			)
+	return _executor
+
+
+def _compute_routes(departure, arrival):
+	# Pool threads keep their DB connection between jobs; drop it if it has
+	# gone stale, as the request cycle would for a sync view.
+	close_old_connections()
+	try:
+		return ensure_pair_routes(departure, arrival)
+	finally:
+		close_old_connections()
+
+
+async def compute_routes_async(departure, arrival):
+	"""
+	Compute routes for a pair in the route executor without blocking the event loop.
+
+	Requests for a pair already being computed await the same task instead of
+	taking another executor thread.
+	"""
+	loop = asyncio.get_running_loop()
+	key = (loop, departure, arrival)
+	task = _pair_tasks.get(key)
+	if task is None:
+		# Copy the context so spans opened by the computation join the
+		# trace of the request that started it.
+		context = contextvars.copy_context()
+		task = asyncio.ensure_future(loop.run_in_executor(
+			route_executor(), partial(context.run, _compute_routes, departure, arrival),
+		))
+		_pair_tasks[key] = task
+		task.add_done_callback(lambda _: _pair_tasks.pop(key, None))
+	# Shielded so one client disconnecting does not cancel the others' result
+	return await asyncio.shield(task)
+
+
+@csrf_exempt
+@cache_json_response('route_records_api', key_func=_route_records_cache_key)
+async def route_records_api(request):
+	"""API endpoint to fetch all Route records for a given departure and arrival airport."""
+	if request.method != 'POST':
+		return JsonResponse({'error': 'POST required'}, status=405)
+	try:
+		data = json.loads(request.body.decode('utf-8'))
+		departure = data.get('departure')
+		arrival = data.get('arrival')
+		if not departure or not arrival:
+			return JsonResponse({'error': 'Both departure and arrival required'}, status=400)
+		leg = f"{departure} - {arrival}"
+		# for_leg may load the partition map or create a partition: sync only
+		routes = await sync_to_async(
+			lambda: Route.objects.for_leg(leg).select_related('aircraft_type', 'provider'),
+		)()
+		with span('orm.route_exists', leg=leg):
+			found = await routes.aexists()
+		if not found:
+			await compute_routes_async(departure, arrival)
+		with span('orm.fetch_routes') as fetch_span:
+			rows = [r async for r in routes.all()]
+			fetch_span.set_attribute('rows', len(rows))
+		with span('serialize'):
+			results = [_route_record(r) for r in rows]
+		with span('json_encode'):
+			return JsonResponse({'routes': results})
+	except Exception as e:
+		return JsonResponse({'error': str(e)}, status=500)
+
+
+@cache_json_response('airport_list_api')
+async def airport_list_api(request):
+	data = [
+		{'code': a.iata_code, 'name': a.name}
+		async for a in Airport.objects.all().order_by('iata_code')
+	]
+	return JsonResponse({'airports': data})
+
+
+@cache_json_response('airports_by_country', key_func=_airports_by_country_cache_key)
+async def airports_by_country(request):
+	country_id = request.GET.get('country_id')
+	if not country_id:
+		return JsonResponse({'airports': []})
+	try:
+		country_obj = await Country.objects.aget(pk=country_id)
+	except Country.DoesNotExist:
+		return JsonResponse({'airports': []})
+	data = [
+		{'id': a.pk, 'iata_code': a.iata_code}
+		async for a in Airport.objects.filter(country=country_obj.name).order_by('iata_code')
+	]
+	return JsonResponse({'airports': data})
+
+
+@cache_json_response(
+	'airport_lookup',
+	key_func=_airport_lookup_cache_key,
+	versioned=False,
+	timeout=AIRPORT_LOOKUP_TIMEOUT,
+)
+async def airport_lookup(request):
+	iata = request.GET.get('iata_code', '').strip().upper()
+	if not iata or len(iata) != 3:
+		return JsonResponse({'error': 'Invalid IATA code'}, status=400)
+	# The OpenFlights download is blocking network I/O; keep it off the loop
+	# without tying up the thread the async ORM uses.
+	result = await sync_to_async(get_airport_coordinates_and_altitude, thread_sensitive=False)(iata)
+	if result:
+		return JsonResponse(airport_lookup_payload(result))
+	return JsonResponse({'error': 'Airport not found'}, status=404)
@@ -0,0 +1,62 @@
+"""
+Shared choice sets for model-backed form fields.
+
+Rendering a ModelChoiceField iterates its queryset on every request. The
+choice sets kept here are built once per process, shared across requests and
+rebuilt only when the data version of the field's model changes.
+"""
+
+from django import forms
+
+from .versioning import get_version
+
+# key -> (version, choices)
+_choice_sets = {}
+
+
+def cached_choices(key, model, build):
+	"""
+	Return the choice list stored under ``key``, rebuilding it with ``build()``
+	when the version of ``model`` has moved on since it was cached.
+	"""
+	version = get_version(model._meta.model_name)
+	entry = _choice_sets.get(key)
+	if entry is None or entry[0] != version:
+		entry = (version, tuple(build()))
+		_choice_sets[key] = entry
+	return list(entry[1])
+
+
+def clear_choice_sets():
+	_choice_sets.clear()
+
+
+class CachedChoicesMixin:
+	"""
+	Form mixin that renders every ModelChoiceField from the shared choice sets.
+
+	The field querysets are left in place for validation, which only looks up
+	the submitted primary key. Labels default to ``str(obj)``; override them
+	per field with ``cached_choice_labels``.
+	"""
+	cached_choice_labels = {}
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		for name, field in self.fields.items():
+			if isinstance(field, forms.ModelMultipleChoiceField):
+				continue
+			if isinstance(field, forms.ModelChoiceField) and field.queryset is not None:
+				field.choices = self._cached_field_choices(name, field)
+
+	def _cached_field_choices(self, name, field):
+		label = self.cached_choice_labels.get(name, str)
+		queryset = field.queryset
+		choices = cached_choices(
+			f'{type(self).__module__}.{type(self).__name__}.{name}',
+			queryset.model,
+			lambda: [(obj.pk, label(obj)) for obj in queryset],
+		)
+		if field.empty_label is not None:
+			choices.insert(0, ('', field.empty_label))
+		return choices
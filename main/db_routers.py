@@ -0,0 +1,49 @@
+from operational_functions import route_partitions
+from operational_functions.route_db import ROUTES_ALIAS, enabled, ensure_route_database
+
+from .models import Route
+
+
+class RouteRouter:
+	"""
+	Send Route to the blue/green 'routes' database (operational_functions.route_db)
+	when ROUTE_DATABASE['ENABLED'] is set; everything else stays on default.
+
+	With region partitions, reads go to the 'routes' union view and writes of
+	a single route to its origin's partition (leg queries pick their partition
+	in main.models.RouteQuerySet).
+	"""
+
+	def _route_db(self, model):
+		if model is Route and enabled():
+			if route_partitions.enabled():
+				if not route_partitions.partitions_ensured():
+					route_partitions.ensure_partitions()
+			else:
+				ensure_route_database()
+			return ROUTES_ALIAS
+		return None
+
+	def db_for_read(self, model, **hints):
+		return self._route_db(model)
+
+	def db_for_write(self, model, **hints):
+		instance = hints.get('instance')
+		if model is Route and isinstance(instance, Route) and instance.leg:
+			alias = route_partitions.alias_for_leg(instance.leg)
+			if alias is not None:
+				return alias
+		return self._route_db(model)
+
+	def allow_relation(self, obj1, obj2, **hints):
+		# Route's foreign keys point into the catalog attached to every
+		# routes connection.
+		if isinstance(obj1, Route) or isinstance(obj2, Route):
+			return True
+		return None
+
+	def allow_migrate(self, db, app_label, model_name=None, **hints):
+		# Route databases are created from the model by route_db, not by migrations.
+		if db == ROUTES_ALIAS or db.startswith(ROUTES_ALIAS + '_'):
+			return False
+		return None
@@ -1,17 +1,19 @@
 from .models import CharterProvider
 from django import forms
-from .models import CharterProvider, Aircraft, Airport
+from .choices import CachedChoicesMixin
+from .models import CharterProvider, Aircraft, Airport, Country
 
-class CharterProviderForm(forms.ModelForm):
+class CharterProviderForm(CachedChoicesMixin, forms.ModelForm):
     country = forms.ModelChoiceField(
-        queryset=None,
+        queryset=Country.objects.order_by('name'),
         widget=forms.Select(attrs={'class': 'aircraft-form-control'}),
         label='Country',
         required=True
     )
 
     main_base = forms.ModelChoiceField(
-        queryset=None,
+        queryset=Airport.objects.order_by('iata_code'),
+        empty_label=None,
         widget=forms.Select(attrs={'class': 'aircraft-form-control', 'id': 'id_main_base'}),
         label='Main Base',
         required=True
@@ -24,16 +26,12 @@ class CharterProviderForm(forms.ModelForm):
         required=True
     )
 
+    cached_choice_labels = {'main_base': lambda airport: airport.iata_code}
+
     def __init__(self, *args, **kwargs):
-        from .models import Country, Airport
         super().__init__(*args, **kwargs)
-        self.fields['country'].queryset = Country.objects.all().order_by('name')
-        airports = list(Airport.objects.all().order_by('iata_code'))
-        self.fields['main_base'].queryset = Airport.objects.all().order_by('iata_code')
         # Add 'Add Base' option at the end
-        choices = [(a.pk, a.iata_code) for a in airports]
-        choices.append(('add', 'Add Base'))
-        self.fields['main_base'].choices = choices
+        self.fields['main_base'].choices = self.fields['main_base'].choices + [('add', 'Add Base')]
 
     class Meta:
         model = CharterProvider
@@ -49,7 +47,7 @@ from django import forms
 from django import forms
 from .models import Aircraft, Airport
 
-class AircraftForm(forms.ModelForm):
+class AircraftForm(CachedChoicesMixin, forms.ModelForm):
     class Meta:
         model = Aircraft
         fields = [
@@ -71,7 +69,7 @@ class AircraftForm(forms.ModelForm):
         ]
         widgets = {field: forms.TextInput(attrs={'class': 'aircraft-form-control'}) for field in fields}
 
-class AirportForm(forms.ModelForm):
+class AirportForm(CachedChoicesMixin, forms.ModelForm):
     class Meta:
         model = Airport
         fields = [
@@ -0,0 +1,66 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from operational_functions.benchmarks import (
+    DEFAULT_SCALES,
+    compare_results,
+    format_results,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the route engine and route records API on synthetic worlds of '
+        'several sizes and store the results as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default=','.join(str(s) for s in DEFAULT_SCALES),
+                            help='Comma-separated airport counts (default: %(default)s).')
+        parser.add_argument('--aircraft', type=int, default=6, help='Synthetic aircraft count.')
+        parser.add_argument('--providers', type=int, default=6, help='Synthetic provider count.')
+        parser.add_argument('--seed', type=int, default=24, help='Synthetic world seed.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per in-memory layer.')
+        parser.add_argument('--max-insert-rows', type=int, default=200_000,
+                            help='Cap on routes converted and inserted per scale.')
+        parser.add_argument('--api-requests', type=int, default=50,
+                            help='Requests per route records API scenario.')
+        parser.add_argument('--output', help='Results file (default: benchmarks/<commit or timestamp>.json).')
+        parser.add_argument('--compare', metavar='BASELINE', help='Results file to compare against.')
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options['scales'].split(',') if s.strip()]
+        except ValueError:
+            raise CommandError('--scales must be a comma-separated list of integers')
+
+        results = run_benchmarks(
+            scales,
+            progress=self.stdout.write,
+            n_aircraft=options['aircraft'],
+            n_providers=options['providers'],
+            seed=options['seed'],
+            repeat=options['repeat'],
+            max_insert_rows=options['max_insert_rows'],
+            api_requests=options['api_requests'],
+        )
+        for line in format_results(results):
+            self.stdout.write(line)
+
+        output = options['output']
+        if not output:
+            label = results['meta']['commit'] or results['meta']['timestamp'].replace(':', '-')
+            output = os.path.join('benchmarks', f'{label}.json')
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as fh:
+            json.dump(results, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output}'))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as fh:
+                baseline = json.load(fh)
+            for line in compare_results(baseline, results):
+                self.stdout.write(line)
@@ -1,18 +1,29 @@
 from django.core.management.base import BaseCommand
-from main.models import Route
+
+from operational_functions.route_purge import purge_orphan_routes, truncate_routes
+
 
 class Command(BaseCommand):
-    help = 'Delete all Route records.'
+    help = (
+        'Delete all Route records with set-based SQL (no rows are loaded) and reset the '
+        'Route ID sequence, or with --orphans only routes whose airport, aircraft or '
+        'provider no longer exists.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orphans', action='store_true',
+                            help='Only delete orphaned routes (e.g. of deleted airports).')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM afterwards to return the freed space to the filesystem '
+                                 '(with blue/green storage: remove the previous generation files).')
+        parser.add_argument('--keep-sequence', action='store_true',
+                            help='Do not reset the Route ID sequence.')
 
     def handle(self, *args, **options):
-        from django.db import connection
-        count, _ = Route.objects.all().delete()
-        # Reset the primary key sequence for Route
-        with connection.cursor() as cursor:
-            table_name = Route._meta.db_table
-            if connection.vendor == 'sqlite':
-                cursor.execute(f"DELETE FROM sqlite_sequence WHERE name='{table_name}'")
-            elif connection.vendor == 'postgresql':
-                cursor.execute(f"ALTER SEQUENCE {table_name}_id_seq RESTART WITH 1")
-            # Add other DBs as needed
-        self.stdout.write(self.style.SUCCESS(f'Deleted {count} Route records and reset Route ID sequence.'))
+        if options['orphans']:
+            count = purge_orphan_routes(vacuum_after=options['vacuum'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {count} orphaned Route records.'))
+            return
+        count = truncate_routes(vacuum_after=options['vacuum'], reset_sequence=not options['keep_sequence'])
+        reset = '' if options['keep_sequence'] else ' and reset Route ID sequence'
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} Route records{reset}.'))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operational_functions.route_export import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, stream_routes
+
+
+class Command(BaseCommand):
+    help = (
+        'Export the Route table, with airport, aircraft and provider labels, as CSV, '
+        'Parquet or Arrow IPC (the latter two need pyarrow). Streams in chunks, so memory '
+        'use does not grow with the table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file path, or '-' for stdout (CSV only).")
+        parser.add_argument('--format', dest='file_format', choices=list(EXPORT_FORMATS),
+                            help='Export format (default: from the output file extension, else csv).')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows fetched and encoded per chunk.')
+        parser.add_argument('--leg', help="Only export one leg, e.g. 'BOG - MIA'.")
+        parser.add_argument('--partition', metavar='REGION',
+                            help='Only export one region partition (partitioned route storage).')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['file_format'] or self._format_from_path(output)
+        if output == '-' and file_format != 'csv':
+            raise CommandError('Only CSV can be written to stdout')
+        try:
+            chunks = stream_routes(file_format, options['chunk_size'], options['leg'], options['partition'])
+        except (ImportError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk.decode('utf-8'), ending='')
+            return
+        written = 0
+        with open(output, 'wb') as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {written:,} bytes of {file_format} to {output}'))
+
+    @staticmethod
+    def _format_from_path(path):
+        for name, (_, extension) in EXPORT_FORMATS.items():
+            if path.endswith('.' + extension) or path.endswith('.' + name):
+                return name
+        return 'csv'
@@ -5,5 +5,6 @@ class Command(BaseCommand):
     help = 'Generate and populate all possible routes in the Route table.'
 
     def handle(self, *args, **options):
-        created = generate_routes_list()
-        self.stdout.write(self.style.SUCCESS(f'Successfully generated/updated {created} routes.'))
+        report = generate_routes_list()
+        self.stdout.write(report.format())
+        self.stdout.write(self.style.SUCCESS(f'Successfully generated/updated {report.routes_created} routes.'))
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from operational_functions.load_test import DEFAULT_MIX, LoadTest, build_plan, parse_mix
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive a local server with concurrent virtual users (Routes tab lookups, airport lists, '
+        'provider edits, on-the-fly misses) and report throughput and latency percentiles. '
+        'Provider edits write to the database; run against a copy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server. Omit to start one with runserver.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Virtual users.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Run time in seconds.')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests.')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                            help='Scenario weights (default: %(default)s).')
+        parser.add_argument('--seed', type=int, default=24)
+        parser.add_argument('--json', dest='json_path', help='Also write the summary to this JSON file.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        plan = build_plan(seed=options['seed'])
+        self.stdout.write(
+            f'Plan: {len(plan.routed_pairs)} routed pairs, {len(plan.unrouted_pairs)} unrouted pairs, '
+            f'{len(plan.provider_ids)} providers'
+        )
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            if not _wait_for_port(port, timeout=30):
+                server.terminate()
+                raise CommandError('Server did not start within 30 seconds')
+            base_url = f'http://127.0.0.1:{port}'
+            self.stdout.write(f'Started runserver on {base_url}')
+
+        try:
+            load_test = LoadTest(base_url, plan, mix, seed=options['seed'])
+            results = asyncio.run(load_test.run(options['concurrency'], options['duration'], options['requests']))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+        for line in results.format():
+            self.stdout.write(line)
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as fh:
+                json.dump({'mix': mix, 'concurrency': options['concurrency'], 'elapsed': results.elapsed,
+                           'scenarios': results.summary(), 'errors': results.errors}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json_path']}"))
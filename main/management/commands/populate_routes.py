@@ -18,8 +18,9 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('Routes table is not empty; skipping population.'))
             return
         before = Route.objects.count()
-        created = generate_routes_list()
+        report = generate_routes_list()
         after = Route.objects.count()
+        self.stdout.write(report.format())
         self.stdout.write(self.style.SUCCESS(
-            f'Routes populated. Operations: {created}. Total: {after}. Before: {before}.'
+            f'Routes populated. Operations: {report.routes_created}. Total: {after}. Before: {before}.'
         ))
@@ -0,0 +1,167 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.core.management.base import BaseCommand
+
+from operational_functions.routes_utils import (
+    create_route_objects,
+    generate_all_route_metrics,
+    load_all_data,
+    precompute_distances,
+    save_routes_bulk,
+)
+from operational_functions.route_purge import truncate_routes
+from operational_functions.run_report import RunReport
+from operational_functions.synthetic_world import synthetic_database
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread at a fixed interval and count each
+    distinct stack, for collapsed-stack (flamegraph.pl / speedscope) output.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f'{stack} {count}\n')
+
+
+class Command(BaseCommand):
+    help = (
+        'Profile route generation layer by layer under cProfile and tracemalloc, '
+        'optionally against a synthetic dataset.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, metavar='AIRPORTS',
+                            help='Run against a throwaway database with this many synthetic airports.')
+        parser.add_argument('--aircraft', type=int, default=6, help='Synthetic aircraft count.')
+        parser.add_argument('--providers', type=int, default=12, help='Synthetic provider count.')
+        parser.add_argument('--seed', type=int, default=24, help='Synthetic world seed.')
+        parser.add_argument('--regenerate', action='store_true',
+                            help='Delete all routes first and rebuild (regenerate_all_routes flow).')
+        parser.add_argument('--output-dir', default='profiles', help='Directory for the output files.')
+        parser.add_argument('--top', type=int, default=25, help='Rows in the hot-function table.')
+        parser.add_argument('--sort', default='cumulative', choices=['cumulative', 'tottime', 'ncalls'],
+                            help='Sort key for the hot-function table.')
+        parser.add_argument('--collapsed', action='store_true',
+                            help='Also write a collapsed-stack file for flamegraph tools.')
+        parser.add_argument('--snapshot', action='store_true',
+                            help='Load airports, aircraft and providers from the world snapshot.')
+
+    def handle(self, *args, **options):
+        os.makedirs(options['output_dir'], exist_ok=True)
+        with ExitStack() as stack:
+            if options['synthetic']:
+                world = stack.enter_context(synthetic_database(
+                    options['synthetic'], options['aircraft'], options['providers'], options['seed'],
+                ))
+                self.stdout.write(
+                    f'Synthetic world: {len(world.airports)} airports, {len(world.aircraft)} aircraft, '
+                    f'{len(world.providers)} providers (seed {world.seed})'
+                )
+            self.profile(options)
+
+    def profile(self, options):
+        report = RunReport('profile_routes')
+        memory = {}  # layer -> (peak bytes, net bytes)
+
+        @contextmanager
+        def layer(name):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            with report.stage(name):
+                yield
+            after, peak = tracemalloc.get_traced_memory()
+            memory[name] = (peak - before, after - before)
+
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident()) if options['collapsed'] else None
+        tracemalloc.start()
+        try:
+            with ExitStack() as stack:
+                if sampler is not None:
+                    stack.enter_context(sampler)
+                profiler.enable()
+                try:
+                    if options['regenerate']:
+                        with layer('delete'):
+                            truncate_routes(reset_sequence=False)
+                    with layer('load'):
+                        airports, aircraft, providers, providers_by_aircraft, existing_keys = load_all_data(report, use_snapshot=options['snapshot'])
+                    with layer('distances'):
+                        distances = precompute_distances(airports)
+                    report.count('distance_pairs', len(distances))
+                    with layer('metrics'):
+                        route_metrics = generate_all_route_metrics(
+                            airports=airports,
+                            aircraft=aircraft,
+                            providers_by_aircraft=providers_by_aircraft,
+                            distances=distances,
+                            existing_keys=existing_keys,
+                            skip_existing=not options['regenerate'],
+                            report=report,
+                        )
+                    with layer('objects'):
+                        route_objects = create_route_objects(route_metrics, aircraft)
+                    with layer('insert'):
+                        created = save_routes_bulk(route_objects)
+                finally:
+                    profiler.disable()
+        finally:
+            tracemalloc.stop()
+        report.finish(created)
+
+        stats_path = os.path.join(options['output_dir'], 'routes.pstats')
+        profiler.dump_stats(stats_path)
+
+        self.stdout.write(report.format())
+        self.stdout.write('Peak traced memory per layer (timings include profiler overhead):')
+        for name, (peak, net) in memory.items():
+            self.stdout.write(f'  {name:<12}peak {peak / 1048576:>10.2f} MiB   retained {net / 1048576:>10.2f} MiB')
+
+        table = io.StringIO()
+        pstats.Stats(profiler, stream=table).strip_dirs().sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(table.getvalue())
+        self.stdout.write(self.style.SUCCESS(f'Wrote {stats_path}'))
+
+        if sampler is not None:
+            collapsed_path = os.path.join(options['output_dir'], 'routes.collapsed')
+            sampler.write(collapsed_path)
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {collapsed_path} ({sum(sampler.stacks.values())} samples)'
+            ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from operational_functions.shared_matrices import get_shared_matrices
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the shared route matrices (distances, cheapest route per leg) for the '
+        'current data versions, so worker processes attach instead of building them.'
+    )
+
+    def handle(self, *args, **options):
+        matrices = get_shared_matrices()
+        for matrix_set in (matrices.world(), matrices.costs()):
+            shapes = ', '.join(f'{key} {"x".join(map(str, array.shape))}' for key, array in matrix_set.arrays.items())
+            self.stdout.write(
+                f'{matrix_set.name:<6} {matrix_set.version}  {matrix_set.nbytes / 1048576:.1f} MiB  ({shapes})'
+            )
+            self.stdout.write(f'       {matrix_set.path}')
+        self.stdout.write(self.style.SUCCESS('Shared matrices published.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from operational_functions import route_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Inspect and maintain region-partitioned route storage: list partitions, '
+        'or regenerate / vacuum them, several in parallel.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'regenerate', 'vacuum'])
+        parser.add_argument('--region', action='append', dest='regions', metavar='REGION',
+                            help='Region to act on (repeatable; default: all).')
+        parser.add_argument('--workers', type=int, help='Worker processes (default: PARTITION_WORKERS).')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Routes per bulk insert batch.')
+
+    def handle(self, *args, **options):
+        if not route_partitions.enabled():
+            raise CommandError("Set ROUTE_DATABASE['ENABLED'] and ['PARTITION_BY_REGION'] to partition routes")
+        regions = options['regions']
+        if regions:
+            unknown = set(regions) - set(route_partitions.partition_map().regions)
+            if unknown:
+                raise CommandError(f'Unknown region(s): {", ".join(sorted(unknown))}')
+
+        action = options['action']
+        if action == 'list':
+            for stats in route_partitions.partition_stats():
+                if regions and stats['region'] not in regions:
+                    continue
+                self.stdout.write(
+                    f"{stats['region']:<28}{stats['routes']:>12,} routes{stats['bytes'] / 1048576:>10.1f} MiB  "
+                    f"{stats['alias']}"
+                )
+            return
+
+        def progress(region, result):
+            if action == 'regenerate':
+                detail = f"{result['routes_created']:,} routes in {result['total_seconds']:.1f}s"
+            else:
+                detail = f'{result / 1048576:.1f} MiB'
+            self.stdout.write(f'  {region}: {detail}')
+
+        if action == 'regenerate':
+            route_partitions.regenerate_partitions(regions, options['workers'], options['batch_size'], progress)
+        else:
+            route_partitions.for_each_partition(
+                route_partitions.vacuum_partition, regions, options['workers'], progress,
+            )
+        self.stdout.write(self.style.SUCCESS(f'{action.capitalize()} done.'))
@@ -0,0 +1,227 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Request counters and histograms are updated by main.middleware.MetricsMiddleware
+under a per-metric lock; everything else (route table size, last pipeline run,
+response cache ratios) is computed when /metrics is scraped, the route count
+only once per data version. Values are per worker process.
+"""
+
+import sys
+import threading
+from bisect import bisect_left
+
+# Prometheus client defaults, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+ROUTE_COUNT_KEY_PREFIX = 'metrics:route-rows:'
+
+
+def _escape(value):
+	return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+	pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+	return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+	if value == float('inf'):
+		return '+Inf'
+	if isinstance(value, float) and value.is_integer():
+		return str(int(value))
+	return repr(value) if isinstance(value, float) else str(value)
+
+
+def _header(name, documentation, kind):
+	return [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+
+
+class Counter:
+	def __init__(self, name, documentation, labelnames=()):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._values = {}
+		self._lock = threading.Lock()
+
+	def inc(self, labels=(), amount=1):
+		with self._lock:
+			self._values[labels] = self._values.get(labels, 0) + amount
+
+	def collect(self):
+		with self._lock:
+			values = dict(self._values)
+		lines = _header(self.name, self.documentation, 'counter')
+		for labels, value in sorted(values.items()):
+			lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+		return lines
+
+
+class Histogram:
+	def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self.buckets = tuple(buckets)
+		self._values = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+		self._lock = threading.Lock()
+
+	def observe(self, labels, value):
+		index = bisect_left(self.buckets, value)
+		with self._lock:
+			entry = self._values.get(labels)
+			if entry is None:
+				entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+			entry[0][index] += 1
+			entry[1] += value
+			entry[2] += 1
+
+	def collect(self):
+		with self._lock:
+			values = {labels: (list(e[0]), e[1], e[2]) for labels, e in self._values.items()}
+		lines = _header(self.name, self.documentation, 'histogram')
+		for labels, (counts, total, count) in sorted(values.items()):
+			cumulative = 0
+			for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+				cumulative += bucket_count
+				label_str = _format_labels(self.labelnames, labels, [('le', _format_value(float(bound)))])
+				lines.append(f'{self.name}_bucket{label_str} {cumulative}')
+			label_str = _format_labels(self.labelnames, labels)
+			lines.append(f'{self.name}_sum{label_str} {_format_value(float(total))}')
+			lines.append(f'{self.name}_count{label_str} {count}')
+		return lines
+
+
+REQUESTS = Counter(
+	'financialsim_http_requests_total',
+	'HTTP requests handled, by view, method and status code.',
+	('view', 'method', 'status'),
+)
+REQUEST_LATENCY = Histogram(
+	'financialsim_http_request_duration_seconds',
+	'HTTP request latency in seconds, by view.',
+	('view',),
+)
+REQUEST_QUERIES = Histogram(
+	'financialsim_http_request_db_queries',
+	'Database queries issued per HTTP request, by view.',
+	('view',),
+	buckets=QUERY_COUNT_BUCKETS,
+)
+
+REQUEST_METRICS = (REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES)
+
+
+def _gauge(name, documentation, samples):
+	"""Format a gauge from (labelnames, labelvalues, value) samples."""
+	lines = _header(name, documentation, 'gauge')
+	for labelnames, labelvalues, value in samples:
+		lines.append(f'{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}')
+	return lines
+
+
+def _route_count():
+	"""
+	Rows in the Route table, counted once per data version for every worker:
+	with partitions on, a count scans every partition. Every route write
+	bumps the version, and a count that raced one is not cached.
+	"""
+	from django.core.cache import cache
+	from .models import Route
+	from .versioning import DATA_VERSION, get_version
+
+	version = get_version(DATA_VERSION)
+	key = f'{ROUTE_COUNT_KEY_PREFIX}{version}'
+	count = cache.get(key)
+	if count is None:
+		count = Route.objects.count()
+		if get_version(DATA_VERSION) == version:
+			cache.set(key, count)
+	return count
+
+
+def _route_lines():
+	return _gauge(
+		'financialsim_route_table_rows',
+		'Rows in the Route table.',
+		[((), (), _route_count())],
+	)
+
+
+def _pipeline_lines():
+	from operational_functions.run_report import get_latest_report
+	report = get_latest_report()
+	if report is None:
+		return []
+	labels = (('entry_point',), (report['entry_point'],))
+	lines = _gauge(
+		'financialsim_route_run_duration_seconds',
+		'Duration of the latest route generation run.',
+		[labels + (float(report['total_seconds']),)],
+	)
+	lines += _gauge(
+		'financialsim_route_run_routes_created',
+		'Routes created by the latest route generation run.',
+		[labels + (report['routes_created'],)],
+	)
+	lines += _gauge(
+		'financialsim_route_run_stage_seconds',
+		'Per-stage duration of the latest route generation run.',
+		[(('stage',), (stage,), float(seconds)) for stage, seconds in report['stages'].items()],
+	)
+	lines += _gauge(
+		'financialsim_route_run_skipped',
+		'Route combinations skipped by the latest route generation run, by reason.',
+		[(('reason',), (reason,), count) for reason, count in report['skipped'].items()],
+	)
+	return lines
+
+
+def _cache_lines():
+	from .response_cache import cache_stats
+	stats = sorted(cache_stats().items())
+	lines = []
+	for outcome in ('hits', 'misses'):
+		name = f'financialsim_response_cache_{outcome}_total'
+		lines += _header(name, f'Response cache {outcome}, by view.', 'counter')
+		for view, counters in stats:
+			lines.append(f'{name}{_format_labels(("view",), (view,))} {counters[outcome]}')
+	lines += _gauge(
+		'financialsim_response_cache_hit_ratio',
+		'Response cache hit ratio, by view.',
+		[(('view',), (view,), float(counters['hit_ratio'])) for view, counters in stats],
+	)
+	return lines
+
+
+def _shared_matrix_lines():
+	# Only what this worker has already mapped: a scrape never triggers a build
+	# (or imports NumPy).
+	shared_matrices = sys.modules.get('operational_functions.shared_matrices')
+	if shared_matrices is None:
+		return []
+	attached = shared_matrices.get_shared_matrices().attached()
+	return _gauge(
+		'financialsim_shared_matrix_bytes',
+		'Bytes of shared route matrices mapped by this worker (shared between workers), by set.',
+		[(('set', 'version'), (matrix_set['name'], matrix_set['version']), matrix_set['bytes'])
+		 for matrix_set in attached],
+	)
+
+
+def render_metrics():
+	"""Render every metric in the text exposition format."""
+	lines = []
+	for metric in REQUEST_METRICS:
+		lines += metric.collect()
+	lines += _route_lines()
+	lines += _pipeline_lines()
+	lines += _cache_lines()
+	lines += _shared_matrix_lines()
+	return '\n'.join(lines) + '\n'
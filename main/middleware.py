@@ -0,0 +1,122 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+from operational_functions.tracing import span, start_trace, tracing_settings
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES, REQUESTS
+
+
+class _QueryCounter:
+	def __init__(self):
+		self.count = 0
+
+	def __call__(self, execute, sql, params, many, context):
+		self.count += 1
+		return execute(sql, params, many, context)
+
+
+def _sql_span(execute, sql, params, many, context):
+	with span('sql', sql=sql[:200], many=many):
+		return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+	"""
+	Record request count, latency and DB query count per view for /metrics.
+
+	Should be first in MIDDLEWARE so the timing covers the whole stack.
+	Under ASGI the async ORM runs queries in another thread, out of reach of
+	the execute wrapper, so async requests record no query count.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		self.async_mode = iscoroutinefunction(get_response)
+		if self.async_mode:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.async_mode:
+			return self.__acall__(request)
+		queries = _QueryCounter()
+		start = time.perf_counter()
+		with ExitStack() as stack:
+			for connection in connections.all():
+				stack.enter_context(connection.execute_wrapper(queries))
+			response = self.get_response(request)
+		self._record(request, response, time.perf_counter() - start, queries.count)
+		return response
+
+	async def __acall__(self, request):
+		start = time.perf_counter()
+		response = await self.get_response(request)
+		self._record(request, response, time.perf_counter() - start, None)
+		return response
+
+	def _record(self, request, response, elapsed, query_count):
+		match = request.resolver_match
+		view = (match.url_name or match.view_name) if match else 'unmatched'
+		REQUESTS.inc((view, request.method, str(response.status_code)))
+		REQUEST_LATENCY.observe((view,), elapsed)
+		if query_count is not None:
+			REQUEST_QUERIES.observe((view,), query_count)
+
+
+class TracingMiddleware:
+	"""
+	Trace a sample of requests (settings.TRACING['SAMPLE_RATE']).
+
+	Requests sent with an ``X-Trace: 1`` header are always traced. Every SQL
+	statement becomes a span, so ORM time shows up under the view's spans.
+	Sampled responses carry an X-Trace-Id header for the debug traces endpoint.
+	Async requests are traced the same way, without the per-statement SQL spans.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		self.sample_rate = tracing_settings()['SAMPLE_RATE']
+		self.async_mode = iscoroutinefunction(get_response)
+		if self.async_mode:
+			markcoroutinefunction(self)
+
+	def _sampled(self, request):
+		if request.headers.get('x-trace') == '1':
+			return True
+		return self.sample_rate > 0 and random.random() < self.sample_rate
+
+	def _finish(self, request, root, response):
+		match = request.resolver_match
+		if match:
+			root.name = match.url_name or match.view_name
+		root.set_attribute('status', response.status_code)
+
+	def __call__(self, request):
+		if self.async_mode:
+			return self.__acall__(request)
+		if not self._sampled(request):
+			return self.get_response(request)
+		with start_trace('request', method=request.method, path=request.path) as root, ExitStack() as stack:
+			for connection in connections.all():
+				stack.enter_context(connection.execute_wrapper(_sql_span))
+			response = self.get_response(request)
+			self._finish(request, root, response)
+		response['X-Trace-Id'] = root.trace.trace_id
+		return response
+
+	async def __acall__(self, request):
+		if not self._sampled(request):
+			return await self.get_response(request)
+		with start_trace('request', method=request.method, path=request.path) as root:
+			response = await self.get_response(request)
+			self._finish(request, root, response)
+		response['X-Trace-Id'] = root.trace.trace_id
+		return response
@@ -1,5 +1,40 @@
 
-from django.db import models
+from django.db import NotSupportedError, models
+
+
+class RouteQuerySet(models.QuerySet):
+	def for_leg(self, leg):
+		"""
+		Routes of one leg. With region-partitioned route storage the query runs
+		on the origin's partition only (unless a database was chosen already);
+		use this rather than filter(leg=...), which reads the union of all
+		partitions.
+		"""
+		queryset = self.filter(leg=leg)
+		if queryset._db is None:
+			from operational_functions.route_partitions import alias_for_leg
+			alias = alias_for_leg(leg)
+			if alias is not None:
+				queryset = queryset.using(alias)
+		return queryset
+
+	def _check_writable(self, operation):
+		from operational_functions import route_db, route_partitions
+		if self.db == route_db.ROUTES_ALIAS and route_partitions.enabled():
+			raise NotSupportedError(
+				f'Route.objects...{operation}() cannot write through the union of region partitions; '
+				'use operational_functions.route_purge (purge_routes, truncate_routes) or a '
+				'partition\'s alias (Route.objects.for_leg, .using(partition_alias(region)))'
+			)
+
+	def delete(self):
+		self._check_writable('delete')
+		return super().delete()
+
+	def update(self, **kwargs):
+		self._check_writable('update')
+		return super().update(**kwargs)
+
 
 class Route(models.Model):
 	leg = models.CharField(max_length=16)  # e.g., 'JFK-LHR'
@@ -18,6 +53,8 @@ class Route(models.Model):
 	airport_fees_cost = models.DecimalField(max_digits=12, decimal_places=2)
 	total_flight_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
 
+	objects = RouteQuerySet.as_manager()
+
 	def __str__(self):
 		return f"{self.leg} | {self.aircraft_type} | {self.provider} | {self.service_type}"
 
@@ -0,0 +1,162 @@
+"""
+Per-request SQL recording, N+1 detection and per-view query budgets.
+
+QueryBudgetMiddleware (debug/staging) records every query a request issues,
+groups SELECTs by normalized shape to flag N+1 patterns, and checks the total
+against the view's budget in settings.QUERY_BUDGETS. assert_query_budget()
+applies the same checks inside tests.
+
+Settings:
+    QUERY_BUDGET_ENABLED   Turn the middleware on (default: DEBUG)
+    QUERY_BUDGETS          {url name: max queries per request, see QueryLog.count}
+    QUERY_BUDGET_DEFAULT   Budget for views not listed (default: None, unchecked)
+    QUERY_BUDGET_N_PLUS_ONE_THRESHOLD
+                           Repeats of one SELECT shape that count as N+1 (default: 5)
+    QUERY_BUDGET_RAISE     Raise QueryBudgetExceeded instead of logging (default: False)
+"""
+
+import logging
+import re
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('main.query_budget')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+_UNCOUNTED = re.compile(r'\s*(?:INSERT|SAVEPOINT|RELEASE|ROLLBACK\s+TO)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+	pass
+
+
+def normalize_sql(sql):
+	"""Reduce a query to its shape: literals and IN-list lengths removed."""
+	shape = _STRING_LITERAL.sub('?', sql)
+	shape = _NUMBER_LITERAL.sub('?', shape)
+	shape = shape.replace('%s', '?')
+	shape = _PLACEHOLDER_LIST.sub('(?...)', shape)
+	return _WHITESPACE.sub(' ', shape).strip()
+
+
+@dataclass
+class QueryLog:
+	queries: List[str] = field(default_factory=list)
+
+	def __call__(self, execute, sql, params, many, context):
+		self.queries.append(sql)
+		return execute(sql, params, many, context)
+
+	@property
+	def count(self):
+		"""
+		Queries counted against budgets. Bulk INSERT batches scale with rows
+		written, and savepoints depend on how deeply the request is nested in
+		transactions (TestCase adds a level), so both are excluded.
+		"""
+		return sum(1 for sql in self.queries if not _UNCOUNTED.match(sql))
+
+	def repeated_selects(self, threshold):
+		"""SELECT shapes issued at least ``threshold`` times: {shape: count}."""
+		shapes: Dict[str, int] = {}
+		for sql in self.queries:
+			if sql.lstrip()[:6].upper() == 'SELECT':
+				shape = normalize_sql(sql)
+				shapes[shape] = shapes.get(shape, 0) + 1
+		return {shape: count for shape, count in shapes.items() if count >= threshold}
+
+
+@contextmanager
+def record_queries():
+	"""Record the SQL of every query on every connection inside the block."""
+	log = QueryLog()
+	with ExitStack() as stack:
+		for connection in connections.all():
+			stack.enter_context(connection.execute_wrapper(log))
+		yield log
+
+
+def n_plus_one_threshold():
+	return getattr(settings, 'QUERY_BUDGET_N_PLUS_ONE_THRESHOLD', 5)
+
+
+def budget_for(view_name):
+	budgets = getattr(settings, 'QUERY_BUDGETS', {})
+	return budgets.get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+def check_queries(log, view_name=None, budget=None, threshold=None):
+	"""Return a list of problems: budget overrun and N+1 shapes."""
+	if budget is None and view_name is not None:
+		budget = budget_for(view_name)
+	if threshold is None:
+		threshold = n_plus_one_threshold()
+	label = view_name or 'block'
+	problems = []
+	if budget is not None and log.count > budget:
+		problems.append(f'{label} issued {log.count} queries (budget {budget})')
+	for shape, count in log.repeated_selects(threshold).items():
+		problems.append(f'{label} repeated a query {count} times (possible N+1): {shape[:300]}')
+	return problems
+
+
+@contextmanager
+def assert_query_budget(view_name=None, budget=None, threshold=None):
+	"""
+	Test helper: fail if the block exceeds the budget or shows an N+1 pattern.
+
+	    with assert_query_budget('route_records_api'):
+	        client.post('/api/route-records/', ...)
+
+	``budget`` overrides settings.QUERY_BUDGETS for ``view_name``.
+	"""
+	with record_queries() as log:
+		yield log
+	problems = check_queries(log, view_name, budget, threshold)
+	if problems:
+		raise QueryBudgetExceeded('\n'.join(problems))
+
+
+class QueryBudgetMiddleware:
+	"""
+	Debug/staging middleware enforcing QUERY_BUDGETS and flagging N+1 queries.
+
+	Adds an X-Query-Count header; problems are logged as warnings, or raised
+	when QUERY_BUDGET_RAISE is set. Async requests pass through unchecked: the
+	async ORM runs queries in a thread the recorder cannot see.
+	"""
+
+	sync_capable = True
+	async_capable = True
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+		self.async_mode = iscoroutinefunction(get_response)
+		if self.async_mode:
+			markcoroutinefunction(self)
+
+	def __call__(self, request):
+		if self.async_mode:
+			return self.get_response(request)
+		if not getattr(settings, 'QUERY_BUDGET_ENABLED', settings.DEBUG):
+			return self.get_response(request)
+		with record_queries() as log:
+			response = self.get_response(request)
+		match = request.resolver_match
+		view_name = match.url_name if match else None
+		response['X-Query-Count'] = str(log.count)
+		problems = check_queries(log, view_name)
+		if problems:
+			if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+				raise QueryBudgetExceeded('\n'.join(problems))
+			for problem in problems:
+				logger.warning('%s %s: %s', request.method, request.path, problem)
+		return response
@@ -0,0 +1,115 @@
+"""
+Versioned response cache for the JSON API views.
+
+Responses are stored in the Django cache under a key that includes the global
+data version (see main.versioning), so any save or delete of the underlying
+models makes older entries unreachable without explicit invalidation.
+Per-view hit/miss counters are kept in process. Both sync and async views
+can be decorated; async views do the cache I/O in a worker thread.
+"""
+
+import hashlib
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from operational_functions.tracing import span
+from .versioning import DATA_VERSION, get_version
+
+RESPONSE_KEY_PREFIX = 'response:'
+
+_stats_lock = threading.Lock()
+_stats = {}  # view name -> {'hits': int, 'misses': int}
+
+
+def _record(view_name, outcome):
+	with _stats_lock:
+		counters = _stats.setdefault(view_name, {'hits': 0, 'misses': 0})
+		counters[outcome] += 1
+
+
+def cache_stats():
+	"""Return a snapshot of hit/miss counters per view, with hit ratios."""
+	with _stats_lock:
+		snapshot = {name: dict(counters) for name, counters in _stats.items()}
+	for counters in snapshot.values():
+		total = counters['hits'] + counters['misses']
+		counters['hit_ratio'] = counters['hits'] / total if total else 0.0
+	return snapshot
+
+
+def reset_cache_stats():
+	with _stats_lock:
+		_stats.clear()
+
+
+def _make_key(view_name, parts, version):
+	digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+	return f'{RESPONSE_KEY_PREFIX}{view_name}:{version}:{digest}'
+
+
+def cache_json_response(view_name, key_func=lambda request: (), versioned=True, timeout=None):
+	"""
+	Cache successful JSON responses of a view.
+
+	Args:
+		view_name: Name used in cache keys and stats
+		key_func: Returns the request-specific key parts, or None to bypass the cache
+		versioned: Whether entries are keyed on the global data version
+		timeout: Cache timeout in seconds (None uses the backend default)
+	"""
+	def current_version():
+		return get_version(DATA_VERSION) if versioned else 0
+
+	def lookup(parts):
+		"""The data version read before the view runs, and the cached content for it."""
+		version = current_version()
+		with span('response_cache.get', view=view_name) as get_span:
+			content = cache.get(_make_key(view_name, parts, version))
+			get_span.set_attribute('hit', content is not None)
+		_record(view_name, 'misses' if content is None else 'hits')
+		return version, content
+
+	def store(parts, version, response):
+		if response.status_code != 200:
+			return
+		# A write committed while the view ran (by it or another process) may
+		# not be reflected in the response: only cache it if the data version
+		# it was read under is still the current one.
+		if current_version() != version:
+			return
+		cache_kwargs = {} if timeout is None else {'timeout': timeout}
+		with span('response_cache.set', view=view_name):
+			cache.set(_make_key(view_name, parts, version), response.content, **cache_kwargs)
+
+	def decorator(view):
+		if iscoroutinefunction(view):
+			@wraps(view)
+			async def async_wrapper(request, *args, **kwargs):
+				parts = key_func(request)
+				if parts is None:
+					return await view(request, *args, **kwargs)
+				version, content = await sync_to_async(lookup)(parts)
+				if content is not None:
+					return HttpResponse(content, content_type='application/json')
+				response = await view(request, *args, **kwargs)
+				await sync_to_async(store)(parts, version, response)
+				return response
+			return async_wrapper
+
+		@wraps(view)
+		def wrapper(request, *args, **kwargs):
+			parts = key_func(request)
+			if parts is None:
+				return view(request, *args, **kwargs)
+			version, content = lookup(parts)
+			if content is not None:
+				return HttpResponse(content, content_type='application/json')
+			response = view(request, *args, **kwargs)
+			store(parts, version, response)
+			return response
+		return wrapper
+	return decorator
@@ -0,0 +1,67 @@
+import threading
+import weakref
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Aircraft, Airport, CharterProvider, Country, Route
+from .versioning import DATA_VERSION, bump_version
+
+_local = threading.local()
+
+
+def _bump_once(origin, *names, using=None):
+	"""
+	Bump each version after the current transaction (on ``using``) commits.
+
+	A cascading or queryset delete sends post_delete once per row, all with
+	the same ``origin``; only the first signal per version name is acted on.
+	"""
+	if origin is not None:
+		state = getattr(_local, 'state', None)
+		if state is None or state[0]() is not origin:
+			try:
+				state = (weakref.ref(origin), set())
+			except TypeError:
+				state = None
+			_local.state = state
+		if state is not None:
+			names = [name for name in names if name not in state[1]]
+			state[1].update(names)
+	if names:
+		transaction.on_commit(partial(bump_version, *names), using=using)
+
+
+@receiver([post_save, post_delete], sender=Country)
+@receiver([post_save, post_delete], sender=Airport)
+@receiver([post_save, post_delete], sender=Aircraft)
+@receiver([post_save, post_delete], sender=CharterProvider)
+def bump_model_version(sender, origin=None, **kwargs):
+	_bump_once(origin, sender._meta.model_name, DATA_VERSION)
+
+
+@receiver([post_save, post_delete], sender=Route)
+def bump_route_version(sender, origin=None, using=None, **kwargs):
+	_bump_once(origin, DATA_VERSION, using=using)
+
+
+@receiver(post_delete, sender=Aircraft)
+@receiver(post_delete, sender=CharterProvider)
+def delete_routes_in_route_database(sender, instance, using=None, **kwargs):
+	"""
+	Cascade to Route when it lives in other databases (blue/green or
+	partitioned route storage): the ORM cascade only reaches the Route table
+	on ``using``.
+	"""
+	from operational_functions.route_partitions import route_aliases
+	from operational_functions.route_purge import purge_routes
+
+	aliases = [alias for alias in route_aliases() if alias != using]
+	if not aliases:
+		return
+	if sender is Aircraft:
+		purge_routes(aircraft_ids=[instance.pk], aliases=aliases)
+	else:
+		purge_routes(provider_ids=[instance.pk], aliases=aliases)
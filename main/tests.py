@@ -1,3 +1,757 @@
-from django.test import TestCase
+import dataclasses
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+from contextlib import ExitStack
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import NotSupportedError, connections
+from django.db.models import Count, Max, Min, Sum
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.forms.models import model_to_dict
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from operational_functions import route_db, route_partitions
+from operational_functions.monte_carlo import Distribution, SimulationConfig, run_simulation
+from operational_functions.route_purge import delete_with_routes, purge_orphan_routes, purge_routes, truncate_routes
+from operational_functions.routes_utils import (
+	compute_route_metrics,
+	generate_all_route_metrics,
+	ensure_pair_routes,
+	generate_routes_list,
+	load_all_data,
+	precompute_distances,
+	save_routes_bulk,
+)
+from operational_functions.route_store import RouteTable, load_dimensions, load_route_array
+from operational_functions.run_report import RunReport
+from operational_functions.scenarios import run_scenario
+from operational_functions.synthetic_world import SYNTHETIC_CACHES, generate_world, populate_database
+from operational_functions.world_snapshot import SNAPSHOT_FORMAT, read_snapshot, snapshot_path, write_snapshot
+
+from .models import Aircraft, Airport, CharterProvider, Country, Route
+from .query_budget import assert_query_budget
+from .response_cache import cache_json_response
+from .versioning import DATA_VERSION, bump_version
+
+
+def _copies(routes):
+	"""Unsaved copies of routes, for inserting them elsewhere."""
+	fields = [field.attname for field in Route._meta.concrete_fields if not field.primary_key]
+	return [Route(**{name: getattr(route, name) for name in fields}) for route in routes]
+
+
+def _form_data(instance, **changes):
+	"""POST data for a model form, from an instance's field values."""
+	data = {key: '' if value is None else value for key, value in model_to_dict(instance).items()}
+	data.pop('id', None)
+	data.update(changes)
+	return data
+
+
+@override_settings(CACHES=SYNTHETIC_CACHES)
+class ResponseCacheTests(SimpleTestCase):
+	"""Responses are cached under the data version they were read at, and only while it is current."""
+
+	def setUp(self):
+		cache.clear()
+		self.calls = 0
+		self.bump_during_view = False
+
+		@cache_json_response('test_view')
+		def view(request):
+			self.calls += 1
+			if self.bump_during_view:
+				bump_version(DATA_VERSION)
+			return JsonResponse({'calls': self.calls})
+
+		self.view = view
+		self.request = RequestFactory().get('/')
+
+	def test_cached_until_version_bump(self):
+		self.assertEqual(self.view(self.request).content, self.view(self.request).content)
+		self.assertEqual(self.calls, 1)
+		bump_version(DATA_VERSION)
+		self.view(self.request)
+		self.assertEqual(self.calls, 2)
+
+	def test_not_cached_when_version_changes_during_view(self):
+		self.bump_during_view = True
+		self.view(self.request)
+		self.bump_during_view = False
+		self.view(self.request)
+		self.view(self.request)
+		self.assertEqual(self.calls, 2)
+
+
+@override_settings(CACHES=SYNTHETIC_CACHES)
+class QueryBudgetTests(TestCase):
+	"""
+	Every view in settings.QUERY_BUDGETS stays within its budget, with no N+1
+	pattern, on a small synthetic world with its routes generated. The cache
+	is cleared before each test so cached responses cannot hide queries.
+	"""
+
+	@classmethod
+	def setUpTestData(cls):
+		with override_settings(CACHES=SYNTHETIC_CACHES):
+			populate_database(generate_world(n_airports=12, n_aircraft=3, n_providers=6))
+			generate_routes_list()
+		cls.airport = Airport.objects.order_by('iata_code').first()
+		cls.aircraft = Aircraft.objects.order_by('id').first()
+		cls.provider = CharterProvider.objects.order_by('id').first()
+		cls.country = Country.objects.order_by('id').first()
+
+	def setUp(self):
+		cache.clear()
+
+	def post_json(self, url, payload):
+		return self.client.post(url, json.dumps(payload), content_type='application/json')
+
+	def test_home(self):
+		with assert_query_budget('home'):
+			response = self.client.get(reverse('home'))
+		self.assertEqual(response.status_code, 200)
+
+	def test_mode_tab(self):
+		with assert_query_budget('mode_tab'):
+			response = self.client.get(reverse('mode_tab'))
+		self.assertEqual(response.status_code, 200)
+
+	def test_mode_tab_add_provider(self):
+		data = _form_data(self.provider, name='Budget Cargo')
+		with assert_query_budget('mode_tab'):
+			response = self.client.post(reverse('mode_tab'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_edit_charter_provider(self):
+		data = _form_data(self.provider, block_hour_cost='9500.00')
+		url = reverse('edit_charter_provider', args=[self.provider.pk])
+		with assert_query_budget('edit_charter_provider'):
+			response = self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_add_aircraft(self):
+		data = _form_data(self.aircraft, short_name='BUDGET')
+		with assert_query_budget('add_aircraft'):
+			response = self.client.post(reverse('add_aircraft'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_edit_aircraft(self):
+		data = _form_data(self.aircraft, cruise_speed=475.0)
+		url = reverse('edit_aircraft', args=[self.aircraft.pk])
+		with assert_query_budget('edit_aircraft'):
+			response = self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_add_airport(self):
+		data = _form_data(self.airport, iata_code='ZZZ', name='ZZZ Budget Airport')
+		with assert_query_budget('add_airport'):
+			response = self.client.post(reverse('add_airport'), data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_edit_airport(self):
+		data = _form_data(self.airport, fuel_cost_gl=3.1)
+		url = reverse('edit_airport', args=[self.airport.pk])
+		with assert_query_budget('edit_airport'):
+			response = self.client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_delete_aircraft(self):
+		with assert_query_budget('delete_aircraft'):
+			response = self.client.post(reverse('delete_aircraft', args=[self.aircraft.pk]))
+		self.assertEqual(response.status_code, 200)
+		self.assertFalse(Route.objects.filter(aircraft_type_id=self.aircraft.pk).exists())
+
+	def test_delete_airport(self):
+		with assert_query_budget('delete_airport'):
+			response = self.client.post(reverse('delete_airport', args=[self.airport.pk]))
+		self.assertEqual(response.status_code, 200)
+
+	def test_delete_charter_provider(self):
+		with assert_query_budget('delete_charter_provider'):
+			response = self.client.post(reverse('delete_charter_provider', args=[self.provider.pk]))
+		self.assertEqual(response.status_code, 200)
+		self.assertFalse(Route.objects.filter(provider_id=self.provider.pk).exists())
+
+	def test_route_records_api(self):
+		route = Route.objects.order_by('id').first()
+		departure, arrival = route.leg.split(' - ')
+		with assert_query_budget('route_records_api'):
+			response = self.post_json(reverse('route_records_api'), {'departure': departure, 'arrival': arrival})
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.json()['routes'])
+
+	def test_route_records_api_computes_missing_pair(self):
+		Route.objects.filter(leg__startswith=f'{self.airport.iata_code} - ').delete()
+		arrival = Airport.objects.exclude(pk=self.airport.pk).order_by('iata_code').first()
+		payload = {'departure': self.airport.iata_code, 'arrival': arrival.iata_code}
+		with assert_query_budget('route_records_api'):
+			response = self.post_json(reverse('route_records_api'), payload)
+		self.assertEqual(response.status_code, 200)
+
+	def test_airport_list_api(self):
+		with assert_query_budget('airport_list_api'):
+			response = self.client.get(reverse('airport_list_api'))
+		self.assertEqual(len(response.json()['airports']), Airport.objects.count())
+
+	def test_airports_by_country(self):
+		with assert_query_budget('airports_by_country'):
+			response = self.client.get(reverse('airports_by_country'), {'country_id': self.country.pk})
+		self.assertEqual(response.status_code, 200)
+
+	def test_airport_lookup(self):
+		# The lookup itself reads OpenFlights over the network
+		found = (25.79, -80.29, 8.0, 'Miami International Airport', 'Miami', 'United States')
+		with mock.patch('main.airport_api.get_airport_coordinates_and_altitude', return_value=found):
+			with assert_query_budget('airport_lookup'):
+				response = self.client.get(reverse('airport_lookup'), {'iata_code': 'MIA'})
+		self.assertEqual(response.status_code, 200)
+
+	def test_metrics(self):
+		with assert_query_budget('metrics'):
+			response = self.client.get(reverse('metrics'))
+		self.assertEqual(response.status_code, 200)
+		self.assertIn(f'financialsim_route_table_rows {Route.objects.count()}\n', response.content.decode())
+
+	def test_metrics_count_routes_once_per_data_version(self):
+		self.client.get(reverse('metrics'))
+		with assert_query_budget(budget=0):
+			self.client.get(reverse('metrics'))
+		bump_version(DATA_VERSION)
+		with self.assertNumQueries(1):
+			self.client.get(reverse('metrics'))
+
+	def test_route_export(self):
+		with assert_query_budget('route_export'):
+			response = self.client.get(reverse('route_export'), {'format': 'csv'})
+			b''.join(response.streaming_content)
+		self.assertEqual(response.status_code, 200)
+
+	def test_route_query_api(self):
+		spec = {'filters': {'service_type': 'acmi'}, 'order_by': 'total_flight_cost', 'limit': 5}
+		with assert_query_budget('route_query_api'):
+			response = self.post_json(reverse('route_query_api'), spec)
+		self.assertEqual(response.status_code, 200, response.content)
+
+	def test_scenario_api(self):
+		spec = {'overrides': [{'parameter': 'fuel_cost_gl', 'pct': 15}], 'top': 5}
+		with assert_query_budget('scenario_api'):
+			response = self.post_json(reverse('scenario_api'), spec)
+		self.assertEqual(response.status_code, 200, response.content)
+
+
+@override_settings(CACHES=SYNTHETIC_CACHES)
+class RouteAnalyticsTests(TestCase):
+	"""The in-memory route table agrees with the ORM on a small synthetic world."""
+
+	@classmethod
+	def setUpTestData(cls):
+		with override_settings(CACHES=SYNTHETIC_CACHES):
+			populate_database(generate_world(n_airports=12, n_aircraft=3, n_providers=6))
+			generate_routes_list()
+
+	def setUp(self):
+		dims = load_dimensions()
+		self.table = RouteTable(load_route_array(dims), dims)
+
+	def assertSameIds(self, table, queryset, ordered=False):
+		ids = table.column('id').tolist()
+		expected = list(queryset.values_list('id', flat=True))
+		if ordered:
+			self.assertEqual(ids, expected)
+		else:
+			self.assertCountEqual(ids, expected)
+
+	def test_routes_loaded(self):
+		self.assertTrue(len(self.table))
+		self.assertEqual(self.table.count(), Route.objects.count())
+
+	def test_filter(self):
+		airport = Airport.objects.order_by('iata_code').first()
+		provider = CharterProvider.objects.order_by('id').first()
+		median = float(sorted(self.table.column('total_flight_cost'))[len(self.table) // 2])
+		cases = [
+			({'service_type': 'acmi'}, {'service_type': 'acmi'}),
+			({'origin': airport.iata_code}, {'leg__startswith': f'{airport.iata_code} - '}),
+			({'provider': provider.name}, {'provider__name': provider.name}),
+			({'total_flight_cost__gt': median, 'distance__lte': 2000},
+			 {'total_flight_cost__gt': median, 'distance__lte': 2000}),
+			({'service_type__ne': 'acmi', 'aircraft__in': [provider.aircraft.short_name]},
+			 {'service_type': 'charter', 'aircraft_type': provider.aircraft}),
+		]
+		for conditions, lookups in cases:
+			with self.subTest(conditions=conditions):
+				expected = Route.objects.filter(**lookups)
+				self.assertTrue(expected.exists())
+				self.assertSameIds(self.table.filter(**conditions), expected)
+
+	def test_order_by(self):
+		cases = [
+			(('-total_flight_cost', 'id'), ('-total_flight_cost', 'id')),
+			(('distance', '-id'), ('distance', '-id')),
+			(('aircraft', '-total_flight_cost', 'id'), ('aircraft_type_id', '-total_flight_cost', 'id')),
+		]
+		for names, fields in cases:
+			with self.subTest(order_by=names):
+				self.assertSameIds(self.table.order_by(*names), Route.objects.order_by(*fields), ordered=True)
+
+	def test_group_by(self):
+		for dimension, field in (('provider', 'provider_id'), ('aircraft', 'aircraft_type_id'), ('service_type', 'service_type')):
+			with self.subTest(dimension=dimension):
+				key = f'{dimension}_id' if field.endswith('_id') else dimension
+				groups = {group[key]: group for group in self.table.group_by(dimension)}
+				expected = Route.objects.values(field).annotate(
+					count=Count('id'), sum=Sum('total_flight_cost'),
+					min=Min('total_flight_cost'), max=Max('total_flight_cost'),
+				)
+				self.assertEqual(len(groups), len(expected))
+				for row in expected:
+					group = groups[row[field]]
+					self.assertEqual(group['count'], row['count'])
+					self.assertAlmostEqual(group['sum'], float(row['sum']), places=2)
+					self.assertEqual(group['min'], float(row['min']))
+					self.assertEqual(group['max'], float(row['max']))
+
+	def scenario(self, *overrides):
+		return run_scenario({'overrides': list(overrides), 'top': len(self.table)}, self.table)
+
+	def test_noop_scenario_matches_stored_costs(self):
+		result = self.scenario({'parameter': 'fuel_cost_gl', 'pct': 0})
+		stored = dict(Route.objects.values_list('id', 'total_flight_cost'))
+		self.assertEqual(result['affected']['routes'], len(stored))
+		self.assertEqual(len(result['routes']), len(stored))
+		for route in result['routes']:
+			self.assertAlmostEqual(route['baseline'], float(stored[route['route_id']]), delta=0.01)
+			self.assertEqual(route['scenario'], route['baseline'])
+		self.assertAlmostEqual(result['network']['baseline'], float(sum(stored.values())), delta=0.01 * len(stored))
+		self.assertEqual(result['network']['delta'], 0)
+
+	def test_fuel_override_matches_route_metrics(self):
+		airports, aircraft, providers, _, _ = load_all_data()
+		providers = {provider.id: provider for provider in providers}
+		country = Country.objects.get(name=Airport.objects.order_by('iata_code').first().country)
+		in_region = set(Airport.objects.filter(
+			country__in=Country.objects.filter(region=country.region).values('name'),
+		).values_list('iata_code', flat=True))
+
+		result = self.scenario({'parameter': 'fuel_cost_gl', 'region': country.region, 'pct': 12})
+		routes = Route.objects.in_bulk([route['route_id'] for route in result['routes']])
+		expected_ids = [
+			route.id for route in Route.objects.all() if route.leg.split(' - ')[0] in in_region
+		]
+		self.assertTrue(expected_ids)
+		self.assertCountEqual(routes, expected_ids)
+		for item in result['routes']:
+			route = routes[item['route_id']]
+			from_iata, to_iata = route.leg.split(' - ')
+			airport = airports[from_iata]
+			metrics = compute_route_metrics(
+				from_iata, to_iata, route.distance,
+				aircraft[route.aircraft_type_id], providers[route.provider_id],
+				dataclasses.replace(airport, fuel_cost_gl=airport.fuel_cost_gl * 1.12),
+			)
+			self.assertAlmostEqual(item['scenario'], metrics.total_flight_cost, delta=0.01)
+			# Charter rates are all-inclusive: only ACMI routes pay for fuel
+			if route.service_type == 'acmi':
+				self.assertGreater(item['delta'], 0)
+			else:
+				self.assertEqual(item['delta'], 0)
+		self.assertGreater(result['affected']['delta'], 0)
+
+	def test_fixed_simulation_is_the_baseline(self):
+		config = SimulationConfig(
+			samples=50, fuel_price=Distribution.parse('fixed:'), flight_time=Distribution.parse('fixed:'), workers=1,
+		)
+		result = run_simulation(config, self.table)
+		stored = dict(Route.objects.values_list('id', 'total_flight_cost'))
+		rows = result.rows()
+		self.assertEqual(len(rows), len(stored))
+		for row in rows:
+			self.assertAlmostEqual(row['baseline'], float(stored[row['route_id']]), delta=0.01)
+			self.assertEqual(row['p50'], row['baseline'])
+			self.assertEqual(row['p99'], row['baseline'])
+			self.assertAlmostEqual(row['mean'], row['baseline'])
+		self.assertEqual(result.clipped, 0)
+
+	def test_simulation_needs_samples(self):
+		for samples in ('0', '-5'):
+			with self.subTest(samples=samples), self.assertRaisesMessage(CommandError, 'samples must be at least 1'):
+				call_command('simulate_costs', '--samples', samples)
+
+
+class WorldSnapshotTests(SimpleTestCase):
+	"""A snapshot file that cannot be read back as rows is a miss, not an error."""
+
+	version = '1-1-1'
+
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		settings = override_settings(WORLD_SNAPSHOT_DIR=directory.name)
+		settings.enable()
+		self.addCleanup(settings.disable)
+
+	def write_payload(self, payload):
+		with open(snapshot_path(self.version), 'wb') as fh:
+			pickle.dump(payload, fh)
+
+	def test_round_trip(self):
+		rows = {'airports': [], 'aircraft': [], 'providers': []}
+		write_snapshot(self.version, rows)
+		self.assertEqual(read_snapshot(self.version), rows)
+
+	def test_malformed_payloads_are_misses(self):
+		header = {'format': SNAPSHOT_FORMAT, 'version': self.version}
+		payloads = [
+			['not', 'a', 'dict'],
+			{**header, 'airports': {'data': []}},
+			{**header, 'airports': 5},
+			{**header, 'airports': {'columns': None, 'data': []}},
+		]
+		for payload in payloads:
+			with self.subTest(payload=payload):
+				self.write_payload(payload)
+				self.assertIsNone(read_snapshot(self.version))
+
+
+class RouteMetricsMemoizeTests(TestCase):
+	"""generate_all_route_metrics gives the same routes and skips with and without memoize."""
+
+	@classmethod
+	def setUpTestData(cls):
+		# Providers alternate charter/ACMI and cycle through the first six
+		# aircraft, leaving the seventh without any; airports span every
+		# region, so many legs are beyond some aircraft's range.
+		with override_settings(CACHES=SYNTHETIC_CACHES):
+			populate_database(generate_world(n_airports=40, n_aircraft=7, n_providers=6))
+
+	def setUp(self):
+		self.airports, self.aircraft, _, self.providers_by_aircraft, _ = load_all_data()
+		self.distances = precompute_distances(self.airports)
+
+	def generate(self, memoize, **kwargs):
+		report = RunReport('test')
+		routes = generate_all_route_metrics(
+			airports=self.airports,
+			aircraft=self.aircraft,
+			providers_by_aircraft=self.providers_by_aircraft,
+			distances=self.distances,
+			report=report,
+			memoize=memoize,
+			**kwargs,
+		)
+		return routes, report
+
+	def assertSameResults(self, **kwargs):
+		plain, plain_report = self.generate(memoize=False, **kwargs)
+		memoized, memoized_report = self.generate(memoize=True, **kwargs)
+		self.assertEqual(memoized, plain)
+		self.assertEqual(memoized_report.skips.counts, plain_report.skips.counts)
+		self.assertEqual(memoized_report.counts['metrics_computed'], plain_report.counts['metrics_computed'])
+		return plain, plain_report
+
+	def test_world_covers_edge_cases(self):
+		service_types = {p.service_type for providers in self.providers_by_aircraft.values() for p in providers}
+		self.assertEqual(service_types, {'charter', 'acmi'})
+		self.assertTrue(any(ac_id not in self.providers_by_aircraft for ac_id in self.aircraft))
+
+	def test_all_routes(self):
+		routes, report = self.assertSameResults(existing_keys=set())
+		self.assertTrue(routes)
+		self.assertTrue(report.skips.by_reason().get('out_of_range'))
+
+	def test_skip_existing(self):
+		routes, _ = self.generate(memoize=False, existing_keys=set())
+		existing = {f'{r.leg}|{r.aircraft_id}|{r.provider_id}' for r in routes[::3]}
+		remaining, report = self.assertSameResults(existing_keys=existing)
+		self.assertEqual(len(remaining), len(routes) - len(existing))
+		self.assertEqual(report.skips.by_reason()['existing'], len(existing))
+
+	def test_origins(self):
+		origins = set(list(self.airports)[:5])
+		routes, _ = self.assertSameResults(existing_keys=set(), origins=origins)
+		self.assertTrue(routes)
+		self.assertTrue(all(r.leg.split(' - ')[0] in origins for r in routes))
+
+
+class RouteStorageTestMixin:
+	"""
+	Blue/green route storage (route_db) in a scratch directory, optionally
+	partitioned by region, holding the routes of a small synthetic world.
+	Route files attach the test database as their catalog, so this needs
+	TransactionTestCase: the catalog must be committed to be seen.
+	"""
+
+	partition_by_region = False
+
+	@classmethod
+	def ensure_connection_patch_method(cls):
+		# Generations and partitions register their database aliases at run time
+		real_ensure_connection = BaseDatabaseWrapper.ensure_connection
+		patched_ensure_connection = super().ensure_connection_patch_method()
+
+		def ensure_connection(connection, *args, **kwargs):
+			if route_db.is_route_connection(connection):
+				return real_ensure_connection(connection, *args, **kwargs)
+			return patched_ensure_connection(connection, *args, **kwargs)
+		return ensure_connection
+
+	def setUp(self):
+		scratch = tempfile.mkdtemp(prefix='route-storage-')
+		self.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+		connections.settings[route_db.ROUTES_ALIAS] = {
+			**connections.settings['default'],
+			'NAME': os.path.join(scratch, 'routes.sqlite3'),
+		}
+		self.addCleanup(self.reset_route_storage, forget_aliases=True)
+		overrides = override_settings(
+			CACHES=SYNTHETIC_CACHES,
+			SINGLE_FLIGHT_LOCK_DIR=os.path.join(scratch, 'locks'),
+			DATABASE_ROUTERS=['main.db_routers.RouteRouter'],
+			ROUTE_DATABASE={
+				'ENABLED': True,
+				'PATH': connections.settings[route_db.ROUTES_ALIAS]['NAME'],
+				'GENERATIONS_DIR': os.path.join(scratch, 'generations'),
+				'KEEP': 2,
+				'PARTITION_BY_REGION': self.partition_by_region,
+				'PARTITIONS_DIR': os.path.join(scratch, 'partitions'),
+				'PARTITION_WORKERS': 1,
+			},
+		)
+		overrides.enable()
+		self.addCleanup(overrides.disable)
+		cache.clear()
+		self.reset_route_storage()
+		populate_database(generate_world(n_airports=16, n_aircraft=3, n_providers=6))
+		generate_routes_list()
+
+	def reset_route_storage(self, forget_aliases=False):
+		for connection in connections.all(initialized_only=True):
+			if route_db.is_route_connection(connection):
+				connection.close()
+		if forget_aliases:
+			for alias in list(connections.settings):
+				if route_db.is_route_connection(connections[alias]):
+					del connections[alias]
+					del connections.settings[alias]
+		route_db._ensured.clear()
+		route_partitions._map_cache.clear()
+
+
+class RouteGenerationTests(RouteStorageTestMixin, TransactionTestCase):
+	"""Generations of the blue/green Route table and the swap between them."""
+
+	def test_routes_live_in_the_current_generation(self):
+		self.assertEqual(Route.objects.all().db, route_db.ROUTES_ALIAS)
+		self.assertTrue(Route.objects.exists())
+		self.assertFalse(Route.objects.using('default').exists())
+		live = route_db.current_generation()
+		self.assertEqual(os.path.dirname(live), route_db.generations_dir())
+		with sqlite3.connect(live) as reader:
+			self.assertEqual(reader.execute('SELECT COUNT(*) FROM main_route').fetchone()[0], Route.objects.count())
+
+	def test_readers_keep_the_table_they_opened_across_publish(self):
+		old_routes = list(Route.objects.order_by('id'))
+		reader = sqlite3.connect(route_db.link_path())
+		self.addCleanup(reader.close)
+		with route_db.new_generation() as generation:
+			save_routes_bulk(_copies(old_routes[::2]), using=generation.alias)
+			generation.publish()
+		self.assertEqual(reader.execute('SELECT COUNT(*) FROM main_route').fetchone()[0], len(old_routes))
+		new_ids = list(Route.objects.order_by('id').values_list('id', flat=True))
+		self.assertEqual(len(new_ids), len(old_routes[::2]))
+		# Ids continue after the previous generation's
+		self.assertGreater(new_ids[0], old_routes[-1].id)
+
+	def test_unpublished_generation_is_discarded(self):
+		live = route_db.current_generation()
+		count = Route.objects.count()
+		with route_db.new_generation() as generation:
+			save_routes_bulk(_copies(Route.objects.all()[:5]), using=generation.alias)
+			path = generation.path
+		self.assertFalse(os.path.exists(path))
+		self.assertEqual(route_db.current_generation(), live)
+		self.assertEqual(Route.objects.count(), count)
+
+	def test_old_generations_are_pruned(self):
+		for _ in range(3):
+			with route_db.new_generation() as generation:
+				generation.publish()
+		files = [name for name in os.listdir(route_db.generations_dir()) if name.endswith('.sqlite3')]
+		self.assertEqual(len(files), 2)
+		self.assertIn(os.path.basename(route_db.current_generation()), files)
+
+
+class RoutePartitionTests(RouteStorageTestMixin, TransactionTestCase):
+	"""Routes partitioned by origin region, and how Route queries are routed to them."""
+
+	partition_by_region = True
+
+	def test_partitions_hold_their_regions_origins(self):
+		pmap = route_partitions.partition_map()
+		aliases = route_partitions.ensure_partitions()
+		self.assertGreater(len(aliases), 1)
+		total = 0
+		for region, alias in aliases.items():
+			origins = {leg.partition(' - ')[0] for leg in Route.objects.using(alias).values_list('leg', flat=True)}
+			self.assertLessEqual(origins, set(pmap.airports_in(region)))
+			total += Route.objects.using(alias).count()
+		# The 'routes' alias reads the union of every partition
+		self.assertEqual(Route.objects.count(), total)
+
+	def test_for_leg_queries_only_the_origin_partition(self):
+		leg = Route.objects.values_list('leg', flat=True).first()
+		origin_alias = route_partitions.alias_for_leg(leg)
+		aliases = [route_db.ROUTES_ALIAS, *route_partitions.ensure_partitions().values()]
+		with ExitStack() as stack:
+			captures = {alias: stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases}
+			ids = sorted(Route.objects.for_leg(leg).values_list('id', flat=True))
+		self.assertEqual(ids, sorted(Route.objects.filter(leg=leg).values_list('id', flat=True)))
+		self.assertEqual({alias for alias, capture in captures.items() if len(capture)}, {origin_alias})
+
+	def test_writes_through_the_union_raise(self):
+		leg = Route.objects.values_list('leg', flat=True).first()
+		with self.assertRaises(NotSupportedError):
+			Route.objects.filter(leg=leg).delete()
+		with self.assertRaises(NotSupportedError):
+			Route.objects.filter(leg=leg).update(distance=0)
+		count = Route.objects.count()
+		deleted, _ = Route.objects.for_leg(leg).delete()
+		self.assertGreater(deleted, 0)
+		self.assertEqual(Route.objects.count(), count - deleted)
+
+	def test_new_routes_go_to_the_origin_partition(self):
+		leg = Route.objects.values_list('leg', flat=True).first()
+		Route.objects.for_leg(leg).delete()
+		ensure_pair_routes(*leg.split(' - '))
+		origin_alias = route_partitions.alias_for_leg(leg)
+		for alias in route_partitions.ensure_partitions().values():
+			found = Route.objects.using(alias).filter(leg=leg).exists()
+			self.assertEqual(found, alias == origin_alias, alias)
+
+
+class RoutePurgeChecks:
+	"""Set-based purges (route_purge) remove exactly the routes they target."""
+
+	def route_rows(self):
+		return set(Route.objects.values_list('id', 'leg', 'aircraft_type_id', 'provider_id'))
+
+	def assertPurged(self, purge, removed):
+		"""Run ``purge`` and check it deletes exactly the rows ``removed(row)`` selects."""
+		before = self.route_rows()
+		expected = {row for row in before if removed(row)}
+		self.assertTrue(expected)
+		deleted = purge()
+		self.assertEqual(self.route_rows(), before - expected)
+		return deleted, len(expected)
+
+	def test_purge_by_aircraft(self):
+		aircraft_id = Route.objects.values_list('aircraft_type_id', flat=True).first()
+		deleted, expected = self.assertPurged(
+			lambda: purge_routes(aircraft_ids=[aircraft_id]), lambda row: row[2] == aircraft_id,
+		)
+		self.assertEqual(deleted, expected)
+
+	def test_purge_by_provider(self):
+		provider_ids = list(CharterProvider.objects.order_by('id').values_list('id', flat=True)[:2])
+		deleted, expected = self.assertPurged(
+			lambda: purge_routes(provider_ids=provider_ids), lambda row: row[3] in provider_ids,
+		)
+		self.assertEqual(deleted, expected)
+
+	def test_purge_by_airport(self):
+		code = Route.objects.values_list('leg', flat=True).first().split(' - ')[0]
+		deleted, expected = self.assertPurged(
+			lambda: purge_routes(airport_codes=[code]), lambda row: code in row[1].split(' - '),
+		)
+		self.assertEqual(deleted, expected)
+
+	def test_purge_without_criteria_deletes_nothing(self):
+		count = Route.objects.count()
+		self.assertEqual(purge_routes(), 0)
+		self.assertEqual(Route.objects.count(), count)
+
+	def test_purge_orphan_routes(self):
+		legs = list(Route.objects.values_list('leg', flat=True).distinct()[:3])
+		destination = legs[0].split(' - ')[1]
+		Route.objects.for_leg(legs[0]).update(leg=f'QQQ - {destination}')
+		Route.objects.for_leg(legs[1]).update(aircraft_type_id=999999)
+		Route.objects.for_leg(legs[2]).update(provider_id=999999)
+		deleted, expected = self.assertPurged(
+			purge_orphan_routes,
+			lambda row: row[1].startswith('QQQ - ') or row[2] == 999999 or row[3] == 999999,
+		)
+		self.assertEqual(deleted, expected)
+
+	def test_delete_aircraft_with_routes(self):
+		aircraft = Aircraft.objects.filter(charter_providers__isnull=False).first()
+		provider_ids = set(aircraft.charter_providers.values_list('id', flat=True))
+		self.assertPurged(
+			lambda: delete_with_routes(aircraft),
+			lambda row: row[2] == aircraft.pk or row[3] in provider_ids,
+		)
+		self.assertFalse(Aircraft.objects.filter(pk=aircraft.pk).exists())
+		self.assertFalse(CharterProvider.objects.filter(pk__in=provider_ids).exists())
+
+	def test_delete_airport_with_routes(self):
+		code = Route.objects.values_list('leg', flat=True).first().split(' - ')[0]
+		airport = Airport.objects.get(iata_code=code)
+		provider_ids = set(airport.charter_providers.values_list('id', flat=True))
+		self.assertPurged(
+			lambda: delete_with_routes(airport),
+			lambda row: code in row[1].split(' - ') or row[3] in provider_ids,
+		)
+		self.assertFalse(Airport.objects.filter(pk=airport.pk).exists())
+
+	def test_truncate_routes(self):
+		count = Route.objects.count()
+		self.assertEqual(truncate_routes(), count)
+		self.assertFalse(Route.objects.exists())
+
+	def test_truncate_routes_sequence(self):
+		routes = list(Route.objects.order_by('id')[:2])
+		last_id = Route.objects.order_by('-id').values_list('id', flat=True).first()
+		truncate_routes(reset_sequence=False)
+		save_routes_bulk(_copies(routes[:1]))
+		self.assertGreater(Route.objects.get().id, last_id)
+		truncate_routes()
+		save_routes_bulk(_copies(routes[1:]))
+		self.assertEqual(Route.objects.get().id, 1)
+
+	def test_truncate_routes_vacuum(self):
+		if not route_db.enabled():
+			self.skipTest('VACUUM cannot run inside the test transaction')
+		truncate_routes(vacuum_after=True)
+		self.assertFalse(Route.objects.exists())
+		generations = os.listdir(route_db.generations_dir())
+		for alias in route_partitions.route_aliases():
+			live = os.path.basename(route_db.current_generation(alias))
+			self.assertEqual([name for name in generations if name.startswith(f'{alias}-')], [live])
+
+
+@override_settings(CACHES=SYNTHETIC_CACHES)
+class RoutePurgeTests(RoutePurgeChecks, TestCase):
+	"""Purges of the Route table in the default database."""
+
+	def setUp(self):
+		populate_database(generate_world(n_airports=16, n_aircraft=3, n_providers=6))
+		generate_routes_list()
+
+
+class BlueGreenRoutePurgeTests(RouteStorageTestMixin, RoutePurgeChecks, TransactionTestCase):
+	"""Purges of the current generation of blue/green route storage."""
+
+
+class PartitionedRoutePurgeTests(RouteStorageTestMixin, RoutePurgeChecks, TransactionTestCase):
+	"""Purges across the region partitions of blue/green route storage."""
+
+	partition_by_region = True
@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.urls import path
 from . import views
-from .airport_api import airport_lookup, airports_by_country
+
+if settings.ASYNC_API_VIEWS:
+    from .async_views import airport_list_api, airport_lookup, airports_by_country, route_records_api
+else:
+    from .airport_api import airport_lookup, airports_by_country
+    from .views import airport_list_api, route_records_api
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -11,9 +17,20 @@ urlpatterns = [
     path('edit-charter-provider/<int:pk>/', views.edit_charter_provider, name='edit_charter_provider'),
     path('api/airport-lookup/', airport_lookup, name='airport_lookup'),
     path('api/airports-by-country/', airports_by_country, name='airports_by_country'),
-    path('api/airports/', views.airport_list_api, name='airport_list_api'),
-    path('api/route-records/', views.route_records_api, name='route_records_api'),
+    path('api/airports/', airport_list_api, name='airport_list_api'),
+    path('api/route-records/', route_records_api, name='route_records_api'),
+    path('api/cache-stats/', views.cache_stats_api, name='cache_stats_api'),
+    path('api/routes/query/', views.route_query_api, name='route_query_api'),
+    path('api/scenarios/what-if/', views.scenario_api, name='scenario_api'),
+    path('api/routes/export/', views.route_export_view, name='route_export'),
+    path('api/routes/cost-matrix/', views.route_cost_matrix_view, name='route_cost_matrix'),
+    path('api/route-run-report/', views.route_run_report_api, name='route_run_report_api'),
     path('mode-tab/', views.mode_tab, name='mode_tab'),
+    path('fragments/airports/', views.airport_list_rows, name='airport_list_rows'),
+    path('fragments/aircraft/', views.aircraft_list_rows, name='aircraft_list_rows'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('debug/traces/', views.trace_list_view, name='trace_list'),
+    path('debug/traces/<str:trace_id>/', views.trace_detail_view, name='trace_detail'),
 
     # Delete endpoints
     path('delete-charter-provider/<int:pk>/', views.delete_charter_provider, name='delete_charter_provider'),
@@ -0,0 +1,53 @@
+"""
+Data version counters used to invalidate cached data.
+
+Each tracked model has its own counter, bumped by the post_save/post_delete
+receivers in main.signals. Counters live in the Django cache so every worker
+sharing the cache backend sees the same version.
+"""
+
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = 'data-version:'
+
+# Global version covering every table the JSON APIs read from.
+DATA_VERSION = 'data'
+
+
+def _initial_version() -> int:
+    # Seed from the clock so a counter evicted from the cache never restarts
+    # at a value an older cache entry was built against.
+    return time.time_ns() // 1000
+
+
+def get_version(name: str) -> int:
+    """Return the current version of the named data set."""
+    key = VERSION_KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*names: str) -> None:
+    """
+    Invalidate everything built against the named data sets.
+
+    Backends such as FileBasedCache implement incr() as a read followed by a
+    write, so two processes bumping at once could both store N+1 and leave
+    entries cached in between reachable. The increment runs under a
+    cross-process file lock per counter.
+    """
+    from operational_functions.single_flight import file_lock
+
+    for name in names:
+        key = VERSION_KEY_PREFIX + name
+        with file_lock(f'version:{name}'):
+            cache.add(key, _initial_version(), timeout=None)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _initial_version(), timeout=None)
@@ -1,7 +1,30 @@
 from .models import Route
-from operational_functions.routes_utils import calculate_route_on_the_fly, generate_routes_list, update_routes_on_change
+from operational_functions.routes_utils import ensure_pair_routes, generate_routes_list, update_routes_on_change
+from operational_functions.route_export import EXPORT_FORMATS, stream_routes
+from operational_functions.route_purge import delete_with_routes
+from operational_functions.run_report import get_latest_report
+from operational_functions.tracing import ring_buffer, span
 from django.views.decorators.csrf import csrf_exempt
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from .response_cache import cache_json_response, cache_stats
+from .versioning import get_version
+
+
+def _route_records_cache_key(request):
+	import json
+	if request.method != 'POST':
+		return None
+	try:
+		data = json.loads(request.body.decode('utf-8'))
+	except ValueError:
+		return None
+	if not isinstance(data, dict) or not data.get('departure') or not data.get('arrival'):
+		return None
+	return (data['departure'], data['arrival'])
+
+
 @csrf_exempt
+@cache_json_response('route_records_api', key_func=_route_records_cache_key)
 def route_records_api(request):
 	"""API endpoint to fetch all Route records for a given departure and arrival airport."""
 	if request.method != 'POST':
@@ -15,37 +38,53 @@ def route_records_api(request):
 			return JsonResponse({'error': 'Both departure and arrival required'}, status=400)
 		# Find all matching Route records (leg = 'DEP-ARR')
 		leg = f"{departure} - {arrival}"
-		routes = Route.objects.filter(leg=leg)
+		routes = Route.objects.for_leg(leg).select_related('aircraft_type', 'provider')
 		results = []
-		if not routes.exists():
-			calculate_route_on_the_fly(departure, arrival)
-			routes = Route.objects.filter(leg=leg)
-		for r in routes:
-			results.append({
-				'id': r.id,
-				'leg': r.leg,
-				'distance': r.distance,
-				'aircraft_type': str(r.aircraft_type),
-				'provider': str(r.provider),
-				'flight_time': r.flight_time,
-				'adjusted_flight_time': r.adjusted_flight_time,
-				'max_payload': r.max_payload,
-				'service_type': r.service_type,
-				'block_hours_cost': float(r.block_hours_cost),
-				'route_fuel_gls': r.route_fuel_gls,
-				'fuel_cost': float(r.fuel_cost),
-				'overflight_fee': float(r.overflight_fee),
-				'overflight_cost': float(r.overflight_cost),
-				'airport_fees_cost': float(r.airport_fees_cost),
-				'total_flight_cost': float(r.total_flight_cost),
-			})
-		return JsonResponse({'routes': results})
+		with span('orm.route_exists', leg=leg):
+			found = routes.exists()
+		if not found:
+			ensure_pair_routes(departure, arrival)
+			routes = Route.objects.for_leg(leg).select_related('aircraft_type', 'provider')
+		with span('orm.fetch_routes') as fetch_span:
+			routes = list(routes)
+			fetch_span.set_attribute('rows', len(routes))
+		with span('serialize'):
+			results = [_route_record(r) for r in routes]
+		with span('json_encode'):
+			return JsonResponse({'routes': results})
 	except Exception as e:
 		return JsonResponse({'error': str(e)}, status=500)
+
+
+def _route_record(r):
+	return {
+		'id': r.id,
+		'leg': r.leg,
+		'distance': r.distance,
+		'aircraft_type': str(r.aircraft_type),
+		'provider': str(r.provider),
+		'flight_time': r.flight_time,
+		'adjusted_flight_time': r.adjusted_flight_time,
+		'max_payload': r.max_payload,
+		'service_type': r.service_type,
+		'block_hours_cost': float(r.block_hours_cost),
+		'route_fuel_gls': r.route_fuel_gls,
+		'fuel_cost': float(r.fuel_cost),
+		'overflight_fee': float(r.overflight_fee),
+		'overflight_cost': float(r.overflight_cost),
+		'airport_fees_cost': float(r.airport_fees_cost),
+		'total_flight_cost': float(r.total_flight_cost),
+	}
+
+
 # --- Airport list API for Routes tab ---
-from django.http import JsonResponse
-from .models import Airport
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from .models import Aircraft, Airport
 
+@cache_json_response('airport_list_api')
 def airport_list_api(request):
 	airports = Airport.objects.all().order_by('iata_code')
 	data = [
@@ -53,7 +92,159 @@ def airport_list_api(request):
 		for a in airports
 	]
 	return JsonResponse({'airports': data})
-from django.http import JsonResponse, HttpResponseNotAllowed
+
+
+def cache_stats_api(request):
+	return JsonResponse({'views': cache_stats()})
+
+
+def metrics_view(request):
+	"""Prometheus scrape endpoint."""
+	return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+def trace_list_view(request):
+	"""Recent sampled request traces (DEBUG only), newest first, without span detail."""
+	if not settings.DEBUG:
+		raise Http404
+	traces = [
+		{key: trace[key] for key in ('trace_id', 'started_at', 'name', 'duration_ms', 'attributes')}
+		for trace in ring_buffer().recent()
+	]
+	return JsonResponse({'traces': traces})
+
+
+def trace_detail_view(request, trace_id):
+	"""One sampled trace with all of its spans (DEBUG only)."""
+	if not settings.DEBUG:
+		raise Http404
+	trace = ring_buffer().get(trace_id)
+	if trace is None:
+		raise Http404
+	return JsonResponse({'trace': trace}, json_dumps_params={'default': str})
+
+
+def route_export_view(request):
+	"""Stream the route table as CSV (default), Parquet or Arrow IPC: ?format=csv|parquet|arrow[&leg=AAA - BBB]."""
+	file_format = request.GET.get('format', 'csv')
+	if file_format not in EXPORT_FORMATS:
+		return JsonResponse({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}, status=400)
+	try:
+		chunks = stream_routes(file_format, leg=request.GET.get('leg') or None)
+	except ImportError as e:
+		return JsonResponse({'error': str(e)}, status=501)
+	content_type, extension = EXPORT_FORMATS[file_format]
+	response = StreamingHttpResponse(chunks, content_type=content_type)
+	response['Content-Disposition'] = f'attachment; filename="routes.{extension}"'
+	return response
+
+
+def route_cost_matrix_view(request):
+	"""
+	Cheapest total cost of every origin x destination pair as one binary float32
+	matrix: ?service_type=charter|acmi[&aircraft=<id>]. gzip-encoded when the
+	client accepts it; revalidate with If-None-Match. Layout:
+	operational_functions.cost_matrix.
+	"""
+	import gzip
+	try:
+		from operational_functions import cost_matrix
+	except ImportError as e:
+		return JsonResponse({'error': str(e)}, status=501)
+	service_type = request.GET.get('service_type')
+	if service_type not in cost_matrix.SERVICE_TYPES:
+		return JsonResponse({'error': f'service_type must be one of {", ".join(cost_matrix.SERVICE_TYPES)}'}, status=400)
+	aircraft_id = request.GET.get('aircraft') or None
+	if aircraft_id is not None:
+		try:
+			aircraft_id = int(aircraft_id)
+		except ValueError:
+			return JsonResponse({'error': 'aircraft must be an Aircraft id'}, status=400)
+		if not Aircraft.objects.filter(pk=aircraft_id).exists():
+			return JsonResponse({'error': 'Aircraft not found'}, status=404)
+
+	gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+	# The two encodings are different representations, so they get different tags
+	suffix = '' if gzipped else '-identity'
+	etag = quote_etag(cost_matrix.payload_etag(service_type, aircraft_id) + suffix)
+	if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+		response = HttpResponseNotModified()
+	else:
+		try:
+			with span('cost_matrix.payload', service_type=service_type, aircraft=aircraft_id):
+				payload_etag, payload = cost_matrix.matrix_payload(service_type, aircraft_id)
+		except cost_matrix.MatricesChanged as e:
+			response = JsonResponse({'error': str(e)}, status=503)
+			response['Retry-After'] = '1'
+			return response
+		etag = quote_etag(payload_etag + suffix)
+		response = HttpResponse(payload if gzipped else gzip.decompress(payload), content_type='application/octet-stream')
+		if gzipped:
+			response['Content-Encoding'] = 'gzip'
+	response['ETag'] = etag
+	response['Cache-Control'] = 'no-cache'
+	patch_vary_headers(response, ('Accept-Encoding',))
+	return response
+
+
+@csrf_exempt
+def route_query_api(request):
+	"""
+	Analytical queries over the in-memory columnar route store.
+
+	POST JSON: {"filters": {"service_type": "acmi", "total_flight_cost__lt": 80000,
+	"origin_region": "South-Central America"}, "order_by": "cost_per_nm", "limit": 20}
+	or {"filters": {...}, "group_by": "provider", "value": "total_flight_cost"}.
+	"""
+	if request.method != 'POST':
+		return JsonResponse({'error': 'POST required'}, status=405)
+	import json
+	try:
+		from operational_functions.route_store import run_query
+	except ImportError as e:
+		return JsonResponse({'error': str(e)}, status=501)
+	try:
+		spec = json.loads(request.body.decode('utf-8') or '{}')
+		if not isinstance(spec, dict) or not isinstance(spec.get('filters', {}), dict):
+			raise ValueError('Expected a JSON object with an optional "filters" object')
+		with span('route_store.query'):
+			return JsonResponse(run_query(spec))
+	except (ValueError, TypeError) as e:
+		return JsonResponse({'error': str(e)}, status=400)
+
+
+@csrf_exempt
+def scenario_api(request):
+	"""
+	What-if pricing of the route network without writing to the database.
+
+	POST JSON: {"overrides": [{"parameter": "fuel_cost_gl", "region": "Caribbean", "pct": 15}, ...],
+	"top": 20}. See operational_functions.scenarios for parameters and selectors.
+	"""
+	if request.method != 'POST':
+		return JsonResponse({'error': 'POST required'}, status=405)
+	import json
+	try:
+		from operational_functions.scenarios import run_scenario
+	except ImportError as e:
+		return JsonResponse({'error': str(e)}, status=501)
+	try:
+		spec = json.loads(request.body.decode('utf-8') or '{}')
+		if not isinstance(spec, dict) or not isinstance(spec.get('overrides', []), list):
+			raise ValueError('Expected a JSON object with an "overrides" list')
+		with span('scenarios.run'):
+			return JsonResponse(run_scenario(spec))
+	except (ValueError, TypeError) as e:
+		return JsonResponse({'error': str(e)}, status=400)
+
+
+def route_run_report_api(request):
+	"""Latest route generation run report (stage timings, counts, skip reasons)."""
+	report = get_latest_report()
+	if report is None:
+		return JsonResponse({'error': 'No route generation run recorded yet'}, status=404)
+	return JsonResponse({'report': report})
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, redirect
 from .forms import AircraftForm, AirportForm, CharterProviderForm
@@ -65,7 +256,7 @@ def delete_charter_provider(request, pk):
 	if request.method == 'POST':
 		try:
 			provider = CharterProvider.objects.get(pk=pk)
-			provider.delete()
+			delete_with_routes(provider)
 			return JsonResponse({'success': True})
 		except CharterProvider.DoesNotExist:
 			return JsonResponse({'success': False, 'error': 'Provider not found'}, status=404)
@@ -103,7 +294,7 @@ def edit_charter_provider(request, pk):
 		}
 		return JsonResponse({'success': True, 'data': form_data})
 	
-	providers = CharterProvider.objects.all().order_by('name')
+	providers = CharterProvider.objects.select_related('country', 'main_base', 'aircraft').order_by('name')
 	return render(request, 'mode.html', {'form': form, 'providers': providers, 'editing': True, 'editing_id': pk})
 
 @csrf_exempt
@@ -111,7 +302,7 @@ def delete_airport(request, pk):
 	if request.method == 'POST':
 		try:
 			airport = Airport.objects.get(pk=pk)
-			airport.delete()
+			delete_with_routes(airport)
 			return JsonResponse({'success': True})
 		except Airport.DoesNotExist:
 			return JsonResponse({'success': False, 'error': 'Airport not found'}, status=404)
@@ -122,14 +313,14 @@ def delete_aircraft(request, pk):
 	if request.method == 'POST':
 		try:
 			aircraft = Aircraft.objects.get(pk=pk)
-			aircraft.delete()
+			delete_with_routes(aircraft)
 			return JsonResponse({'success': True})
 		except Aircraft.DoesNotExist:
 			return JsonResponse({'success': False, 'error': 'Aircraft not found'}, status=404)
 	return HttpResponseNotAllowed(['POST'])
 
 def mode_tab(request):
-	providers = CharterProvider.objects.all().order_by('name')
+	providers = CharterProvider.objects.select_related('country', 'main_base', 'aircraft').order_by('name')
 	if request.method == 'POST':
 		form = CharterProviderForm(request.POST)
 		if form.is_valid():
@@ -181,13 +372,62 @@ def edit_airport(request, pk):
 		form = AirportForm(instance=airport)
 	return render(request, 'add_airport.html', {'form': form, 'edit_mode': True, 'airport_id': pk})
 
+# Rows per page of the home page's airport and aircraft lists
+LIST_PAGE_SIZE = 50
+
+
+def _list_page(queryset, version_name, number):
+	"""
+	One page of a list table for *_list_rows.html. ``rows`` is a lazy slice,
+	only run when the template fragment cache (keyed on ``version``) misses.
+	"""
+	offset = (number - 1) * LIST_PAGE_SIZE
+	return {
+		'rows': queryset[offset:offset + LIST_PAGE_SIZE],
+		'number': number,
+		'size': LIST_PAGE_SIZE,
+		'version': get_version(version_name),
+	}
+
+
+def _airport_page(number=1):
+	return _list_page(Airport.objects.order_by('country', 'city', 'name', 'id'), 'airport', number)
+
+
+def _aircraft_page(number=1):
+	return _list_page(Aircraft.objects.order_by('manufacturer', 'model', 'short_name', 'id'), 'aircraft', number)
+
+
+def _page_number(request):
+	try:
+		number = int(request.GET.get('page', 1))
+	except ValueError:
+		return None
+	return number if number >= 1 else None
+
+
+def airport_list_rows(request):
+	"""Rows of one page of the airport list (?page=N), appended by the home page on scroll."""
+	number = _page_number(request)
+	if number is None:
+		return HttpResponseBadRequest('page must be a positive integer')
+	return render(request, 'airport_list_rows.html', {'airport_page': _airport_page(number)})
+
+
+def aircraft_list_rows(request):
+	"""Rows of one page of the aircraft list (?page=N), appended by the home page on scroll."""
+	number = _page_number(request)
+	if number is None:
+		return HttpResponseBadRequest('page must be a positive integer')
+	return render(request, 'aircraft_list_rows.html', {'aircraft_page': _aircraft_page(number)})
+
+
 def home(request):
 	# Populate routes if empty on initial page load
 	if not Route.objects.exists():
 		generate_routes_list()
-	airports = Airport.objects.all().order_by('country', 'city', 'name')
-	aircraft_list = Aircraft.objects.all().order_by('manufacturer', 'model', 'short_name')
-	return render(request, 'home.html', {'airports': airports, 'aircraft_list': aircraft_list})
+	# First page of each list only; further rows are fetched on scroll
+	return render(request, 'home.html', {'airport_page': _airport_page(), 'aircraft_page': _aircraft_page()})
 
 
 def add_aircraft(request):
@@ -209,7 +449,6 @@ def add_aircraft(request):
 
 
 def add_airport(request):
-	airports = Airport.objects.all().order_by('country', 'city', 'name')
 	if request.method == 'POST':
 		form = AirportForm(request.POST)
 		if form.is_valid():
@@ -221,4 +460,4 @@ def add_airport(request):
 			return redirect('home')
 	else:
 		form = AirportForm()
-	return render(request, 'add_airport.html', {'form': form, 'airports': airports})
+	return render(request, 'add_airport.html', {'form': form})
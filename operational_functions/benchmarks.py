@@ -0,0 +1,306 @@
+"""
+Synthetic-scale benchmarks for the route engine and the route records API.
+
+Each scale runs in its own throwaway database seeded by synthetic_world, with
+DEBUG off so the SQL debug cursor does not distort insert timings. Results are
+plain JSON so runs from different commits can be compared with
+compare_results().
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from dataclasses import astuple, fields, make_dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import django
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from main.models import Route
+from operational_functions.route_purge import purge_routes
+from operational_functions.routes_utils import (
+    RouteMetrics,
+    calculate_route_on_the_fly,
+    create_route_objects,
+    generate_all_route_metrics,
+    load_all_data,
+    precompute_distances,
+    save_routes_bulk,
+)
+from operational_functions.synthetic_world import synthetic_database
+
+DEFAULT_SCALES = (100, 500, 2000)
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def _timed(fn: Callable[[], Any]) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def _summary(runs: List[float], rows: Optional[int] = None) -> Dict[str, Any]:
+    seconds = statistics.median(runs)
+    entry: Dict[str, Any] = {'seconds': seconds, 'runs': runs}
+    if rows is not None:
+        entry['rows'] = rows
+        entry['rows_per_second'] = rows / seconds if seconds else None
+    return entry
+
+
+def _percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _traced(build: Callable[[], Any]) -> tuple:
+    """(bytes still allocated after build(), its result)."""
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = build()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def route_metrics_memory(generate: Callable[[], List[RouteMetrics]], sample: int = 100_000) -> Dict[str, Any]:
+    """
+    Memory retained per route by generate(), and the per-instance saving of
+    the slotted RouteMetrics over an equivalent __dict__-based dataclass.
+
+    The comparison rebuilds a sample with both classes from the same field
+    values, so only the instance overhead differs.
+    """
+    retained, metrics = _traced(generate)
+    routes = len(metrics)
+    legacy_class = make_dataclass('LegacyRouteMetrics', [(f.name, f.type) for f in fields(RouteMetrics)])
+    rows = [astuple(m) for m in metrics[:sample]]
+    del metrics[sample:]
+    n = len(rows) or 1
+    slotted, kept = _traced(lambda: [RouteMetrics(*row) for row in rows])
+    del kept
+    legacy, kept = _traced(lambda: [legacy_class(*row) for row in rows])
+    del kept
+    return {
+        'routes': routes,
+        'bytes_per_route': retained / max(routes, 1),
+        'instance_bytes': slotted / n,
+        'legacy_instance_bytes': legacy / n,
+        'saved_mib_per_million': (legacy - slotted) / n * 1_000_000 / 1048576,
+    }
+
+
+def _truncate_routes() -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {Route._meta.db_table}')
+
+
+def benchmark_scale(
+    n_airports: int,
+    n_aircraft: int = 6,
+    n_providers: int = 6,
+    seed: int = 24,
+    repeat: int = 3,
+    max_insert_rows: int = 200_000,
+    api_requests: int = 50,
+) -> Dict[str, Any]:
+    """
+    Benchmark every pipeline layer and the route records API at one scale.
+
+    Args:
+        n_airports, n_aircraft, n_providers, seed: Synthetic world parameters
+        repeat: Runs per in-memory layer (the median is reported)
+        max_insert_rows: Cap on routes converted and inserted, to keep large scales tractable
+        api_requests: Requests per route records API scenario
+
+    Returns:
+        Dict with world counts and per-benchmark timings
+    """
+    with synthetic_database(n_airports, n_aircraft, n_providers, seed):
+        runs = []
+        for _ in range(repeat):
+            seconds, loaded = _timed(load_all_data)
+            runs.append(seconds)
+        airports, aircraft, providers, providers_by_aircraft, _ = loaded
+        results: Dict[str, Any] = {
+            'load_all_data': _summary(runs, len(airports) + len(aircraft) + len(providers)),
+        }
+
+        with tempfile.TemporaryDirectory() as snapshot_dir, override_settings(WORLD_SNAPSHOT_DIR=snapshot_dir):
+            load_all_data(use_snapshot=True)  # writes the snapshot
+            runs = []
+            for _ in range(repeat):
+                seconds, _ = _timed(lambda: load_all_data(use_snapshot=True))
+                runs.append(seconds)
+        results['load_all_data_snapshot'] = _summary(runs, len(airports) + len(aircraft) + len(providers))
+
+        runs = []
+        for _ in range(repeat):
+            seconds, distances = _timed(lambda: precompute_distances(airports))
+            runs.append(seconds)
+        results['precompute_distances'] = _summary(runs, len(distances))
+
+        runs = []
+        for _ in range(repeat):
+            seconds, metrics = _timed(lambda: generate_all_route_metrics(
+                airports, aircraft, providers_by_aircraft, distances, set(), skip_existing=False,
+            ))
+            runs.append(seconds)
+        results['generate_all_route_metrics'] = _summary(runs, len(metrics))
+
+        runs = []
+        for _ in range(repeat):
+            seconds, unmemoized = _timed(lambda: generate_all_route_metrics(
+                airports, aircraft, providers_by_aircraft, distances, set(), skip_existing=False,
+                memoize=False,
+            ))
+            runs.append(seconds)
+        results['route_metrics_unmemoized'] = _summary(runs, len(unmemoized))
+        del unmemoized
+        metrics = metrics[:max_insert_rows]
+
+        runs = []
+        for _ in range(repeat):
+            seconds, route_objects = _timed(lambda: create_route_objects(metrics, aircraft))
+            runs.append(seconds)
+        results['create_route_objects'] = _summary(runs, len(route_objects))
+
+        runs = []
+        for _ in range(repeat):
+            _truncate_routes()
+            route_objects = create_route_objects(metrics, aircraft)
+            seconds, created = _timed(lambda: save_routes_bulk(route_objects))
+            runs.append(seconds)
+        results['save_routes_bulk'] = _summary(runs, created)
+
+        # On-the-fly: drop every route touching one airport, as if it were newly added
+        codes = sorted(airports)
+        rng = random.Random(seed)
+        new_code, other_code = rng.sample(codes, 2)
+        purge_routes(airport_codes=[new_code])
+        seconds, report = _timed(lambda: calculate_route_on_the_fly(new_code, other_code))
+        results['calculate_route_on_the_fly'] = _summary([seconds], report.routes_created)
+
+        legs = list(Route.objects.values_list('leg', flat=True).distinct()[:api_requests])
+        client = Client(HTTP_HOST='localhost')
+        for scenario in ('route_records_api_cold', 'route_records_api_warm'):
+            latencies = []
+            for leg in legs:
+                departure, arrival = leg.split(' - ')
+                body = json.dumps({'departure': departure, 'arrival': arrival})
+                seconds, response = _timed(lambda: client.post(
+                    '/api/route-records/', body, content_type='application/json',
+                ))
+                latencies.append(seconds)
+            if latencies:
+                entry = _summary(latencies)
+                entry['p50'] = _percentile(latencies, 50)
+                entry['p95'] = _percentile(latencies, 95)
+                entry['requests'] = len(latencies)
+                results[scenario] = entry
+
+        memory = route_metrics_memory(lambda: generate_all_route_metrics(
+            airports, aircraft, providers_by_aircraft, distances, set(), skip_existing=False,
+        ))
+
+        return {
+            'world': {
+                'airports': len(airports),
+                'aircraft': len(aircraft),
+                'providers': len(providers),
+                'seed': seed,
+            },
+            'benchmarks': results,
+            'route_metrics_memory': memory,
+        }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    scales: Sequence[int] = DEFAULT_SCALES,
+    progress: Optional[Callable[[str], None]] = None,
+    **scale_kwargs: Any,
+) -> Dict[str, Any]:
+    """Run benchmark_scale() for each airport count and wrap the results with run metadata."""
+    results: Dict[str, Any] = {
+        'format': RESULTS_FORMAT_VERSION,
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+            'options': dict(scale_kwargs),
+        },
+        'scales': {},
+    }
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost']):
+        for n_airports in scales:
+            if progress:
+                progress(f'Benchmarking {n_airports} airports...')
+            results['scales'][str(n_airports)] = benchmark_scale(n_airports, **scale_kwargs)
+    return results
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Format a per-benchmark comparison (ratio < 1.0 means current is faster)."""
+    lines = [f"{'scale':>6}  {'benchmark':<28}{'baseline':>12}{'current':>12}{'ratio':>8}"]
+    for scale, entry in current['scales'].items():
+        base_entry = baseline.get('scales', {}).get(scale)
+        if base_entry is None:
+            continue
+        for name, timing in entry['benchmarks'].items():
+            base_timing = base_entry['benchmarks'].get(name)
+            if base_timing is None:
+                continue
+            ratio = timing['seconds'] / base_timing['seconds'] if base_timing['seconds'] else float('nan')
+            lines.append(
+                f"{scale:>6}  {name:<28}{base_timing['seconds']:>11.4f}s{timing['seconds']:>11.4f}s{ratio:>8.2f}"
+            )
+    return lines
+
+
+def format_results(results: Dict[str, Any]) -> List[str]:
+    lines = []
+    for scale, entry in results['scales'].items():
+        world = entry['world']
+        lines.append(f"{scale} airports ({world['aircraft']} aircraft, {world['providers']} providers):")
+        for name, timing in entry['benchmarks'].items():
+            line = f"  {name:<28}{timing['seconds']:>11.4f}s"
+            if timing.get('rows') is not None:
+                line += f"  {timing['rows']:>10} rows"
+                if timing.get('rows_per_second'):
+                    line += f"  {timing['rows_per_second']:>12,.0f} rows/s"
+            if 'p95' in timing:
+                line += f"  p50 {timing['p50'] * 1000:.1f}ms  p95 {timing['p95'] * 1000:.1f}ms"
+            lines.append(line)
+        memory = entry.get('route_metrics_memory')
+        if memory:
+            lines.append(
+                f"  {'route_metrics_memory':<28}{memory['bytes_per_route']:>8.0f} B/route retained  "
+                f"instance {memory['instance_bytes']:.0f} B (dict-based {memory['legacy_instance_bytes']:.0f} B)  "
+                f"saves {memory['saved_mib_per_million']:.1f} MiB per million routes"
+            )
+    return lines
@@ -1,10 +1,9 @@
-
 import os
 import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'financialsim.settings')
 django.setup()
-from main.models import Route
+from operational_functions.route_purge import truncate_routes
 
 if __name__ == "__main__":
-    count, _ = Route.objects.all().delete()
+    count = truncate_routes()
     print(f"Deleted {count} Route records.")
@@ -0,0 +1,123 @@
+"""
+Origin x destination minimum-cost matrix in a compact binary format.
+
+One payload carries the cheapest total_flight_cost of every airport pair for
+a service type (optionally for one aircraft type), read from the shared
+``costs`` matrices (shared_matrices). A 2,000-airport network is a 16 MB
+float32 matrix, a few MB gzipped, instead of millions of JSON route rows.
+
+Payload layout (before gzip), little-endian:
+
+    4 bytes   magic b'ODM1'
+    4 bytes   uint32 header length H
+    H bytes   UTF-8 JSON header, space-padded so the matrix starts on a
+              4-byte boundary: {"codes": [...], "shape": [n, n],
+              "dtype": "<f4", "service_type": ..., "aircraft_id": ...,
+              "version": ...}
+    n*n*4     float32 matrix, row = origin, column = destination, in
+              ``codes`` order; NaN where there is no route
+
+In a browser: new Float32Array(buffer, 8 + H, n * n). In Python:
+decode_payload().
+
+Compressed payloads are materialized next to the matrices they were built
+from, so each version is encoded and compressed once for every worker.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from operational_functions.shared_matrices import (
+    SERVICE_TYPES,
+    MatrixSet,
+    attach,
+    costs_set_name,
+    costs_version,
+    get_shared_matrices,
+)
+
+MAGIC = b'ODM1'
+_PREFIX = struct.Struct('<4sI')
+
+GZIP_LEVEL = 6
+
+
+class MatricesChanged(RuntimeError):
+    """The matrix sets were replaced while a payload was being read; retrying succeeds."""
+
+
+def payload_etag(service_type: str, aircraft_id: Optional[int] = None) -> str:
+    """ETag of the payload for the current data, without building anything."""
+    return f'{costs_set_name(aircraft_id)}-{service_type}-{costs_version()}'
+
+
+def encode_payload(matrix: np.ndarray, codes: List[str], header: Dict[str, Any]) -> bytes:
+    header = {**header, 'codes': codes, 'shape': list(matrix.shape), 'dtype': '<f4'}
+    encoded = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    encoded += b' ' * (-(_PREFIX.size + len(encoded)) % 4)
+    return _PREFIX.pack(MAGIC, len(encoded)) + encoded + np.ascontiguousarray(matrix, dtype='<f4').tobytes()
+
+
+def decode_payload(payload: bytes) -> Tuple[Dict[str, Any], np.ndarray]:
+    """Header and matrix of a payload (gzipped or not)."""
+    if payload[:2] == b'\x1f\x8b':
+        payload = gzip.decompress(payload)
+    magic, length = _PREFIX.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError('Not an O/D cost matrix payload')
+    header = json.loads(payload[_PREFIX.size:_PREFIX.size + length])
+    matrix = np.frombuffer(payload, dtype='<f4', offset=_PREFIX.size + length).reshape(header['shape'])
+    return header, matrix
+
+
+def _build(costs: MatrixSet, world: MatrixSet, service_type: str, aircraft_id: Optional[int]) -> bytes:
+    matrix = costs['min_cost'][SERVICE_TYPES.index(service_type)]
+    header = {'service_type': service_type, 'aircraft_id': aircraft_id, 'version': costs.version}
+    raw = encode_payload(matrix, world['airport_codes'].tolist(), header)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def matrix_payload(service_type: str, aircraft_id: Optional[int] = None) -> Tuple[str, bytes]:
+    """ETag and gzipped payload of the current minimum-cost matrix."""
+    from operational_functions.single_flight import file_lock
+
+    if service_type not in SERVICE_TYPES:
+        raise ValueError(f'service_type must be one of {", ".join(SERVICE_TYPES)}')
+    matrices = get_shared_matrices()
+    costs = matrices.costs(aircraft_id)
+    world = matrices.world()
+    if world.version != costs.meta['world_version']:
+        # Airports changed since the costs were looked up: index them with the world they were built on
+        world = attach('world', costs.meta['world_version'])
+        if world is None:
+            raise MatricesChanged('Route matrices changed while reading them; retry')
+    path = os.path.join(costs.path, f'payload-{service_type}.odm.gz')
+    etag = f'{costs.name}-{service_type}-{costs.version}'
+    try:
+        with open(path, 'rb') as fh:
+            return etag, fh.read()
+    except FileNotFoundError:
+        pass
+    with file_lock(f'matrices:payload:{costs.name}:{service_type}'):
+        try:
+            with open(path, 'rb') as fh:
+                return etag, fh.read()
+        except FileNotFoundError:
+            pass
+        payload = _build(costs, world, service_type, aircraft_id)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as fh:
+                fh.write(payload)
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # The set was pruned meanwhile; serve without materializing
+            pass
+    return etag, payload
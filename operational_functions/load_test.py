@@ -0,0 +1,258 @@
+"""
+Asyncio HTTP load generator for a locally running financialsim server.
+
+Virtual users issue a weighted mix of requests against the server:
+
+    lookup    Routes tab lookup for an airport pair that has routes
+    airports  Airport list for the Routes tab dropdowns
+    edit      No-op charter provider edit, which triggers route regeneration
+    miss      Routes tab lookup for a pair with no routes (on-the-fly path);
+              each request takes a pair no earlier request used, since the
+              first lookup stores the pair's routes. When the plan's pairs
+              run out, the scenario is dropped from the mix.
+
+Requests use a minimal HTTP/1.1 client over asyncio streams (one connection
+per request), so no third-party packages or external services are needed.
+The edit scenario writes to the server's database: point it at a copy.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+SCENARIOS = ('lookup', 'airports', 'edit', 'miss')
+
+DEFAULT_MIX = {'lookup': 70, 'airports': 20, 'edit': 2, 'miss': 8}
+
+
+def parse_mix(spec: str) -> Dict[str, int]:
+    """Parse 'lookup=70,airports=20,...' into scenario weights."""
+    mix = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f'Unknown scenario {name!r}; expected one of {", ".join(SCENARIOS)}')
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise ValueError('At least one scenario needs a positive weight')
+    return mix
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+@dataclass
+class Response:
+    status: int
+    headers: Dict[str, List[str]]
+    body: bytes
+
+
+class HttpClient:
+    """Just enough HTTP/1.1 for the load test: one request per connection."""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or '127.0.0.1'
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes = b'',
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout,
+        )
+        try:
+            lines = [
+                f'{method} {path} HTTP/1.1',
+                f'Host: {self.host}:{self.port}',
+                'Connection: close',
+                f'Content-Length: {len(body)}',
+            ]
+            if self.cookies:
+                lines.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+            for name, value in (headers or {}).items():
+                lines.append(f'{name}: {value}')
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), self.timeout)
+        finally:
+            writer.close()
+        head, _, payload = raw.partition(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        response_headers: Dict[str, List[str]] = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            response_headers.setdefault(name.strip().lower(), []).append(value.strip())
+        for cookie in response_headers.get('set-cookie', []):
+            name, _, rest = cookie.partition('=')
+            self.cookies[name] = rest.split(';', 1)[0]
+        return Response(int(status_line.split()[1]), response_headers, payload)
+
+
+@dataclass
+class Plan:
+    """Inputs for the scenarios, read from the database before the run."""
+    routed_pairs: List[Tuple[str, str]]
+    unrouted_pairs: List[Tuple[str, str]]
+    provider_ids: List[int]
+
+
+def build_plan(max_pairs: int = 5000, seed: int = 24) -> Plan:
+    """Pick lookup pairs, miss pairs and providers from the local database."""
+    from main.models import Airport, CharterProvider, Route
+
+    rng = random.Random(seed)
+    legs = set(Route.objects.values_list('leg', flat=True).distinct())
+    codes = list(Airport.objects.values_list('iata_code', flat=True))
+    routed = [tuple(leg.split(' - ')) for leg in legs]
+    unrouted = []
+    for _ in range(max_pairs * 4):
+        if len(codes) < 2 or len(unrouted) >= max_pairs:
+            break
+        pair = tuple(rng.sample(codes, 2))
+        if f'{pair[0]} - {pair[1]}' not in legs:
+            unrouted.append(pair)
+    rng.shuffle(routed)
+    return Plan(routed[:max_pairs], unrouted, list(CharterProvider.objects.values_list('pk', flat=True)))
+
+
+@dataclass
+class Results:
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    errors: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    elapsed: float = 0.0
+    # Scenarios dropped mid-run because their inputs ran out
+    exhausted: List[str] = field(default_factory=list)
+
+    def record(self, scenario: str, seconds: float, error: Optional[str] = None) -> None:
+        self.latencies.setdefault(scenario, []).append(seconds)
+        if error:
+            counts = self.errors.setdefault(scenario, {})
+            counts[error] = counts.get(error, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for scenario, latencies in sorted(self.latencies.items()):
+            summary[scenario] = {
+                'requests': len(latencies),
+                'errors': sum(self.errors.get(scenario, {}).values()),
+                'throughput': len(latencies) / self.elapsed if self.elapsed else 0.0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies),
+            }
+        return summary
+
+    def format(self) -> List[str]:
+        total = sum(len(v) for v in self.latencies.values())
+        lines = [
+            f'{total} requests in {self.elapsed:.1f}s ({total / self.elapsed if self.elapsed else 0:.1f} req/s)',
+            f"{'scenario':<10}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+        ]
+        for scenario, row in self.summary().items():
+            lines.append(
+                f"{scenario:<10}{row['requests']:>9}{row['errors']:>8}{row['throughput']:>9.1f}"
+                f"{row['p50'] * 1000:>10.1f}{row['p95'] * 1000:>10.1f}{row['p99'] * 1000:>10.1f}{row['max'] * 1000:>10.1f}"
+            )
+        for scenario, counts in sorted(self.errors.items()):
+            for error, count in sorted(counts.items(), key=lambda item: -item[1])[:3]:
+                lines.append(f'  {scenario} error x{count}: {error}')
+        for scenario in self.exhausted:
+            lines.append(f'  {scenario}: ran out of inputs; later requests used the other scenarios')
+        return lines
+
+
+class LoadTest:
+    def __init__(self, base_url: str, plan: Plan, mix: Dict[str, int], seed: int = 24):
+        self.base_url = base_url
+        self.plan = plan
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        if not plan.provider_ids:
+            self.mix.pop('edit', None)
+        if not plan.unrouted_pairs:
+            self.mix.pop('miss', None)
+        if not plan.routed_pairs:
+            self.mix.pop('lookup', None)
+        self.rng = random.Random(seed)
+        self.results = Results()
+        # Unused miss pairs, in random order
+        self.miss_pairs = list(plan.unrouted_pairs)
+        self.rng.shuffle(self.miss_pairs)
+
+    async def _route_records(self, client: HttpClient, pair: Tuple[str, str]) -> Response:
+        body = json.dumps({'departure': pair[0], 'arrival': pair[1]}).encode('utf-8')
+        return await client.request('POST', '/api/route-records/', body, {'Content-Type': 'application/json'})
+
+    async def _edit_provider(self, client: HttpClient) -> Response:
+        pk = self.rng.choice(self.plan.provider_ids)
+        xhr = {'X-Requested-With': 'XMLHttpRequest'}
+        if 'csrftoken' not in client.cookies:
+            await client.request('GET', '/mode-tab/')
+        current = await client.request('GET', f'/edit-charter-provider/{pk}/', headers=xhr)
+        if current.status != 200:
+            return current
+        data = json.loads(current.body)['data']
+        form = urlencode({key: data[key] for key in ('name', 'country', 'main_base', 'aircraft', 'block_hour_cost', 'type')})
+        return await client.request('POST', f'/edit-charter-provider/{pk}/', form.encode('utf-8'), {
+            **xhr,
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': client.cookies.get('csrftoken', ''),
+        })
+
+    async def _issue(self, client: HttpClient, scenario: str) -> Response:
+        if scenario == 'lookup':
+            return await self._route_records(client, self.rng.choice(self.plan.routed_pairs))
+        if scenario == 'miss':
+            pair = self.miss_pairs.pop()
+            if not self.miss_pairs:
+                self.mix.pop('miss', None)
+                self.results.exhausted.append('miss')
+            return await self._route_records(client, pair)
+        if scenario == 'airports':
+            return await client.request('GET', '/api/airports/')
+        return await self._edit_provider(client)
+
+    async def _user(self, deadline: float, remaining: List[int]) -> None:
+        client = HttpClient(self.base_url)
+        while time.perf_counter() < deadline and remaining[0] != 0 and self.mix:
+            remaining[0] -= 1
+            # Read each time: scenarios are dropped when their inputs run out
+            names = list(self.mix)
+            scenario = self.rng.choices(names, [self.mix[name] for name in names])[0]
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await self._issue(client, scenario)
+                if response.status >= 400:
+                    error = f'HTTP {response.status}: {response.body[:120].decode("utf-8", "replace")}'
+            except (OSError, asyncio.TimeoutError, ValueError, KeyError) as exc:
+                error = f'{type(exc).__name__}: {exc}'
+            self.results.record(scenario, time.perf_counter() - start, error)
+
+    async def run(self, concurrency: int, duration: float, max_requests: Optional[int] = None) -> Results:
+        start = time.perf_counter()
+        # Shared countdown; -1 means unlimited
+        remaining = [max_requests if max_requests else -1]
+        await asyncio.gather(*(self._user(start + duration, remaining) for _ in range(concurrency)))
+        self.results.elapsed = time.perf_counter() - start
+        return self.results
@@ -0,0 +1,348 @@
+"""
+Monte Carlo cost-at-risk for the route network.
+
+Each sample draws
+    - a fuel price multiplier per departure airport (one draw per airport and
+      sample, shared by every route leaving it), and
+    - a flight time multiplier per route (before the 0.5 h block rounding),
+from configurable distributions, and prices every route with the vectorized
+compute_route_metrics cost formulas. Work is split by origin airport across
+a process pool; each task runs its samples in batches of a bounded number of
+route-samples and folds them into per-route streaming aggregates (sum and a
+fixed-bin histogram of cost / baseline cost), so memory does not grow with
+the sample count. P50/P90/P99 are read off the histograms and clamped to
+each route's observed range, so a degenerate distribution gives the
+baseline exactly.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from operational_functions.route_store import RouteTable, SERVICE_TYPES, get_route_store
+from operational_functions.routes_utils import compute_route_costs_vectorized_numpy
+from operational_functions.scenarios import load_parameters
+
+QUANTILES = (50, 90, 99)
+
+# Histogram of simulated cost / baseline cost per route. Samples outside the
+# range land in the edge bins (and are counted as clipped).
+RATIO_MIN = 0.25
+RATIO_MAX = 4.0
+RATIO_BINS = 2048
+
+# Route-samples priced per batch: bounds a task's working arrays (~15 float64
+# arrays of this size) whatever the number of samples or routes.
+DEFAULT_BATCH_ELEMENTS = 1_000_000
+
+
+@dataclass
+class Distribution:
+    """
+    A multiplier distribution with mean (about) 1.
+
+    kinds:
+        fixed       always 1
+        normal      sd (fraction, e.g. 0.08); clipped at 0.05
+        lognormal   sigma; scaled so the mean is 1
+        uniform     low, high
+        triangular  low, mode, high
+    """
+    kind: str = 'fixed'
+    params: Dict[str, float] = field(default_factory=dict)
+
+    KINDS = {
+        'fixed': (),
+        'normal': ('sd',),
+        'lognormal': ('sigma',),
+        'uniform': ('low', 'high'),
+        'triangular': ('low', 'mode', 'high'),
+    }
+
+    def __post_init__(self):
+        if self.kind not in self.KINDS:
+            raise ValueError(f'Unknown distribution {self.kind!r}; expected one of {", ".join(self.KINDS)}')
+        missing = [name for name in self.KINDS[self.kind] if name not in self.params]
+        if missing:
+            raise ValueError(f'{self.kind} distribution needs {", ".join(missing)}')
+
+    @classmethod
+    def parse(cls, spec: str) -> 'Distribution':
+        """Parse 'lognormal:sigma=0.15' or 'triangular:low=0.9,mode=1,high=1.3'."""
+        kind, _, rest = spec.partition(':')
+        params = {}
+        for part in filter(None, rest.split(',')):
+            name, _, value = part.partition('=')
+            params[name.strip()] = float(value)
+        return cls(kind.strip(), params)
+
+    def sample(self, rng: np.random.Generator, size) -> np.ndarray:
+        p = self.params
+        if self.kind == 'fixed':
+            return np.ones(size)
+        if self.kind == 'normal':
+            return np.maximum(rng.normal(1.0, p['sd'], size), 0.05)
+        if self.kind == 'lognormal':
+            sigma = p['sigma']
+            return rng.lognormal(-sigma * sigma / 2, sigma, size)
+        if self.kind == 'uniform':
+            return rng.uniform(p['low'], p['high'], size)
+        return rng.triangular(p['low'], p['mode'], p['high'], size)
+
+    def describe(self) -> str:
+        params = ','.join(f'{k}={v:g}' for k, v in self.params.items())
+        return f'{self.kind}:{params}' if params else self.kind
+
+
+@dataclass
+class SimulationConfig:
+    samples: int = 10_000
+    fuel_price: Distribution = field(default_factory=lambda: Distribution('lognormal', {'sigma': 0.15}))
+    flight_time: Distribution = field(default_factory=lambda: Distribution('normal', {'sd': 0.08}))
+    seed: int = 24
+    workers: Optional[int] = None
+    batch_elements: int = DEFAULT_BATCH_ELEMENTS
+
+    def __post_init__(self):
+        if self.samples < 1:
+            raise ValueError(f'samples must be at least 1, not {self.samples}')
+
+
+@dataclass
+class OriginTask:
+    """Everything one worker needs to simulate the routes leaving one airport."""
+    origin: int
+    rows: np.ndarray  # positions in the route table
+    distance: np.ndarray
+    cruise_speed: np.ndarray
+    block_hour_cost: np.ndarray
+    is_charter: np.ndarray
+    fuel_burn_gal: np.ndarray
+    mtow_kg: np.ndarray
+    fuel_cost_gl: float
+    airport_fee: float
+    overflight_fee_rate: float
+
+
+def _price(task: OriginTask, fuel_multiplier, time_multiplier) -> np.ndarray:
+    # A flight time multiplier is applied as a cruise speed divisor so the
+    # distance-proportional overflight term is unaffected.
+    costs = compute_route_costs_vectorized_numpy(
+        distance_nm=task.distance[:, None],
+        cruise_speed=task.cruise_speed[:, None] / time_multiplier,
+        block_hour_cost=task.block_hour_cost[:, None],
+        is_charter=task.is_charter[:, None],
+        fuel_burn_gal=task.fuel_burn_gal[:, None],
+        fuel_cost_gl=task.fuel_cost_gl * fuel_multiplier,
+        mtow_kg=task.mtow_kg[:, None],
+        airport_fee=task.airport_fee,
+        overflight_fee_rate=task.overflight_fee_rate,
+    )
+    return costs['total_flight_cost']
+
+
+def _histogram_quantiles(counts: np.ndarray, quantiles) -> np.ndarray:
+    """Per-row quantiles (as ratios) from fixed-bin histograms, interpolating within the bin."""
+    width = (RATIO_MAX - RATIO_MIN) / RATIO_BINS
+    totals = counts.sum(axis=1)
+    cumulative = counts.cumsum(axis=1)
+    result = np.empty((len(counts), len(quantiles)))
+    rows = np.arange(len(counts))
+    for j, q in enumerate(quantiles):
+        target = totals * q / 100.0
+        index = np.minimum((cumulative < target[:, None]).sum(axis=1), RATIO_BINS - 1)
+        before = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0)
+        in_bin = np.maximum(counts[rows, index], 1)
+        fraction = np.clip((target - before) / in_bin, 0.0, 1.0)
+        result[:, j] = RATIO_MIN + (index + fraction) * width
+    return result
+
+
+def simulate_origin(task: OriginTask, samples: int, fuel: Distribution, flight_time: Distribution,
+                    seed: int, batch_elements: int) -> Dict[str, Any]:
+    """Run all samples for one origin; returns per-route mean and quantiles (pure NumPy)."""
+    rng = np.random.default_rng([seed, task.origin])
+    n_routes = len(task.rows)
+    baseline = _price(task, np.ones(1), np.ones((1, 1)))[:, 0]
+    scale = np.where(baseline > 0, baseline, 1.0)
+
+    counts = np.zeros((n_routes, RATIO_BINS), dtype=np.int64)
+    sums = np.zeros(n_routes)
+    lowest = np.full(n_routes, np.inf)
+    highest = np.full(n_routes, -np.inf)
+    clipped = 0
+    batch = max(1, min(samples, batch_elements // max(n_routes, 1)))
+    offsets = (np.arange(n_routes) * RATIO_BINS)[:, None]
+    done = 0
+    while done < samples:
+        size = min(batch, samples - done)
+        fuel_multiplier = fuel.sample(rng, size)[None, :]
+        time_multiplier = flight_time.sample(rng, (n_routes, size))
+        totals = _price(task, fuel_multiplier, time_multiplier)
+        sums += totals.sum(axis=1)
+        ratio = totals / scale[:, None]
+        np.minimum(lowest, ratio.min(axis=1), out=lowest)
+        np.maximum(highest, ratio.max(axis=1), out=highest)
+        bins = np.floor((ratio - RATIO_MIN) * (RATIO_BINS / (RATIO_MAX - RATIO_MIN))).astype(np.int64)
+        clipped += int(np.count_nonzero((bins < 0) | (bins >= RATIO_BINS)))
+        np.clip(bins, 0, RATIO_BINS - 1, out=bins)
+        counts += np.bincount((bins + offsets).ravel(), minlength=n_routes * RATIO_BINS).reshape(n_routes, RATIO_BINS)
+        done += size
+
+    # Interpolating within a bin can land outside the samples actually drawn
+    ratios = np.clip(_histogram_quantiles(counts, QUANTILES), lowest[:, None], highest[:, None])
+    quantiles = ratios * scale[:, None]
+    return {
+        'rows': task.rows,
+        'baseline': baseline,
+        'mean': sums / samples,
+        'quantiles': quantiles,
+        'clipped': clipped,
+    }
+
+
+def build_tasks(table: RouteTable) -> Iterator[OriginTask]:
+    """One task per origin airport, with parameters gathered per route."""
+    data = table.data
+    dims = table.dims
+    params = load_parameters(
+        min_airports=max(dims.airports, default=0) + 1,
+        min_aircraft=max(dims.aircraft, default=0) + 1,
+        min_providers=max(dims.providers, default=0) + 1,
+    )
+    order = np.argsort(data['origin'], kind='stable')
+    origins, starts = np.unique(data['origin'][order], return_index=True)
+    bounds = list(starts[1:]) + [len(order)]
+    for origin, start, end in zip(origins, starts, bounds):
+        if origin < 0:
+            continue
+        rows = order[start:end]
+        part = data[rows]
+        aircraft = part['aircraft']
+        yield OriginTask(
+            origin=int(origin),
+            rows=rows,
+            distance=part['distance'].astype(np.float64),
+            cruise_speed=params.cruise_speed[aircraft],
+            block_hour_cost=params.block_hour_cost[part['provider']],
+            is_charter=part['service_type'] == SERVICE_TYPES.index('charter'),
+            fuel_burn_gal=params.fuel_burn_gal[aircraft],
+            mtow_kg=params.mtow_kg[aircraft],
+            fuel_cost_gl=float(params.fuel_cost_gl[origin]),
+            airport_fee=float(params.airport_fee[origin]),
+            overflight_fee_rate=params.overflight_fee_rate,
+        )
+
+
+@dataclass
+class SimulationResult:
+    table: RouteTable
+    config: SimulationConfig
+    baseline: np.ndarray
+    mean: np.ndarray
+    quantiles: np.ndarray  # (routes, len(QUANTILES))
+    clipped: int
+    seconds: float
+
+    def rows(self, order_by: str = 'p99_over_baseline', limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-route results with labels, sorted descending by a result column."""
+        columns = {
+            'baseline': self.baseline,
+            'mean': self.mean,
+            **{f'p{q}': self.quantiles[:, i] for i, q in enumerate(QUANTILES)},
+        }
+        columns['p99_over_baseline'] = columns['p99'] - self.baseline
+        if order_by not in columns:
+            raise ValueError(f'Cannot order by {order_by!r}; expected one of {", ".join(columns)}')
+        order = np.argsort(-columns[order_by], kind='stable')
+        if limit:
+            order = order[:limit]
+        data, dims = self.table.data, self.table.dims
+        result = []
+        for i in order:
+            row = data[i]
+            result.append({
+                'route_id': int(row['id']),
+                'leg': f"{dims.airports.get(int(row['origin']))} - {dims.airports.get(int(row['dest']))}",
+                'aircraft': dims.aircraft.get(int(row['aircraft'])),
+                'provider': dims.providers.get(int(row['provider'])),
+                'service_type': SERVICE_TYPES[row['service_type']] if 0 <= row['service_type'] < len(SERVICE_TYPES) else None,
+                **{name: float(values[i]) for name, values in columns.items()},
+            })
+        return result
+
+    def write_csv(self, path: str) -> int:
+        rows = self.rows(order_by='p99_over_baseline')
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            if rows:
+                writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
+
+    def summary(self) -> Dict[str, Any]:
+        samples = self.config.samples * len(self.baseline)
+        return {
+            'routes': len(self.baseline),
+            'samples': self.config.samples,
+            'fuel_price': self.config.fuel_price.describe(),
+            'flight_time': self.config.flight_time.describe(),
+            'baseline_total': float(self.baseline.sum()),
+            'mean_total': float(self.mean.sum()),
+            'clipped_fraction': self.clipped / samples if samples else 0.0,
+            'seconds': self.seconds,
+        }
+
+
+def run_simulation(config: SimulationConfig, table: Optional[RouteTable] = None, progress=None) -> SimulationResult:
+    """
+    Simulate every route in the route store.
+
+    Args:
+        config: Sample count, distributions, seed and pool size
+        table: Route table snapshot (default: the current route store table)
+        progress: Optional callable(done_origins, total_origins)
+    """
+    start = time.perf_counter()
+    table = table if table is not None else get_route_store().table()
+    n = len(table.data)
+    baseline = np.zeros(n)
+    mean = np.zeros(n)
+    quantiles = np.zeros((n, len(QUANTILES)))
+    clipped = 0
+
+    tasks = list(build_tasks(table))
+    workers = config.workers or os.cpu_count() or 1
+    args = (config.samples, config.fuel_price, config.flight_time, config.seed, config.batch_elements)
+
+    def collect(result):
+        nonlocal clipped
+        rows = result['rows']
+        baseline[rows] = result['baseline']
+        mean[rows] = result['mean']
+        quantiles[rows] = result['quantiles']
+        clipped += result['clipped']
+
+    if workers <= 1 or len(tasks) <= 1:
+        for done, task in enumerate(tasks, start=1):
+            collect(simulate_origin(task, *args))
+            if progress:
+                progress(done, len(tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Largest origins first so stragglers are short
+            tasks.sort(key=lambda t: -len(t.rows))
+            results = pool.map(simulate_origin, tasks, *([arg] * len(tasks) for arg in args))
+            for done, result in enumerate(results, start=1):
+                collect(result)
+                if progress:
+                    progress(done, len(tasks))
+
+    return SimulationResult(table, config, baseline, mean, quantiles, clipped, time.perf_counter() - start)
@@ -0,0 +1,280 @@
+"""
+Blue/green storage for the Route table.
+
+With ROUTE_DATABASE['ENABLED'], main.db_routers.RouteRouter sends every Route
+query to the 'routes' database alias, whose file is a symlink to the current
+generation: a standalone SQLite file under ROUTE_DATABASE['GENERATIONS_DIR'].
+A full regeneration writes a new generation file through its own connection,
+so readers of the live table never contend with the build, then publishes it
+by atomically replacing the symlink. Connections opened after the swap see
+the new table; a connection already reading the old file keeps a consistent
+view of it until it is closed (Django closes connections after each request).
+
+Route rows reference airports, aircraft and providers in the default
+database. Each routes connection ATTACHes it as ``catalog`` so ORM joins
+(select_related, values_list lookups) resolve there, and runs with foreign key
+enforcement off since SQLite cannot enforce constraints across files. The
+cascade from deleting an Aircraft or CharterProvider is applied by
+main.signals instead.
+
+Writes made to the live generation while a new one is being built (on-the-fly
+routes, incremental generation) are not carried over; the new generation is
+complete for the catalog it was built from, and missing pairs are filled in on
+demand again afterwards.
+
+Region partitions (route_partitions) reuse the same machinery: each is a
+symlinked generation of its own alias.
+
+Settings (ROUTE_DATABASE):
+    ENABLED              Route blue/green storage on (default False)
+    PATH                 The symlink opened as the 'routes' database
+    GENERATIONS_DIR      Directory holding generation files
+    KEEP                 Generations kept on disk per database, including the live one
+    PARTITION_BY_REGION  One database per origin region (see route_partitions)
+    PARTITIONS_DIR       Directory holding the partition symlinks
+    PARTITION_WORKERS    Worker processes for per-partition maintenance
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+ROUTES_ALIAS = 'routes'
+BUILD_ALIAS_PREFIX = 'routes_build_'
+CATALOG_SCHEMA = 'catalog'
+
+DEFAULT_KEEP = 2
+
+_ensure_lock = threading.Lock()
+_ensured: Set[str] = set()
+
+
+def route_database_settings() -> Dict[str, Any]:
+    from django.conf import settings
+    return getattr(settings, 'ROUTE_DATABASE', None) or {}
+
+
+def enabled() -> bool:
+    from django.db import connections
+    return bool(route_database_settings().get('ENABLED')) and ROUTES_ALIAS in connections.settings
+
+
+def link_path(alias: str = ROUTES_ALIAS) -> str:
+    from django.db import connections
+    return str(connections.settings[alias]['NAME'])
+
+
+def generations_dir() -> str:
+    path = route_database_settings().get('GENERATIONS_DIR') or os.path.join(
+        os.path.dirname(link_path()), 'route_generations',
+    )
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def current_generation(alias: str = ROUTES_ALIAS) -> Optional[str]:
+    """Path of the live generation file, or None before the first one is published."""
+    path = link_path(alias)
+    if not os.path.islink(path):
+        return None
+    return os.path.realpath(path)
+
+
+def is_route_connection(connection) -> bool:
+    """Connections to the route database, its partitions and generations being built."""
+    return connection.alias == ROUTES_ALIAS or connection.alias.startswith(ROUTES_ALIAS + '_')
+
+
+def prepare_connection(sender, connection, **kwargs) -> None:
+    """connection_created receiver: attach the catalog database to route connections."""
+    if connection.vendor != 'sqlite' or not is_route_connection(connection):
+        return
+    from django.db import connections
+    catalog = str(connections.settings['default']['NAME'])
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA foreign_keys = OFF')
+        cursor.execute(f'ATTACH DATABASE %s AS {CATALOG_SCHEMA}', [catalog])
+    if connection.alias == ROUTES_ALIAS:
+        from operational_functions import route_partitions
+        if route_partitions.enabled():
+            route_partitions.attach_partitions(connection)
+
+
+def _route_table() -> str:
+    from main.models import Route
+    return Route._meta.db_table
+
+
+def _last_route_id(alias: str = ROUTES_ALIAS) -> int:
+    """Highest Route id ever assigned in the live generation (0 if there is none)."""
+    from django.db import connections
+    if current_generation(alias) is None:
+        return 0
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [_route_table()])
+        row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+def _remove_database_file(path: str) -> None:
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        try:
+            os.unlink(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class RouteGeneration:
+    """A generation file for ``target`` being built through its own connection alias."""
+
+    def __init__(self, path: str, alias: str, target: str = ROUTES_ALIAS):
+        self.path = path
+        self.alias = alias
+        self.target = target
+        self.published = False
+
+    @classmethod
+    def create(cls, target: str = ROUTES_ALIAS, first_id: int = 1) -> 'RouteGeneration':
+        """
+        New empty generation with the Route schema.
+
+        Ids continue from ``first_id`` so they never repeat across generations
+        (RouteStore refreshes incrementally by id).
+        """
+        from django.db import connections
+        from main.models import Route
+
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        path = os.path.join(generations_dir(), f'{target}-{stamp}-{os.getpid()}-{time.monotonic_ns()}.sqlite3')
+        alias = f'{BUILD_ALIAS_PREFIX}{target}_{os.getpid()}_{threading.get_ident()}'
+        connections.settings[alias] = {**connections.settings[target], 'NAME': path}
+        generation = cls(path, alias, target)
+        try:
+            connection = connections[alias]
+            with connection.schema_editor() as editor:
+                editor.create_model(Route)
+            with connection.cursor() as cursor:
+                # The schema editor turns constraint checking back on on exit.
+                cursor.execute('PRAGMA foreign_keys = OFF')
+                if first_id > 1:
+                    cursor.execute(
+                        'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                        [Route._meta.db_table, first_id - 1],
+                    )
+        except BaseException:
+            generation.discard()
+            raise
+        return generation
+
+    def _release(self) -> None:
+        from django.db import connections
+        if self.alias in connections.settings:
+            connections[self.alias].close()
+            del connections[self.alias]
+            del connections.settings[self.alias]
+
+    def publish(self) -> None:
+        """Atomically make this generation the live Route table of its target."""
+        from django.db import connections
+        from main.versioning import DATA_VERSION, bump_version
+
+        self._release()
+        link = link_path(self.target)
+        tmp_link = f'{link}.{os.getpid()}.tmp'
+        os.symlink(os.path.relpath(self.path, os.path.dirname(link)), tmp_link)
+        os.replace(tmp_link, link)
+        self.published = True
+        # This thread's connections still have the previous file open.
+        connections[self.target].close()
+        if self.target != ROUTES_ALIAS:
+            connections[ROUTES_ALIAS].close()
+        bump_version(DATA_VERSION)
+        prune_generations(self.target)
+
+    def discard(self) -> None:
+        self._release()
+        _remove_database_file(self.path)
+
+
+@contextmanager
+def new_generation(target: str = ROUTES_ALIAS, first_id: Optional[int] = None) -> Iterator[RouteGeneration]:
+    """
+    Build a generation of ``target`` inside the block; it is discarded unless published.
+
+    Ids continue after the live generation's unless ``first_id`` is given.
+    """
+    if first_id is None:
+        ensure_route_database(target)
+        first_id = _last_route_id(target) + 1
+    generation = RouteGeneration.create(target, first_id)
+    try:
+        yield generation
+    finally:
+        if not generation.published:
+            generation.discard()
+
+
+def prune_generations(target: str = ROUTES_ALIAS, keep: Optional[int] = None) -> None:
+    """Remove old generation files; a reader still holding one open keeps its data."""
+    keep = keep or route_database_settings().get('KEEP') or DEFAULT_KEEP
+    live = current_generation(target)
+    directory = generations_dir()
+    generations = []
+    for name in os.listdir(directory):
+        if name.startswith(target + '-') and name.endswith('.sqlite3'):
+            path = os.path.join(directory, name)
+            try:
+                generations.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+    for _, path in sorted(generations, reverse=True)[max(keep, 1):]:
+        if path != live:
+            _remove_database_file(path)
+
+
+def ensure_route_database(target: str = ROUTES_ALIAS, seed_filter: Optional[Tuple[str, List[Any]]] = None) -> None:
+    """
+    Publish a first generation of ``target`` if there is none yet, seeded with
+    the routes currently in the default database's Route table (for a region
+    partition: in the unpartitioned route database, if there is one).
+
+    ``seed_filter`` is an SQL condition with its parameters restricting which
+    of those routes are copied.
+    """
+    if target in _ensured:
+        return
+    from operational_functions.single_flight import file_lock
+
+    with _ensure_lock, file_lock(f'routes:generation:{target}'):
+        if current_generation(target) is None:
+            from django.db import connections
+            from main.models import Route
+
+            source = current_generation(ROUTES_ALIAS) if target != ROUTES_ALIAS else None
+            with new_generation(target, first_id=1) as generation:
+                table = Route._meta.db_table
+                with connections[generation.alias].cursor() as cursor:
+                    schema = CATALOG_SCHEMA
+                    if source is not None:
+                        schema = 'seed'
+                        cursor.execute(f'ATTACH DATABASE %s AS {schema}', [source])
+                    cursor.execute(
+                        f'SELECT name FROM {schema}.sqlite_master WHERE type = %s AND name = %s',
+                        ['table', table],
+                    )
+                    if cursor.fetchone():
+                        columns = ', '.join(field.column for field in Route._meta.concrete_fields)
+                        where, params = seed_filter or ('1', [])
+                        cursor.execute(
+                            f'INSERT INTO main.{table} ({columns}) '
+                            f'SELECT {columns} FROM {schema}.{table} WHERE {where}',
+                            params,
+                        )
+                    if source is not None:
+                        cursor.execute(f'DETACH DATABASE {schema}')
+                generation.publish()
+        _ensured.add(target)
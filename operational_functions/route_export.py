@@ -0,0 +1,221 @@
+"""
+Streaming export of the Route table.
+
+Rows are read with a chunked ORM iterator (values_list, no model instances)
+and joined with airport, aircraft and provider labels, then encoded chunk by
+chunk, so an export of any size holds only one chunk in memory. Used by the
+/api/routes/export/ endpoint and the export_routes management command.
+
+Formats:
+    csv      Always available
+    parquet  Requires pyarrow
+    arrow    Arrow IPC stream; requires pyarrow
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from typing import Dict, Iterator, List, Optional, Tuple
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# (column name, Route.values_list lookup); leg endpoints are filled from the
+# airport table, which is small enough to hold in a dict.
+_ROUTE_FIELDS = [
+    ('route_id', 'id'),
+    ('leg', 'leg'),
+    ('distance_nm', 'distance'),
+    ('aircraft', 'aircraft_type__short_name'),
+    ('aircraft_model', 'aircraft_type__model'),
+    ('provider', 'provider__name'),
+    ('service_type', 'service_type'),
+    ('flight_time', 'flight_time'),
+    ('adjusted_flight_time', 'adjusted_flight_time'),
+    ('max_payload_lbs', 'max_payload'),
+    ('block_hours_cost', 'block_hours_cost'),
+    ('route_fuel_gls', 'route_fuel_gls'),
+    ('fuel_cost', 'fuel_cost'),
+    ('overflight_fee', 'overflight_fee'),
+    ('overflight_cost', 'overflight_cost'),
+    ('airport_fees_cost', 'airport_fees_cost'),
+    ('total_flight_cost', 'total_flight_cost'),
+]
+
+_AIRPORT_COLUMNS = [
+    'from_iata', 'from_airport', 'from_country',
+    'to_iata', 'to_airport', 'to_country',
+]
+
+EXPORT_COLUMNS = (
+    [name for name, _ in _ROUTE_FIELDS[:2]]
+    + _AIRPORT_COLUMNS
+    + [name for name, _ in _ROUTE_FIELDS[2:]]
+)
+
+_DECIMAL_COLUMNS = {
+    'block_hours_cost', 'fuel_cost', 'overflight_fee', 'overflight_cost',
+    'airport_fees_cost', 'total_flight_cost',
+}
+_TEXT_COLUMNS = {'leg', 'aircraft', 'aircraft_model', 'provider', 'service_type', *_AIRPORT_COLUMNS}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow required for Parquet/Arrow export. Install with: pip install pyarrow")
+    return pyarrow
+
+
+def available_formats() -> List[str]:
+    try:
+        _require_pyarrow()
+    except ImportError:
+        return ['csv']
+    return list(EXPORT_FORMATS)
+
+
+def iter_route_rows(
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    leg: Optional[str] = None,
+    partition: Optional[str] = None,
+) -> Iterator[List[Tuple]]:
+    """
+    Yield lists of up to ``chunk_size`` export rows (in EXPORT_COLUMNS order),
+    optionally from one region partition only (route_partitions).
+    """
+    from main.models import Airport, Route
+
+    airports: Dict[str, Tuple[str, str]] = {
+        code: (name, country)
+        for code, name, country in Airport.objects.values_list('iata_code', 'name', 'country')
+    }
+    unknown = (None, None)
+    queryset = Route.objects.order_by('id')
+    if partition:
+        from operational_functions.route_partitions import enabled, partition_alias
+        if not enabled():
+            raise ValueError('Route storage is not partitioned by region')
+        queryset = queryset.using(partition_alias(partition))
+    if leg:
+        queryset = queryset.for_leg(leg)
+    rows = queryset.values_list(*(lookup for _, lookup in _ROUTE_FIELDS)).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for row in rows:
+        from_iata, _, to_iata = row[1].partition(' - ')
+        from_name, from_country = airports.get(from_iata, unknown)
+        to_name, to_country = airports.get(to_iata, unknown)
+        chunk.append(
+            row[:2]
+            + (from_iata, from_name, from_country, to_iata, to_name, to_country)
+            + row[2:]
+        )
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(chunks: Iterator[List[Tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _arrow_schema(pa):
+    types = []
+    for name in EXPORT_COLUMNS:
+        if name == 'route_id':
+            types.append(pa.int64())
+        elif name in _DECIMAL_COLUMNS:
+            types.append(pa.decimal128(14, 2))
+        elif name in _TEXT_COLUMNS:
+            types.append(pa.string())
+        else:
+            types.append(pa.float64())
+    return pa.schema(list(zip(EXPORT_COLUMNS, types)))
+
+
+def _record_batch(pa, schema, chunk: List[Tuple]):
+    columns = list(zip(*chunk))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def stream_arrow(chunks: Iterator[List[Tuple]], file_format: str) -> Iterator[bytes]:
+    """Encode chunks as a Parquet file (one row group per chunk) or an Arrow IPC stream."""
+    pa = _require_pyarrow()
+    schema = _arrow_schema(pa)
+    sink = _ChunkSink()
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for chunk in chunks:
+        writer.write_batch(_record_batch(pa, schema, chunk))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def stream_routes(
+    file_format: str = 'csv',
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    leg: Optional[str] = None,
+    partition: Optional[str] = None,
+) -> Iterator[bytes]:
+    """Encoded export of the route table as an iterator of byte chunks."""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format {file_format!r}; expected one of {", ".join(EXPORT_FORMATS)}')
+    if file_format != 'csv':
+        _require_pyarrow()
+    chunks = iter_route_rows(chunk_size, leg, partition)
+    if file_format == 'csv':
+        return stream_csv(chunks)
+    return stream_arrow(chunks, file_format)
@@ -0,0 +1,366 @@
+"""
+Route storage partitioned by origin region.
+
+With ROUTE_DATABASE['PARTITION_BY_REGION'] (on top of blue/green storage,
+see route_db), routes live in one SQLite file per origin region
+(Country.region of the departure airport). Each partition has its own
+database alias, symlink and generations, so it can be regenerated, exported
+and vacuumed on its own, and in parallel with the others.
+
+The model API stays the same:
+    Route.objects.for_leg(leg)      runs on the origin's partition only
+                                    (main.models.RouteQuerySet)
+    other Route reads               run on the 'routes' alias, where a TEMP
+                                    VIEW unions every partition
+    save_routes_bulk                splits inserts by partition
+
+Route ids come from one allocator shared by all partitions, so they stay
+unique and increasing across the union. Writes through the union view (such
+as Route.objects.all().delete()) raise NotSupportedError; use route_purge or
+the per-partition functions here.
+An airport moved to another region keeps its old routes in the old partition
+until that partition is regenerated.
+
+SQLite attaches at most 10 databases by default: the catalog plus up to nine
+partitions.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from operational_functions import route_db
+
+PARTITION_ALIAS_PREFIX = route_db.ROUTES_ALIAS + '_p_'
+UNASSIGNED = 'Unassigned'
+
+DEFAULT_WORKERS = 2
+
+_map_lock = threading.Lock()
+_map_cache: Dict[str, Any] = {}
+
+
+def enabled() -> bool:
+    return route_db.enabled() and bool(route_db.route_database_settings().get('PARTITION_BY_REGION'))
+
+
+def partitions_dir() -> str:
+    from django.conf import settings
+    path = route_db.route_database_settings().get('PARTITIONS_DIR') or os.path.join(
+        settings.BASE_DIR, 'route_partitions',
+    )
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def partition_slug(region: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', region.lower()).strip('_') or 'unnamed'
+
+
+def partition_alias(region: str) -> str:
+    """Database alias of a region's partition, registering it on first use."""
+    from django.db import connections
+    alias = PARTITION_ALIAS_PREFIX + partition_slug(region)
+    if alias not in connections.settings:
+        connections.settings[alias] = {
+            **connections.settings[route_db.ROUTES_ALIAS],
+            'NAME': os.path.join(partitions_dir(), f'{partition_slug(region)}.sqlite3'),
+        }
+    return alias
+
+
+class PartitionMap:
+    """Origin region of every airport, from the catalog."""
+
+    def __init__(self, region_by_airport: Dict[str, str]):
+        self.region_by_airport = region_by_airport
+        self.regions = sorted(set(region_by_airport.values()))
+
+    def region_for_airport(self, code: str) -> str:
+        return self.region_by_airport.get(code, UNASSIGNED)
+
+    def region_for_leg(self, leg: str) -> str:
+        return self.region_for_airport(leg.partition(' - ')[0])
+
+    def airports_in(self, region: str) -> List[str]:
+        return [code for code, airport_region in self.region_by_airport.items() if airport_region == region]
+
+
+def partition_map() -> PartitionMap:
+    """The current PartitionMap, reloaded when airports or countries change."""
+    from main.models import Airport, Country
+    from main.versioning import get_version
+
+    version = (get_version('airport'), get_version('country'))
+    with _map_lock:
+        if _map_cache.get('version') != version:
+            region_by_country = dict(Country.objects.values_list('name', 'region'))
+            _map_cache['map'] = PartitionMap({
+                code: region_by_country.get(country) or UNASSIGNED
+                for code, country in Airport.objects.values_list('iata_code', 'country')
+            })
+            _map_cache['version'] = version
+        return _map_cache['map']
+
+
+def _seed_filter(region: str) -> Tuple[str, List[Any]]:
+    codes = partition_map().airports_in(region)
+    if not codes:
+        return '0', []
+    placeholders = ', '.join(['%s'] * len(codes))
+    return f"substr(leg, 1, instr(leg, ' - ') - 1) IN ({placeholders})", codes
+
+
+def ensure_partition(region: str) -> str:
+    """Alias of a region's partition, creating the partition if it does not exist yet."""
+    alias = partition_alias(region)
+    if alias not in route_db._ensured:
+        route_db.ensure_route_database(alias, seed_filter=_seed_filter(region))
+    return alias
+
+
+def ensure_partitions() -> Dict[str, str]:
+    """Aliases of every region's partition, creating missing ones; region -> alias."""
+    pmap = partition_map()
+    with _map_lock:
+        if _map_cache.get('aliases_map') is pmap:
+            return dict(_map_cache['aliases'])
+    aliases = {region: ensure_partition(region) for region in pmap.regions}
+    with _map_lock:
+        _map_cache['aliases'] = aliases
+        _map_cache['aliases_map'] = pmap
+    return dict(aliases)
+
+
+def partitions_ensured() -> bool:
+    """
+    Whether ensure_partitions() has run for the partition map this process
+    last loaded. Cheap enough for every query: the map itself is reloaded
+    when a 'routes' connection is opened (attach_partitions).
+    """
+    pmap = _map_cache.get('map')
+    return pmap is not None and _map_cache.get('aliases_map') is pmap
+
+
+def alias_for_leg(leg: str) -> Optional[str]:
+    """Partition alias holding ``leg``, or None when partitioning is off."""
+    if not enabled():
+        return None
+    return ensure_partition(partition_map().region_for_leg(leg))
+
+
+def route_aliases() -> List[str]:
+    """Every database alias Route rows are written to."""
+    from django.db import router
+    from main.models import Route
+
+    if enabled():
+        return list(ensure_partitions().values())
+    return [router.db_for_write(Route) or 'default']
+
+
+def attach_partitions(connection) -> None:
+    """Attach every partition to a 'routes' connection behind a TEMP VIEW of the Route table."""
+    from main.models import Route
+
+    table = Route._meta.db_table
+    columns = ', '.join(field.column for field in Route._meta.concrete_fields)
+    selects = []
+    with connection.cursor() as cursor:
+        for region in partition_map().regions:
+            alias = partition_alias(region)
+            if route_db.current_generation(alias) is None:
+                continue
+            schema = 'p_' + partition_slug(region)
+            cursor.execute(f'ATTACH DATABASE %s AS {schema}', [route_db.link_path(alias)])
+            selects.append(f'SELECT {columns} FROM {schema}.{table}')
+        if not selects:
+            selects.append('SELECT ' + ', '.join(f'NULL AS {field.column}' for field in Route._meta.concrete_fields)
+                           + ' WHERE 0')
+        cursor.execute(f'CREATE TEMP VIEW {table} AS ' + ' UNION ALL '.join(selects))
+
+
+def _id_counter_path() -> str:
+    return os.path.join(partitions_dir(), 'next_route_id')
+
+
+def reserve_route_ids(count: int) -> int:
+    """First of ``count`` consecutive Route ids reserved for the caller."""
+    from django.db.models import Max
+    from main.models import Route
+    from operational_functions.single_flight import file_lock
+
+    with file_lock('routes:ids'):
+        path = _id_counter_path()
+        try:
+            with open(path) as fh:
+                next_id = int(fh.read().strip())
+        except (FileNotFoundError, ValueError):
+            ensure_partitions()
+            next_id = (Route.objects.using(route_db.ROUTES_ALIAS).aggregate(top=Max('id'))['top'] or 0) + 1
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as fh:
+            fh.write(str(next_id + count))
+        os.replace(tmp_path, path)
+    return next_id
+
+
+def reset_route_ids() -> None:
+    """Restart the id allocator after the highest id left in the partitions (at 1 once they are empty)."""
+    from operational_functions.single_flight import file_lock
+
+    with file_lock('routes:ids'):
+        try:
+            os.unlink(_id_counter_path())
+        except FileNotFoundError:
+            pass
+
+
+def assign_route_ids(route_objects: Sequence) -> None:
+    first = reserve_route_ids(len(route_objects))
+    for offset, route in enumerate(route_objects):
+        route.id = first + offset
+
+
+def group_by_partition(route_objects: Iterable) -> Dict[str, List]:
+    pmap = partition_map()
+    groups: Dict[str, List] = {}
+    for route in route_objects:
+        groups.setdefault(pmap.region_for_leg(route.leg), []).append(route)
+    return {ensure_partition(region): routes for region, routes in groups.items()}
+
+
+# -----------------------------------------------------------------------------
+# Per-partition maintenance
+# -----------------------------------------------------------------------------
+
+def regenerate_partition(region: str, batch_size: int = 1000):
+    """Rebuild one region's routes into a new generation and swap it in; returns a RunReport."""
+    from operational_functions.routes_utils import (
+        create_route_objects,
+        generate_all_route_metrics,
+        load_aircraft,
+        load_airports,
+        load_providers,
+        precompute_distances,
+        save_routes_bulk,
+    )
+    from operational_functions.run_report import RunReport
+
+    report = RunReport(f'regenerate_partition:{region}')
+    alias = partition_alias(region)
+    with report.stage('load_airports'):
+        airports = load_airports()
+    with report.stage('load_aircraft'):
+        aircraft = load_aircraft()
+    with report.stage('load_providers'):
+        _, providers_by_aircraft = load_providers()
+    origins = set(partition_map().airports_in(region))
+    report.count('origins', len(origins))
+    with report.stage('distances'):
+        distances = precompute_distances(airports)
+    with report.stage('metrics'):
+        route_metrics = generate_all_route_metrics(
+            airports=airports,
+            aircraft=aircraft,
+            providers_by_aircraft=providers_by_aircraft,
+            distances=distances,
+            existing_keys=set(),
+            skip_existing=False,
+            report=report,
+            origins=origins,
+        )
+    with report.stage('objects'):
+        route_objects = create_route_objects(route_metrics, aircraft)
+    with route_db.new_generation(alias) as generation:
+        with report.stage('insert'):
+            created = save_routes_bulk(route_objects, batch_size=batch_size, using=generation.alias)
+        with report.stage('swap'):
+            generation.publish()
+    return report.finish(created)
+
+
+def vacuum_partition(region: str) -> int:
+    """VACUUM one partition; returns its file size in bytes afterwards."""
+    from django.db import connections
+
+    alias = ensure_partition(region)
+    with connections[alias].cursor() as cursor:
+        cursor.execute('VACUUM main')
+    connections[alias].close()
+    return os.path.getsize(route_db.current_generation(alias))
+
+
+def partition_stats() -> List[Dict[str, Any]]:
+    from main.models import Route
+
+    stats = []
+    for region, alias in ensure_partitions().items():
+        path = route_db.current_generation(alias)
+        stats.append({
+            'region': region,
+            'alias': alias,
+            'routes': Route.objects.using(alias).count(),
+            'bytes': os.path.getsize(path) if path else 0,
+            'file': path,
+        })
+    return stats
+
+
+def _worker_init() -> None:
+    # Forked workers must not share the parent's SQLite connections.
+    from django.db import connections
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+
+
+def _run(fn_name: str, region: str, kwargs: Dict[str, Any]):
+    result = globals()[fn_name](region, **kwargs)
+    return result.as_dict() if hasattr(result, 'as_dict') else result
+
+
+def for_each_partition(
+    fn: Callable[..., Any],
+    regions: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[str, Any], None]] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """
+    Run a per-partition function (regenerate_partition, vacuum_partition) for
+    each region, in worker processes when ``workers`` > 1; region -> result
+    (RunReports as dicts).
+    """
+    regions = list(regions) if regions else partition_map().regions
+    if workers is None:
+        workers = route_db.route_database_settings().get('PARTITION_WORKERS') or DEFAULT_WORKERS
+    workers = max(1, min(workers, len(regions) or 1))
+    results: Dict[str, Any] = {}
+    if workers == 1:
+        for region in regions:
+            results[region] = _run(fn.__name__, region, kwargs)
+            if progress:
+                progress(region, results[region])
+        return results
+    ensure_partitions()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+        futures = {region: pool.submit(_run, fn.__name__, region, kwargs) for region in regions}
+        for region, future in futures.items():
+            results[region] = future.result()
+            if progress:
+                progress(region, results[region])
+    # Generations published by the workers: reopen on next use
+    from django.db import connections
+    for connection in connections.all(initialized_only=True):
+        if route_db.is_route_connection(connection):
+            connection.close()
+    return results
+
+
+def regenerate_partitions(regions: Optional[Sequence[str]] = None, workers: Optional[int] = None,
+                          batch_size: int = 1000, progress=None) -> Dict[str, Any]:
+    return for_each_partition(regenerate_partition, regions, workers, progress, batch_size=batch_size)
@@ -0,0 +1,205 @@
+"""
+Set-based purges of the Route table.
+
+Route.objects...delete() makes Django load every matching row so it can send
+post_delete signals, which takes minutes at millions of routes (and runs in
+the request thread when an aircraft or provider is deleted). The functions
+here delete with one SQL statement per database holding routes
+(route_partitions.route_aliases()), optionally followed by VACUUM. No
+signals are sent, so each bumps the data version itself once its
+transaction commits.
+
+Routes reference airports only through the ``leg`` string, so deleting an
+airport leaves its routes behind; purge_routes(airport_codes=...) and
+purge_orphan_routes() remove them.
+"""
+
+from __future__ import annotations
+
+from functools import partial
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from django.db import connections, transaction
+
+from main.models import Aircraft, Airport, CharterProvider, Route
+from main.versioning import DATA_VERSION, bump_version
+from operational_functions import route_db, route_partitions
+
+# Stay well below SQLite's limit on bound parameters per statement
+MAX_PARAMS = 900
+
+
+def _table() -> str:
+    return Route._meta.db_table
+
+
+def _aliases(aliases: Optional[Sequence[str]]) -> List[str]:
+    return list(aliases) if aliases is not None else route_partitions.route_aliases()
+
+
+def _leg_endpoint_sql(vendor: str) -> Tuple[str, str]:
+    """SQL expressions for a route's origin and destination codes."""
+    if vendor == 'postgresql':
+        return "split_part(leg, ' - ', 1)", "split_part(leg, ' - ', 2)"
+    return "substr(leg, 1, instr(leg, ' - ') - 1)", "substr(leg, instr(leg, ' - ') + 3)"
+
+
+def _chunks(values: Sequence, size: int = MAX_PARAMS) -> Iterable[Sequence]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _delete(
+    alias: str,
+    statements: List[Tuple[str, list]],
+    deleted: int = 0,
+    uncounted: Sequence[Tuple[str, list]] = (),
+) -> int:
+    """
+    Run DELETE statements in one transaction on ``alias``; returns rows
+    deleted (plus ``deleted``, for statements that report no row count).
+    ``uncounted`` statements run last in the same transaction, such as
+    resetting the id sequence.
+    """
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            for sql, params in statements:
+                cursor.execute(sql, params)
+                deleted += max(cursor.rowcount, 0)
+            for sql, params in uncounted:
+                cursor.execute(sql, params)
+        if deleted:
+            transaction.on_commit(partial(bump_version, DATA_VERSION), using=alias)
+    return deleted
+
+
+def vacuum(aliases: Optional[Sequence[str]] = None) -> None:
+    """Give the space of deleted routes back to the filesystem (SQLite VACUUM / PostgreSQL VACUUM)."""
+    for alias in _aliases(aliases):
+        connection = connections[alias]
+        if connection.in_atomic_block:
+            raise RuntimeError('VACUUM cannot run inside a transaction')
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM' if connection.vendor == 'sqlite' else f'VACUUM {_table()}')
+
+
+def truncate_routes(vacuum_after: bool = False, reset_sequence: bool = True) -> int:
+    """
+    Delete every route; returns the number deleted.
+
+    The id sequence is reset unless ``reset_sequence`` is False. With
+    blue/green storage an empty generation is swapped in, which is atomic for
+    readers; ``vacuum_after`` then removes the previous generation files right
+    away instead of keeping them until they are pruned. Otherwise the table
+    is emptied with one DELETE (SQLite's truncate optimization), followed by
+    VACUUM if ``vacuum_after`` is set.
+    """
+    table = _table()
+    if route_db.enabled():
+        deleted = Route.objects.count()
+        partitioned = route_partitions.enabled()
+        targets = route_partitions.ensure_partitions().values() if partitioned else [route_db.ROUTES_ALIAS]
+        for target in targets:
+            with route_db.new_generation(target, first_id=1 if reset_sequence else None) as generation:
+                generation.publish()
+            if vacuum_after:
+                route_db.prune_generations(target, keep=1)
+        if partitioned and reset_sequence:
+            route_partitions.reset_route_ids()
+        return deleted
+
+    deleted = 0
+    for alias in _aliases(None):
+        connection = connections[alias]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {table}')
+                count = cursor.fetchone()[0]
+            restart = ' RESTART IDENTITY' if reset_sequence else ''
+            deleted += _delete(alias, [(f'TRUNCATE {table}{restart}', [])], count)
+        else:
+            uncounted = []
+            if reset_sequence and connection.vendor == 'sqlite':
+                uncounted.append(('DELETE FROM sqlite_sequence WHERE name = %s', [table]))
+            deleted += _delete(alias, [(f'DELETE FROM {table}', [])], uncounted=uncounted)
+        if vacuum_after:
+            vacuum([alias])
+    return deleted
+
+
+def purge_routes(
+    aircraft_ids: Sequence[int] = (),
+    provider_ids: Sequence[int] = (),
+    airport_codes: Sequence[str] = (),
+    vacuum_after: bool = False,
+    aliases: Optional[Sequence[str]] = None,
+) -> int:
+    """
+    Delete routes flown by the given aircraft or providers, or departing from
+    or arriving at the given airports; returns the number deleted.
+    """
+    table = _table()
+    statements: List[Tuple[str, list]] = []
+    for column, values in (('aircraft_type_id', list(aircraft_ids)), ('provider_id', list(provider_ids))):
+        for chunk in _chunks(values):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            statements.append((f'DELETE FROM {table} WHERE {column} IN ({placeholders})', list(chunk)))
+    for chunk in _chunks(list(airport_codes), MAX_PARAMS // 2):
+        conditions = ' OR '.join(['leg LIKE %s OR leg LIKE %s'] * len(chunk))
+        params = []
+        for code in chunk:
+            params += [f'{code} - %', f'% - {code}']
+        statements.append((f'DELETE FROM {table} WHERE {conditions}', params))
+    if not statements:
+        return 0
+
+    deleted = 0
+    for alias in _aliases(aliases):
+        deleted += _delete(alias, statements)
+        if vacuum_after:
+            vacuum([alias])
+    return deleted
+
+
+def purge_orphan_routes(vacuum_after: bool = False, aliases: Optional[Sequence[str]] = None) -> int:
+    """Delete routes whose airports, aircraft or provider no longer exist; returns the number deleted."""
+    table = _table()
+    airports = Airport._meta.db_table
+    deleted = 0
+    for alias in _aliases(aliases):
+        origin, destination = _leg_endpoint_sql(connections[alias].vendor)
+        sql = (
+            f'DELETE FROM {table} WHERE '
+            f'{origin} NOT IN (SELECT iata_code FROM {airports}) '
+            f'OR {destination} NOT IN (SELECT iata_code FROM {airports}) '
+            f'OR aircraft_type_id NOT IN (SELECT id FROM {Aircraft._meta.db_table}) '
+            f'OR provider_id NOT IN (SELECT id FROM {CharterProvider._meta.db_table})'
+        )
+        deleted += _delete(alias, [(sql, [])])
+        if vacuum_after:
+            vacuum([alias])
+    return deleted
+
+
+def delete_with_routes(instance) -> None:
+    """
+    Delete an Aircraft, CharterProvider or Airport, purging its routes with
+    set-based SQL first so the ORM cascade has no routes left to collect.
+    """
+    if isinstance(instance, Aircraft):
+        kwargs = {
+            'aircraft_ids': [instance.pk],
+            'provider_ids': list(instance.charter_providers.values_list('pk', flat=True)),
+        }
+    elif isinstance(instance, CharterProvider):
+        kwargs = {'provider_ids': [instance.pk]}
+    elif isinstance(instance, Airport):
+        kwargs = {
+            'airport_codes': [instance.iata_code],
+            'provider_ids': list(instance.charter_providers.values_list('pk', flat=True)),
+        }
+    else:
+        raise TypeError(f'Cannot purge routes for {type(instance).__name__}')
+    with transaction.atomic(using=instance._state.db):
+        purge_routes(**kwargs)
+        instance.delete()
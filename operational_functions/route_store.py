@@ -0,0 +1,477 @@
+"""
+In-memory columnar route store with a vectorized query API.
+
+The Route table is held as one NumPy structured array. Origin, destination,
+aircraft and provider are stored as integer IDs (airport, aircraft and
+provider primary keys) and service type as a small code; labels, countries
+and regions live in dimension tables and are mapped to codes before a query
+runs, so every filter, sort and group-by is a vectorized array operation.
+
+    table = get_route_store().table()
+    (table.filter(service_type='acmi', total_flight_cost__lt=80000,
+                  origin_region='South-Central America', aircraft='A321F')
+          .order_by('cost_per_nm')
+          .top(20))
+    table.filter(service_type='acmi').group_by('provider', 'total_flight_cost')
+
+The store loads lazily on first use and refreshes when the data version
+(main.versioning.DATA_VERSION) changes: routes are only ever bulk-inserted or
+deleted, so new rows are appended by ID and a full reload happens only when
+rows have disappeared.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("NumPy required for the columnar route store. Install with: pip install numpy")
+
+ROUTE_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('origin', np.int32),
+    ('dest', np.int32),
+    ('aircraft', np.int32),
+    ('provider', np.int32),
+    ('service_type', np.int8),
+    ('distance', np.float64),
+    ('flight_time', np.float64),
+    ('adjusted_flight_time', np.float64),
+    ('max_payload', np.float64),
+    ('block_hours_cost', np.float64),
+    ('route_fuel_gls', np.float64),
+    ('fuel_cost', np.float64),
+    ('overflight_fee', np.float64),
+    ('overflight_cost', np.float64),
+    ('airport_fees_cost', np.float64),
+    ('total_flight_cost', np.float64),
+])
+
+SERVICE_TYPES = ('charter', 'acmi')
+
+# Columns computed from stored ones at query time
+DERIVED_COLUMNS = ('cost_per_nm', 'cost_per_block_hour')
+
+# Dimensions keyed by a stored ID column: label tables map ID -> label
+ID_DIMENSIONS = ('origin', 'dest', 'aircraft', 'provider')
+
+# Dimensions derived from the origin/destination airport
+AIRPORT_DIMENSIONS = {
+    'origin_country': ('origin', 'country'),
+    'dest_country': ('dest', 'country'),
+    'origin_region': ('origin', 'region'),
+    'dest_region': ('dest', 'region'),
+}
+
+DIMENSIONS = ID_DIMENSIONS + ('service_type',) + tuple(AIRPORT_DIMENSIONS)
+
+_LOOKUPS = {
+    'lt': np.less,
+    'lte': np.less_equal,
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'ne': np.not_equal,
+}
+
+LOAD_CHUNK_SIZE = 20000
+
+
+@dataclass
+class Dimensions:
+    """Labels for the coded columns, read from the (small) reference tables."""
+    airports: Dict[int, str] = field(default_factory=dict)
+    aircraft: Dict[int, str] = field(default_factory=dict)
+    providers: Dict[int, str] = field(default_factory=dict)
+    airport_ids: Dict[str, int] = field(default_factory=dict)
+    # For 'country' and 'region': the label list, and per airport ID the
+    # index into it. The arrays have one extra trailing -1 so that an unknown
+    # airport (ID -1) indexes to "no label".
+    airport_attributes: Dict[str, Tuple[List[str], Any]] = field(default_factory=dict)
+
+    def labels(self, dimension: str) -> Dict[int, str]:
+        if dimension in ('origin', 'dest'):
+            return self.airports
+        if dimension == 'aircraft':
+            return self.aircraft
+        if dimension == 'provider':
+            return self.providers
+        if dimension == 'service_type':
+            return dict(enumerate(SERVICE_TYPES))
+        attribute = AIRPORT_DIMENSIONS[dimension][1]
+        return dict(enumerate(self.airport_attributes[attribute][0]))
+
+
+def load_dimensions() -> Dimensions:
+    from main.models import Aircraft, Airport, CharterProvider, Country
+
+    dims = Dimensions()
+    region_by_country = dict(Country.objects.values_list('name', 'region'))
+    airport_rows = list(Airport.objects.values_list('id', 'iata_code', 'country'))
+    dims.airports = {pk: code for pk, code, _ in airport_rows}
+    dims.airport_ids = {code: pk for pk, code, _ in airport_rows}
+    dims.aircraft = dict(Aircraft.objects.values_list('id', 'short_name'))
+    dims.providers = dict(CharterProvider.objects.values_list('id', 'name'))
+
+    size = max(dims.airports, default=0) + 2
+    for attribute, value_of in (
+        ('country', lambda country: country),
+        ('region', lambda country: region_by_country.get(country)),
+    ):
+        labels: List[str] = []
+        index: Dict[str, int] = {}
+        codes = np.full(size, -1, dtype=np.int32)
+        for pk, _, country in airport_rows:
+            value = value_of(country)
+            if value is None:
+                continue
+            if value not in index:
+                index[value] = len(labels)
+                labels.append(value)
+            codes[pk] = index[value]
+        dims.airport_attributes[attribute] = (labels, codes)
+    return dims
+
+
+def _route_rows(min_id: int = 0):
+    """Route rows with id > min_id, decimals cast to REAL in SQL to skip Decimal conversion."""
+    from django.db.models import FloatField
+    from django.db.models.functions import Cast
+    from main.models import Route
+
+    casts = {
+        f'{name}_f': Cast(name, FloatField())
+        for name in ('block_hours_cost', 'fuel_cost', 'overflight_fee', 'overflight_cost',
+                     'airport_fees_cost', 'total_flight_cost')
+    }
+    return (
+        Route.objects.filter(id__gt=min_id)
+        .order_by('id')
+        .annotate(**casts)
+        .values_list(
+            'id', 'leg', 'aircraft_type_id', 'provider_id', 'service_type',
+            'distance', 'flight_time', 'adjusted_flight_time', 'max_payload',
+            'block_hours_cost_f', 'route_fuel_gls', 'fuel_cost_f', 'overflight_fee_f',
+            'overflight_cost_f', 'airport_fees_cost_f', 'total_flight_cost_f',
+        )
+        .iterator(chunk_size=LOAD_CHUNK_SIZE)
+    )
+
+
+def load_route_array(dims: Dimensions, min_id: int = 0) -> np.ndarray:
+    """Read routes with id > min_id into a ROUTE_DTYPE array, one chunk at a time."""
+    service_codes = {name: code for code, name in enumerate(SERVICE_TYPES)}
+    leg_codes: Dict[str, Tuple[int, int]] = {}
+    airport_ids = dims.airport_ids
+    rows = _route_rows(min_id)
+    parts = []
+    while True:
+        chunk = list(islice(rows, LOAD_CHUNK_SIZE))
+        if not chunk:
+            break
+        array = np.empty(len(chunk), dtype=ROUTE_DTYPE)
+        columns = list(zip(*chunk))
+        endpoints = []
+        for leg in columns[1]:
+            codes = leg_codes.get(leg)
+            if codes is None:
+                from_iata, _, to_iata = leg.partition(' - ')
+                codes = leg_codes[leg] = (airport_ids.get(from_iata, -1), airport_ids.get(to_iata, -1))
+            endpoints.append(codes)
+        array['id'] = columns[0]
+        array['origin'], array['dest'] = zip(*endpoints)
+        array['aircraft'] = columns[2]
+        array['provider'] = columns[3]
+        array['service_type'] = [service_codes.get(s, -1) for s in columns[4]]
+        for offset, name in enumerate(ROUTE_DTYPE.names[6:], start=5):
+            array[name] = [value or 0.0 for value in columns[offset]]
+        parts.append(array)
+    if not parts:
+        return np.empty(0, dtype=ROUTE_DTYPE)
+    return np.concatenate(parts)
+
+
+class RouteTable:
+    """
+    An immutable snapshot of the route table, or a filtered/sorted view of one.
+
+    Views share the snapshot's array and hold the positions of their rows, so
+    filtering copies one index array rather than every column.
+    """
+
+    def __init__(self, data: np.ndarray, dims: Dimensions, version: Optional[int] = None,
+                 rows: Optional[np.ndarray] = None):
+        self.data = data
+        self.dims = dims
+        self.version = version
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.data) if self.rows is None else len(self.rows)
+
+    def _derive(self, positions: np.ndarray) -> 'RouteTable':
+        """A view of the rows at ``positions`` (indices into this view)."""
+        rows = positions if self.rows is None else self.rows[positions]
+        return RouteTable(self.data, self.dims, self.version, rows)
+
+    # --- columns -----------------------------------------------------------
+
+    def _stored(self, name: str) -> np.ndarray:
+        column = self.data[name]
+        return column if self.rows is None else column[self.rows]
+
+    def column(self, name: str) -> np.ndarray:
+        """A stored, derived or dimension-code column of this view."""
+        if name in ROUTE_DTYPE.names:
+            return self._stored(name)
+        if name == 'cost_per_nm':
+            distance = self._stored('distance')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(distance > 0, self._stored('total_flight_cost') / distance, np.nan)
+        if name == 'cost_per_block_hour':
+            hours = self._stored('adjusted_flight_time')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(hours > 0, self._stored('total_flight_cost') / hours, np.nan)
+        if name in AIRPORT_DIMENSIONS:
+            endpoint, attribute = AIRPORT_DIMENSIONS[name]
+            codes = self.dims.airport_attributes[attribute][1]
+            airport_ids = self._stored(endpoint)
+            # IDs beyond the lookup (airports added since the last refresh) map to the sentinel
+            return codes[np.where(airport_ids < len(codes) - 1, airport_ids, -1)]
+        raise ValueError(f'Unknown column {name!r}')
+
+    def _codes_for(self, dimension: str, values: Iterable[Any]) -> List[int]:
+        labels = self.dims.labels(dimension)
+        codes = []
+        for value in values:
+            if isinstance(value, int) and dimension in ID_DIMENSIONS:
+                codes.append(value)
+            else:
+                codes.extend(code for code, label in labels.items() if label == value)
+        return codes
+
+    # --- query API ---------------------------------------------------------
+
+    def mask(self, **conditions: Any) -> np.ndarray:
+        """
+        Boolean mask for Django-style conditions, ANDed together.
+
+        Numeric columns take ``__lt``, ``__lte``, ``__gt``, ``__gte``, ``__ne``
+        and ``__in``; dimensions take a label (or ID) or ``__in`` with a list.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in conditions.items():
+            name, _, lookup = key.partition('__')
+            if name in DIMENSIONS:
+                if lookup not in ('', 'in', 'ne'):
+                    raise ValueError(f'Lookup {lookup!r} not supported on dimension {name!r}')
+                values = value if lookup == 'in' else [value]
+                matched = np.isin(self.column(name), self._codes_for(name, values))
+                mask &= ~matched if lookup == 'ne' else matched
+                continue
+            column = self.column(name)
+            if lookup == '':
+                mask &= column == value
+            elif lookup == 'in':
+                mask &= np.isin(column, list(value))
+            elif lookup in _LOOKUPS:
+                mask &= _LOOKUPS[lookup](column, value)
+            else:
+                raise ValueError(f'Unknown lookup {lookup!r} in {key!r}')
+        return mask
+
+    def filter(self, **conditions: Any) -> 'RouteTable':
+        if not conditions:
+            return self
+        return self._derive(np.flatnonzero(self.mask(**conditions)))
+
+    def _sort_key(self, name: str) -> np.ndarray:
+        column = self.column(name.lstrip('-'))
+        return -column if name.startswith('-') else column
+
+    def order_by(self, *names: str) -> 'RouteTable':
+        """Sort by one or more columns; prefix a name with '-' for descending."""
+        if not names:
+            return self
+        if len(names) == 1:
+            return self._derive(np.argsort(self._sort_key(names[0]), kind='stable'))
+        return self._derive(np.lexsort([self._sort_key(name) for name in reversed(names)]))
+
+    def top(self, n: int, by: Optional[str] = None) -> List[Dict[str, Any]]:
+        """First n records, or the n smallest by ``by`` ('-name' for largest) without a full sort."""
+        if n < 0:
+            raise ValueError('n must not be negative')
+        if by is None or n >= len(self):
+            view = self.order_by(by) if by else self
+            return view.records(n)
+        keys = self._sort_key(by)
+        nearest = np.argpartition(keys, n)[:n]
+        nearest = nearest[np.argsort(keys[nearest], kind='stable')]
+        return self._derive(nearest).records()
+
+    def count(self) -> int:
+        return len(self)
+
+    def aggregate(self, value: str = 'total_flight_cost') -> Dict[str, float]:
+        column = self.column(value)
+        if not len(column):
+            return {'count': 0}
+        return {
+            'count': int(len(column)),
+            'sum': float(np.nansum(column)),
+            'mean': float(np.nanmean(column)),
+            'min': float(np.nanmin(column)),
+            'max': float(np.nanmax(column)),
+        }
+
+    def group_by(self, dimension: str, value: str = 'total_flight_cost',
+                 order_by: str = '-count', limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Count, sum, mean, min and max of ``value`` per dimension label."""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f'Cannot group by {dimension!r}; expected one of {", ".join(DIMENSIONS)}')
+        if not len(self):
+            return []
+        # Codes are small non-negative IDs (or -1 for unknown), so shift by
+        # one and aggregate with bincount instead of sorting.
+        slots = self.column(dimension).astype(np.int64) + 1
+        # Contiguous copy: ufunc.at takes a slow path on strided field views
+        values = np.ascontiguousarray(self.column(value), dtype=np.float64)
+        counts = np.bincount(slots)
+        sums = np.bincount(slots, weights=values)
+        minimums = np.full(len(counts), np.inf)
+        maximums = np.full(len(counts), -np.inf)
+        np.minimum.at(minimums, slots, values)
+        np.maximum.at(maximums, slots, values)
+        labels = self.dims.labels(dimension)
+        groups = []
+        for slot in np.flatnonzero(counts):
+            key = int(slot) - 1
+            group = {dimension: labels.get(key)}
+            if dimension in ID_DIMENSIONS:
+                group[f'{dimension}_id'] = key
+            count = int(counts[slot])
+            group.update({
+                'count': count,
+                'sum': float(sums[slot]),
+                'mean': float(sums[slot] / count),
+                'min': float(minimums[slot]),
+                'max': float(maximums[slot]),
+            })
+            groups.append(group)
+        sort_key = order_by.lstrip('-')
+        groups.sort(key=lambda g: (g[sort_key] is None, g[sort_key]), reverse=order_by.startswith('-'))
+        return groups[:limit] if limit else groups
+
+    def records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows as dicts with codes replaced by labels."""
+        rows = self.rows if self.rows is not None else np.arange(len(self.data))
+        data = self.data[rows[:limit] if limit else rows]
+        airports = self.dims.airports
+        aircraft = self.dims.aircraft
+        providers = self.dims.providers
+        records = []
+        for row in data.tolist():
+            record = dict(zip(ROUTE_DTYPE.names, row))
+            record['origin'] = airports.get(record['origin'])
+            record['dest'] = airports.get(record['dest'])
+            record['aircraft'] = aircraft.get(record['aircraft'])
+            record['provider'] = providers.get(record['provider'])
+            code = record['service_type']
+            record['service_type'] = SERVICE_TYPES[code] if 0 <= code < len(SERVICE_TYPES) else None
+            distance = record['distance']
+            record['cost_per_nm'] = record['total_flight_cost'] / distance if distance else None
+            records.append(record)
+        return records
+
+
+class RouteStore:
+    """Process-wide holder of the current RouteTable, refreshed on data version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[RouteTable] = None
+        self.last_refresh: Dict[str, Any] = {}
+
+    def table(self) -> RouteTable:
+        """The current snapshot, loading or refreshing it first if the data changed."""
+        from main.versioning import DATA_VERSION, get_version
+
+        version = get_version(DATA_VERSION)
+        table = self._table
+        if table is not None and table.version == version:
+            return table
+        with self._lock:
+            if self._table is None or self._table.version != version:
+                self._table = self._refresh(self._table, version)
+            return self._table
+
+    def _refresh(self, current: Optional[RouteTable], version: int) -> RouteTable:
+        from main.models import Route
+
+        start = time.perf_counter()
+        dims = load_dimensions()
+        mode = 'full'
+        if current is not None and len(current.data):
+            new_rows = load_route_array(dims, min_id=int(current.data['id'].max()))
+            # Rows are never updated in place: if the table size matches
+            # what we hold plus the new rows, nothing was deleted.
+            if Route.objects.count() == len(current.data) + len(new_rows):
+                mode = 'incremental'
+                data = np.concatenate((current.data, new_rows)) if len(new_rows) else current.data
+        if mode == 'full':
+            data = load_route_array(dims)
+        self.last_refresh = {
+            'mode': mode,
+            'rows': len(data),
+            'seconds': time.perf_counter() - start,
+            'version': version,
+        }
+        return RouteTable(data, dims, version)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._table = None
+
+
+_store = RouteStore()
+
+
+def get_route_store() -> RouteStore:
+    return _store
+
+
+def run_query(spec: Dict[str, Any], table: Optional[RouteTable] = None) -> Dict[str, Any]:
+    """
+    Run a JSON query spec against the store.
+
+    spec keys: ``filters`` (conditions for RouteTable.filter), ``order_by``
+    (column name or list), ``limit`` (default 100), ``group_by`` (dimension)
+    with ``value`` (column aggregated, default total_flight_cost).
+    """
+    table = table if table is not None else get_route_store().table()
+    start = time.perf_counter()
+    selection = table.filter(**spec.get('filters', {}))
+    limit = int(spec.get('limit', 100))
+    if limit < 0:
+        raise ValueError('limit must not be negative')
+    result: Dict[str, Any] = {'count': selection.count()}
+    if spec.get('group_by'):
+        result['groups'] = selection.group_by(
+            spec['group_by'], spec.get('value', 'total_flight_cost'), limit=limit,
+        )
+    else:
+        order_by = spec.get('order_by')
+        if isinstance(order_by, Sequence) and not isinstance(order_by, str) and len(order_by) > 1:
+            result['routes'] = selection.order_by(*order_by).records(limit)
+        else:
+            if isinstance(order_by, Sequence) and not isinstance(order_by, str):
+                order_by = order_by[0] if order_by else None
+            result['routes'] = selection.top(limit, by=order_by)
+    result['elapsed_ms'] = (time.perf_counter() - start) * 1000
+    result['version'] = table.version
+    return result
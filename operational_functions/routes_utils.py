@@ -18,9 +18,11 @@ Performance optimizations:
 from __future__ import annotations
 
 import math
+import sys
+from contextlib import ExitStack
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple, Set
+from typing import Collection, Dict, List, Optional, Tuple, Set
 import os
 import django
 
@@ -28,15 +30,23 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'financialsim.settings')
 django.setup()
 
-from django.db import transaction
+from django.db import router, transaction
 from main.models import Airport, Aircraft, CharterProvider, Route
+from main.versioning import DATA_VERSION, bump_version
+from operational_functions import route_db, route_partitions
+from operational_functions.route_purge import truncate_routes
+from operational_functions.run_report import RunReport, SkipAggregator
+from operational_functions.single_flight import SingleFlight, file_lock
+from operational_functions.tracing import current_span, traced
 
 
 # =============================================================================
 # DATA CLASSES (for type safety and clarity)
 # =============================================================================
+# Slotted: no per-instance __dict__, which matters at millions of RouteMetrics.
+# Legs are shared per airport pair (interned in compute_route_metrics).
 
-@dataclass
+@dataclass(slots=True)
 class AirportData:
     """Lightweight airport data for computation."""
     id: int
@@ -48,9 +58,7 @@ class AirportData:
     airport_fee: float
 
 
-@dataclass
-
-@dataclass
+@dataclass(slots=True)
 class AircraftData:
     """Lightweight aircraft data for computation."""
     id: int
@@ -62,7 +70,7 @@ class AircraftData:
     max_range_at_max_payload: float
 
 
-@dataclass
+@dataclass(slots=True)
 class ProviderData:
     """Lightweight provider data for computation."""
     id: int
@@ -72,7 +80,7 @@ class ProviderData:
     service_type: str  # 'charter' or 'acmi'
 
 
-@dataclass
+@dataclass(slots=True)
 class RouteMetrics:
     """Computed route metrics."""
     leg: str
@@ -96,6 +104,60 @@ class RouteMetrics:
 # LAYER 1: DATA LOADING
 # =============================================================================
 
+# Column projections read by the Layer 1 loaders, in dataclass field order.
+# Loaders never instantiate model objects: rows come straight from
+# values_list and are normalized to plain tuples (Decimal -> float, NULL -> 0)
+# which is also the form stored in world snapshots (world_snapshot).
+AIRPORT_COLUMNS = ('id', 'iata_code', 'latitude', 'longitude', 'altitude_ft', 'fuel_cost_gl', 'airport_fee')
+AIRCRAFT_COLUMNS = (
+    'id', 'short_name', 'cruise_speed', 'max_payload_lbs', 'fuel_burn_gal', 'mtow_kg', 'max_range_at_max_payload',
+)
+PROVIDER_COLUMNS = ('id', 'name', 'aircraft_id', 'block_hour_cost', 'type')
+
+VALID_SERVICE_TYPES = ('charter', 'acmi')
+
+
+def load_airport_rows() -> List[Tuple]:
+    """Airport rows in AIRPORT_COLUMNS order."""
+    return [
+        (pk, code, lat, lon, alt, float(fuel or 0), float(fee or 0))
+        for pk, code, lat, lon, alt, fuel, fee in Airport.objects.values_list(*AIRPORT_COLUMNS)
+    ]
+
+
+def load_aircraft_rows() -> List[Tuple]:
+    """Aircraft rows in AIRCRAFT_COLUMNS order."""
+    return [
+        (pk, short_name, *(float(value or 0) for value in values))
+        for pk, short_name, *values in Aircraft.objects.values_list(*AIRCRAFT_COLUMNS)
+    ]
+
+
+def load_provider_rows() -> List[Tuple]:
+    """Rows of charter/ACMI providers in PROVIDER_COLUMNS order."""
+    queryset = CharterProvider.objects.filter(type__in=VALID_SERVICE_TYPES).order_by('id')
+    return [
+        (pk, name, aircraft_id, float(cost or 0), service_type)
+        for pk, name, aircraft_id, cost, service_type in queryset.values_list(*PROVIDER_COLUMNS)
+    ]
+
+
+def airports_from_rows(rows: List[Tuple]) -> Dict[str, AirportData]:
+    return {row[1]: AirportData(*row) for row in rows}
+
+
+def aircraft_from_rows(rows: List[Tuple]) -> Dict[int, AircraftData]:
+    return {row[0]: AircraftData(*row) for row in rows}
+
+
+def providers_from_rows(rows: List[Tuple]) -> Tuple[List[ProviderData], Dict[int, List[ProviderData]]]:
+    providers = [ProviderData(*row) for row in rows]
+    providers_by_aircraft: Dict[int, List[ProviderData]] = {}
+    for provider in providers:
+        providers_by_aircraft.setdefault(provider.aircraft_id, []).append(provider)
+    return providers, providers_by_aircraft
+
+
 def load_airports() -> Dict[str, AirportData]:
     """
     Load all airports into a dictionary keyed by IATA code.
@@ -103,18 +165,7 @@ def load_airports() -> Dict[str, AirportData]:
     Returns:
         Dict mapping IATA code to AirportData
     """
-    airports = {}
-    for airport in Airport.objects.all():
-        airports[airport.iata_code] = AirportData(
-            id=airport.id,
-            iata_code=airport.iata_code,
-            latitude=airport.latitude,
-            longitude=airport.longitude,
-            altitude_ft=airport.altitude_ft,
-            fuel_cost_gl=float(airport.fuel_cost_gl or 0),
-            airport_fee=float(airport.airport_fee or 0),
-        )
-    return airports
+    return airports_from_rows(load_airport_rows())
 
 
 def load_aircraft() -> Dict[int, AircraftData]:
@@ -124,18 +175,7 @@ def load_aircraft() -> Dict[int, AircraftData]:
     Returns:
         Dict mapping aircraft ID to AircraftData
     """
-    aircraft_dict = {}
-    for ac in Aircraft.objects.all():
-        aircraft_dict[ac.id] = AircraftData(
-            id=ac.id,
-            short_name=ac.short_name,
-            cruise_speed=float(ac.cruise_speed or 0),
-            max_payload_lbs=float(ac.max_payload_lbs or 0),
-            fuel_burn_gal=float(ac.fuel_burn_gal or 0),
-            mtow_kg=float(ac.mtow_kg or 0),
-            max_range_at_max_payload=float(ac.max_range_at_max_payload or 0),
-        )
-    return aircraft_dict
+    return aircraft_from_rows(load_aircraft_rows())
 
 
 def load_providers() -> Tuple[List[ProviderData], Dict[int, List[ProviderData]]]:
@@ -145,29 +185,7 @@ def load_providers() -> Tuple[List[ProviderData], Dict[int, List[ProviderData]]]
     Returns:
         Tuple of (all providers list, dict mapping aircraft_id to list of providers)
     """
-    providers = []
-    providers_by_aircraft: Dict[int, List[ProviderData]] = {}
-    
-    valid_types = {'charter', 'acmi'}
-    
-    for provider in CharterProvider.objects.select_related('aircraft').all():
-        if provider.type not in valid_types:
-            continue
-            
-        pd = ProviderData(
-            id=provider.id,
-            name=provider.name,
-            aircraft_id=provider.aircraft_id,
-            block_hour_cost=float(provider.block_hour_cost or 0),
-            service_type=provider.type,
-        )
-        providers.append(pd)
-        
-        if provider.aircraft_id not in providers_by_aircraft:
-            providers_by_aircraft[provider.aircraft_id] = []
-        providers_by_aircraft[provider.aircraft_id].append(pd)
-    
-    return providers, providers_by_aircraft
+    return providers_from_rows(load_provider_rows())
 
 
 def load_existing_route_keys() -> Set[str]:
@@ -184,7 +202,7 @@ def load_existing_route_keys() -> Set[str]:
     return existing
 
 
-def load_all_data() -> Tuple[
+def load_all_data(report: Optional[RunReport] = None, use_snapshot: bool = False) -> Tuple[
     Dict[str, AirportData],
     Dict[int, AircraftData],
     List[ProviderData],
@@ -194,13 +212,38 @@ def load_all_data() -> Tuple[
     """
     Load all required data from the database in a single pass.
     
+    Args:
+        report: Optional run report receiving per-table load timings and row counts
+        use_snapshot: Read airports, aircraft and providers from the world
+            snapshot for the current data version (written on a miss)
+    
     Returns:
         Tuple of (airports_dict, aircraft_dict, providers_list, providers_by_aircraft, existing_route_keys)
     """
-    airports = load_airports()
-    aircraft = load_aircraft()
-    providers, providers_by_aircraft = load_providers()
-    existing_keys = load_existing_route_keys()
+    if report is None:
+        report = RunReport('load_all_data')
+    
+    if use_snapshot:
+        from operational_functions.world_snapshot import load_world
+        with report.stage('load_snapshot'):
+            world = load_world()
+        report.count('snapshot_hit', int(world.from_snapshot))
+        airports, aircraft = world.airports, world.aircraft
+        providers, providers_by_aircraft = world.providers, world.providers_by_aircraft
+    else:
+        with report.stage('load_airports'):
+            airports = load_airports()
+        with report.stage('load_aircraft'):
+            aircraft = load_aircraft()
+        with report.stage('load_providers'):
+            providers, providers_by_aircraft = load_providers()
+    with report.stage('load_existing_routes'):
+        existing_keys = load_existing_route_keys()
+    
+    report.count('airports', len(airports))
+    report.count('aircraft', len(aircraft))
+    report.count('providers', len(providers))
+    report.count('existing_routes', len(existing_keys))
     
     return airports, aircraft, providers, providers_by_aircraft, existing_keys
 
@@ -209,6 +252,10 @@ def load_all_data() -> Tuple[
 # LAYER 2: PURE COMPUTATION (GPU-READY)
 # =============================================================================
 
+# Overflight fee per nautical mile (ACMI routes)
+OVERFLIGHT_FEE_RATE = 0.3
+
+
 def calculate_distance_haversine(
     lat1: float, lon1: float,
     lat2: float, lon2: float
@@ -358,8 +405,6 @@ def compute_route_metrics(
     max_payload = aircraft.max_payload_lbs * (1.0 - payload_factor)
     
     # Cost calculations based on service type
-    OVERFLIGHT_FEE_RATE = 0.3
-    
     if provider.service_type == 'charter':
         # Charter: all-inclusive block hour rate
         block_hours_cost = adjusted_flight_time * provider.block_hour_cost
@@ -379,7 +424,7 @@ def compute_route_metrics(
         total_flight_cost = block_hours_cost + fuel_cost + overflight_cost + airport_fees_cost
     
     return RouteMetrics(
-        leg=f"{from_iata} - {to_iata}",
+        leg=sys.intern(f"{from_iata} - {to_iata}"),
         distance_nm=distance_nm,
         aircraft_id=aircraft.id,
         provider_id=provider.id,
@@ -397,6 +442,59 @@ def compute_route_metrics(
     )
 
 
+class RouteCostTable:
+    """
+    Per-run memo of the cost terms of compute_route_metrics.
+    
+    Adjusted flight time only takes 0.5 h bucket values, and every cost term
+    except overflight depends on the route only through that bucket:
+    
+        block_hours_cost                      (provider, bucket)
+        route_fuel_gls, fuel_cost             (aircraft, origin, bucket)
+        airport_fees_cost                     (aircraft, origin)
+    
+    so each is computed once per key and looked up for every other route
+    sharing it; only the distance-proportional overflight cost is per route.
+    Pure Python (no NumPy), with results identical to compute_route_metrics.
+    """
+    
+    def __init__(self):
+        self._block: Dict[Tuple[int, float], float] = {}
+        self._acmi: Dict[Tuple[int, str, float], Tuple[float, float, float]] = {}
+    
+    def block_hours_cost(self, provider: ProviderData, adjusted_flight_time: float) -> float:
+        key = (provider.id, adjusted_flight_time)
+        cost = self._block.get(key)
+        if cost is None:
+            cost = adjusted_flight_time * provider.block_hour_cost
+            if provider.service_type == 'charter':
+                cost = round(cost / 500) * 500  # Round to nearest 500
+            self._block[key] = cost
+        return cost
+    
+    def acmi_terms(
+        self,
+        aircraft: AircraftData,
+        from_airport: AirportData,
+        adjusted_flight_time: float,
+    ) -> Tuple[float, float, float]:
+        """(route_fuel_gls, fuel_cost, airport_fees_cost) for an ACMI route."""
+        key = (aircraft.id, from_airport.iata_code, adjusted_flight_time)
+        terms = self._acmi.get(key)
+        if terms is None:
+            route_fuel_gls = aircraft.fuel_burn_gal * adjusted_flight_time
+            terms = (
+                route_fuel_gls,
+                from_airport.fuel_cost_gl * route_fuel_gls,
+                aircraft.mtow_kg * from_airport.airport_fee,
+            )
+            self._acmi[key] = terms
+        return terms
+    
+    def __len__(self) -> int:
+        return len(self._block) + len(self._acmi)
+
+
 def generate_all_route_metrics(
     airports: Dict[str, AirportData],
     aircraft: Dict[int, AircraftData],
@@ -404,6 +502,9 @@ def generate_all_route_metrics(
     distances: Dict[Tuple[str, str], float],
     existing_keys: Set[str],
     skip_existing: bool = True,
+    report: Optional[RunReport] = None,
+    memoize: bool = True,
+    origins: Optional[Collection[str]] = None,
 ) -> List[RouteMetrics]:
     """
     Generate route metrics for all valid airport-aircraft-provider combinations.
@@ -417,14 +518,32 @@ def generate_all_route_metrics(
         distances: Precomputed distances
         existing_keys: Set of existing route keys to skip
         skip_existing: Whether to skip routes that already exist
+        report: Optional run report receiving computed counts and skip reasons
+        memoize: Use the bucketed RouteCostTable path (same results) instead of
+            calling compute_route_metrics for every route
+        origins: Only generate routes departing from these airports
     
     Returns:
         List of RouteMetrics for all new routes
     """
+    if memoize:
+        return _generate_route_metrics_bucketed(
+            airports, aircraft, providers_by_aircraft, distances,
+            existing_keys, skip_existing, report, origins,
+        )
+    
     routes: List[RouteMetrics] = []
     airport_codes = list(airports.keys())
+    origin_codes = airport_codes if origins is None else [code for code in airport_codes if code in origins]
     
-    for from_iata in airport_codes:
+    skips = report.skips if report is not None else SkipAggregator()
+    add_skip = skips.add
+    
+    # Plain local counters keep the inner loop cheap; folded into the aggregator at the end
+    skipped_no_distance = 0
+    skipped_existing = 0
+    
+    for from_iata in origin_codes:
         from_airport = airports[from_iata]
         
         for to_iata in airport_codes:
@@ -434,19 +553,21 @@ def generate_all_route_metrics(
             # Get precomputed distance
             distance_nm = distances.get((from_iata, to_iata))
             if not distance_nm:
+                skipped_no_distance += 1
                 continue
             
             # Generate routes for each aircraft and its providers
             for ac_id, ac_data in aircraft.items():
                 # Restriction: skip aircraft if route distance > max_range_at_max_payload
                 if ac_data.max_range_at_max_payload and distance_nm > ac_data.max_range_at_max_payload:
-                    print(f"SKIP: {ac_data.short_name} (max_range_at_max_payload={ac_data.max_range_at_max_payload}) for route {from_iata}-{to_iata} (distance={distance_nm})")
+                    add_skip('out_of_range', ac_data.short_name, from_iata, to_iata, distance_nm)
                     continue
                 providers = providers_by_aircraft.get(ac_id, [])
                 for provider in providers:
                     # Check if route already exists
                     route_key = f"{from_iata} - {to_iata}|{ac_id}|{provider.id}"
                     if skip_existing and route_key in existing_keys:
+                        skipped_existing += 1
                         continue
                     # Compute metrics
                     metrics = compute_route_metrics(
@@ -459,6 +580,108 @@ def generate_all_route_metrics(
                     )
                     routes.append(metrics)
     
+    skips.add_count('no_distance', skipped_no_distance)
+    skips.add_count('existing', skipped_existing)
+    if report is not None:
+        report.count('metrics_computed', len(routes))
+    
+    return routes
+
+
+def _generate_route_metrics_bucketed(
+    airports: Dict[str, AirportData],
+    aircraft: Dict[int, AircraftData],
+    providers_by_aircraft: Dict[int, List[ProviderData]],
+    distances: Dict[Tuple[str, str], float],
+    existing_keys: Set[str],
+    skip_existing: bool,
+    report: Optional[RunReport],
+    origins: Optional[Collection[str]] = None,
+) -> List[RouteMetrics]:
+    """
+    generate_all_route_metrics with per-route work reduced to table lookups.
+    
+    Flight time is computed once per (pair, aircraft) and max payload once per
+    (origin, aircraft) instead of once per provider; cost terms come from a
+    RouteCostTable built during the run.
+    """
+    routes: List[RouteMetrics] = []
+    append = routes.append
+    airport_codes = list(airports.keys())
+    origin_codes = airport_codes if origins is None else [code for code in airport_codes if code in origins]
+    cost_table = RouteCostTable()
+    block_hours_cost_for = cost_table.block_hours_cost
+    acmi_terms_for = cost_table.acmi_terms
+    
+    skips = report.skips if report is not None else SkipAggregator()
+    add_skip = skips.add
+    
+    skipped_no_distance = 0
+    skipped_existing = 0
+    
+    aircraft_providers = [
+        (ac_data, providers_by_aircraft.get(ac_id, []))
+        for ac_id, ac_data in aircraft.items()
+    ]
+    
+    for from_iata in origin_codes:
+        from_airport = airports[from_iata]
+        payload_factor = get_payload_factor(from_airport.altitude_ft)
+        max_payloads = {
+            ac_data.id: ac_data.max_payload_lbs * (1.0 - payload_factor)
+            for ac_data, _ in aircraft_providers
+        }
+        
+        for to_iata in airport_codes:
+            if from_iata == to_iata:
+                continue
+            
+            distance_nm = distances.get((from_iata, to_iata))
+            if not distance_nm:
+                skipped_no_distance += 1
+                continue
+            leg = f"{from_iata} - {to_iata}"
+            overflight_cost = distance_nm * OVERFLIGHT_FEE_RATE
+            
+            for ac_data, providers in aircraft_providers:
+                if ac_data.max_range_at_max_payload and distance_nm > ac_data.max_range_at_max_payload:
+                    add_skip('out_of_range', ac_data.short_name, from_iata, to_iata, distance_nm)
+                    continue
+                if not providers:
+                    continue
+                ac_id = ac_data.id
+                flight_time = distance_nm / ac_data.cruise_speed if ac_data.cruise_speed > 0 else 0.0
+                adjusted_flight_time = calculate_adjusted_flight_time(flight_time)
+                max_payload = max_payloads[ac_id]
+                
+                for provider in providers:
+                    if skip_existing and f"{leg}|{ac_id}|{provider.id}" in existing_keys:
+                        skipped_existing += 1
+                        continue
+                    block_hours_cost = block_hours_cost_for(provider, adjusted_flight_time)
+                    if provider.service_type == 'charter':
+                        append(RouteMetrics(
+                            leg, distance_nm, ac_id, provider.id, flight_time, adjusted_flight_time,
+                            max_payload, 'charter', block_hours_cost, 0.0, 0.0, OVERFLIGHT_FEE_RATE,
+                            0.0, 0.0, block_hours_cost,
+                        ))
+                    else:
+                        route_fuel_gls, fuel_cost, airport_fees_cost = acmi_terms_for(
+                            ac_data, from_airport, adjusted_flight_time,
+                        )
+                        append(RouteMetrics(
+                            leg, distance_nm, ac_id, provider.id, flight_time, adjusted_flight_time,
+                            max_payload, provider.service_type, block_hours_cost, route_fuel_gls,
+                            fuel_cost, OVERFLIGHT_FEE_RATE, overflight_cost, airport_fees_cost,
+                            block_hours_cost + fuel_cost + overflight_cost + airport_fees_cost,
+                        ))
+    
+    skips.add_count('no_distance', skipped_no_distance)
+    skips.add_count('existing', skipped_existing)
+    if report is not None:
+        report.count('metrics_computed', len(routes))
+        report.count('cost_table_entries', len(cost_table))
+    
     return routes
 
 
@@ -508,6 +731,7 @@ def create_route_objects(
 def save_routes_bulk(
     route_objects: List[Route],
     batch_size: int = 1000,
+    using: Optional[str] = None,
 ) -> int:
     """
     Bulk insert routes into the database.
@@ -515,6 +739,8 @@ def save_routes_bulk(
     Args:
         route_objects: List of Route model instances
         batch_size: Number of routes per batch
+        using: Database alias (default: where the router sends Route writes,
+            or each route's region partition)
     
     Returns:
         Number of routes created
@@ -522,53 +748,94 @@ def save_routes_bulk(
     if not route_objects:
         return 0
     
-    with transaction.atomic():
-        Route.objects.bulk_create(route_objects, batch_size=batch_size)
+    if route_partitions.enabled():
+        # Ids are allocated across partitions so they stay unique in the union
+        route_partitions.assign_route_ids(route_objects)
+        groups = {using: route_objects} if using else route_partitions.group_by_partition(route_objects)
+    else:
+        groups = {using or router.db_for_write(Route): route_objects}
+    for alias, objects in groups.items():
+        with transaction.atomic(using=alias):
+            Route.objects.using(alias).bulk_create(objects, batch_size=batch_size)
+    
+    # bulk_create sends no post_save signals
+    bump_version(DATA_VERSION)
     
     return len(route_objects)
 
 
-def regenerate_all_routes(batch_size: int = 1000) -> int:
+@traced()
+def regenerate_all_routes(batch_size: int = 1000) -> RunReport:
     """
     Delete all existing routes and regenerate from scratch.
     
-    Use this for full refresh when data has changed significantly.
+    Use this for full refresh when data has changed significantly. With
+    blue/green route storage (route_db) the routes are built into a new
+    generation instead, and readers keep the old table until the swap.
     
     Args:
         batch_size: Number of routes per bulk insert batch
     
     Returns:
-        Number of routes created
+        RunReport with stage timings; ``routes_created`` holds the number of routes created
     """
-    with transaction.atomic():
-        Route.objects.all().delete()
+    report = RunReport('regenerate_all_routes')
+    if route_partitions.enabled():
+        with report.stage('partitions'):
+            results = route_partitions.regenerate_partitions(batch_size=batch_size)
+        for region, result in results.items():
+            report.count(f'routes:{region}', result['routes_created'])
+        return report.finish(sum(result['routes_created'] for result in results.values()))
+    
+    blue_green = route_db.enabled()
+    
+    if not blue_green:
+        with report.stage('delete'):
+            # Keep the id sequence: RouteStore refreshes incrementally by id
+            truncate_routes(reset_sequence=False)
     
     # Load data
-    airports, aircraft, providers, providers_by_aircraft, _ = load_all_data()
+    airports, aircraft, providers, providers_by_aircraft, _ = load_all_data(report)
     
     # Precompute distances
-    distances = precompute_distances(airports)
+    with report.stage('distances'):
+        distances = precompute_distances(airports)
+    report.count('distance_pairs', len(distances))
     
     # Generate route metrics (don't skip existing since we deleted all)
-    route_metrics = generate_all_route_metrics(
-        airports=airports,
-        aircraft=aircraft,
-        providers_by_aircraft=providers_by_aircraft,
-        distances=distances,
-        existing_keys=set(),
-        skip_existing=False,
-    )
+    with report.stage('metrics'):
+        route_metrics = generate_all_route_metrics(
+            airports=airports,
+            aircraft=aircraft,
+            providers_by_aircraft=providers_by_aircraft,
+            distances=distances,
+            existing_keys=set(),
+            skip_existing=False,
+            report=report,
+        )
     
     # Create and save routes
-    route_objects = create_route_objects(route_metrics, aircraft)
-    return save_routes_bulk(route_objects, batch_size=batch_size)
+    with report.stage('objects'):
+        route_objects = create_route_objects(route_metrics, aircraft)
+    if not blue_green:
+        with report.stage('insert'):
+            created = save_routes_bulk(route_objects, batch_size=batch_size)
+        return report.finish(created)
+    
+    with route_db.new_generation() as generation:
+        with report.stage('insert'):
+            created = save_routes_bulk(route_objects, batch_size=batch_size, using=generation.alias)
+        with report.stage('swap'):
+            generation.publish()
+    return report.finish(created)
 
 
 # =============================================================================
 # PUBLIC API (Backward Compatible)
 # =============================================================================
 
-def generate_routes_list() -> int:
+@traced()
+def generate_routes_list() -> RunReport:
     """
     Generate and update the list of available routes.
     
@@ -576,45 +843,55 @@ def generate_routes_list() -> int:
     Skips existing routes for performance.
     
     Returns:
-        Number of new routes created
+        RunReport with stage timings; ``routes_created`` holds the number of new routes
     """
+    report = RunReport('generate_routes_list')
+    
     # Load all data
-    airports, aircraft, providers, providers_by_aircraft, existing_keys = load_all_data()
+    airports, aircraft, providers, providers_by_aircraft, existing_keys = load_all_data(report)
     
     # Precompute distances
-    distances = precompute_distances(airports)
+    with report.stage('distances'):
+        distances = precompute_distances(airports)
+    report.count('distance_pairs', len(distances))
     
     # Generate only new route metrics
-    route_metrics = generate_all_route_metrics(
-        airports=airports,
-        aircraft=aircraft,
-        providers_by_aircraft=providers_by_aircraft,
-        distances=distances,
-        existing_keys=existing_keys,
-        skip_existing=True,
-    )
+    with report.stage('metrics'):
+        route_metrics = generate_all_route_metrics(
+            airports=airports,
+            aircraft=aircraft,
+            providers_by_aircraft=providers_by_aircraft,
+            distances=distances,
+            existing_keys=existing_keys,
+            skip_existing=True,
+            report=report,
+        )
     
     if not route_metrics:
-        return 0
+        return report.finish(0)
     
     # Create and save routes
-    route_objects = create_route_objects(route_metrics, aircraft)
-    return save_routes_bulk(route_objects)
+    with report.stage('objects'):
+        route_objects = create_route_objects(route_metrics, aircraft)
+    with report.stage('insert'):
+        created = save_routes_bulk(route_objects)
+    return report.finish(created)
 
 
-def update_routes_on_change() -> int:
+def update_routes_on_change() -> RunReport:
     """
     Update routes after any airport, aircraft, or charter provider change.
     
     This is the main entry point called by views after data modifications.
     
     Returns:
-        Number of new routes created
+        RunReport of the underlying generate_routes_list() run
     """
     return generate_routes_list()
 
 
-def calculate_route_on_the_fly(departure_code: str, arrival_code: str) -> int:
+@traced()
+def calculate_route_on_the_fly(departure_code: str, arrival_code: str) -> RunReport:
     """
     Generate routes for a specific airport pair or for new airports.
     
@@ -626,14 +903,17 @@ def calculate_route_on_the_fly(departure_code: str, arrival_code: str) -> int:
         arrival_code: IATA code of arrival airport
     
     Returns:
-        Number of routes created
+        RunReport with stage timings; ``routes_created`` holds the number of routes created
     """
+    report = RunReport('calculate_route_on_the_fly')
+    
     # Load all data
-    airports, aircraft, providers, providers_by_aircraft, existing_keys = load_all_data()
+    airports, aircraft, providers, providers_by_aircraft, existing_keys = load_all_data(report)
     
     # Verify airports exist
     if departure_code not in airports or arrival_code not in airports:
-        return 0
+        report.skip('unknown_airport')
+        return report.finish(0)
     
     # Check if either airport is new (no existing routes)
     dep_has_routes = any(departure_code in key for key in existing_keys)
@@ -656,40 +936,83 @@ def calculate_route_on_the_fly(departure_code: str, arrival_code: str) -> int:
                     pairs.add((iata, new_code))
     else:
         pairs = {(departure_code, arrival_code)}
+    report.count('requested_pairs', len(pairs))
+    current_span().set_attribute('pairs', len(pairs))
     
     # Filter distances to only needed pairs
-    all_distances = precompute_distances(airports)
-    distances = {k: v for k, v in all_distances.items() if k in pairs}
+    with report.stage('distances'):
+        all_distances = precompute_distances(airports)
+        distances = {k: v for k, v in all_distances.items() if k in pairs}
+    report.count('distance_pairs', len(distances))
     
     # Generate route metrics for the pairs
     routes: List[RouteMetrics] = []
-    for from_iata, to_iata in pairs:
-        from_airport = airports[from_iata]
-        distance_nm = distances.get((from_iata, to_iata))
-        if not distance_nm:
-            continue
-        
-        for ac_id, ac_data in aircraft.items():
-            for provider in providers_by_aircraft.get(ac_id, []):
-                route_key = f"{from_iata} - {to_iata}|{ac_id}|{provider.id}"
-                if route_key in existing_keys:
-                    continue
-                
-                metrics = compute_route_metrics(
-                    from_iata=from_iata,
-                    to_iata=to_iata,
-                    distance_nm=distance_nm,
-                    aircraft=ac_data,
-                    provider=provider,
-                    from_airport=from_airport,
-                )
-                routes.append(metrics)
+    skipped_no_distance = 0
+    skipped_existing = 0
+    with report.stage('metrics'):
+        for from_iata, to_iata in pairs:
+            from_airport = airports[from_iata]
+            distance_nm = distances.get((from_iata, to_iata))
+            if not distance_nm:
+                skipped_no_distance += 1
+                continue
+            
+            for ac_id, ac_data in aircraft.items():
+                for provider in providers_by_aircraft.get(ac_id, []):
+                    route_key = f"{from_iata} - {to_iata}|{ac_id}|{provider.id}"
+                    if route_key in existing_keys:
+                        skipped_existing += 1
+                        continue
+                    
+                    metrics = compute_route_metrics(
+                        from_iata=from_iata,
+                        to_iata=to_iata,
+                        distance_nm=distance_nm,
+                        aircraft=ac_data,
+                        provider=provider,
+                        from_airport=from_airport,
+                    )
+                    routes.append(metrics)
+    report.count('metrics_computed', len(routes))
+    report.skip('no_distance', skipped_no_distance)
+    report.skip('existing', skipped_existing)
     
     if not routes:
-        return 0
+        return report.finish(0)
+    
+    with report.stage('objects'):
+        route_objects = create_route_objects(routes, aircraft)
+    with report.stage('insert'):
+        created = save_routes_bulk(route_objects)
+    return report.finish(created)
+
+
+_pair_flights = SingleFlight()
+
+
+def ensure_pair_routes(departure_code: str, arrival_code: str) -> Optional[RunReport]:
+    """
+    Single-flight wrapper around calculate_route_on_the_fly for request handlers.
+    
+    Concurrent callers for the same pair in this process wait for one
+    computation and share its report. Across threads and worker processes,
+    the computation holds a file lock per airport, so two requests that would
+    both generate a new airport's routes run one after the other; once the
+    lock is held, a pair that already has routes is not recomputed.
     
-    route_objects = create_route_objects(routes, aircraft)
-    return save_routes_bulk(route_objects)
+    Returns:
+        RunReport of the computation, or None if another worker produced the routes
+    """
+    def compute() -> Optional[RunReport]:
+        with ExitStack() as locks:
+            # Sorted so two pairs sharing both airports lock in the same order
+            for code in sorted({departure_code, arrival_code}):
+                locks.enter_context(file_lock(f'routes:{code}'))
+            if Route.objects.for_leg(f"{departure_code} - {arrival_code}").exists():
+                return None
+            return calculate_route_on_the_fly(departure_code, arrival_code)
+    
+    return _pair_flights.do((departure_code, arrival_code), compute)
 
 
 # =============================================================================
@@ -763,3 +1086,78 @@ def get_payload_factors_vectorized_numpy(altitudes):
     choices = [0.0, 0.02, 0.05, 0.10, 0.12, 0.16]
     
     return np.select(conditions, choices, default=0.0)
+
+
+def calculate_adjusted_flight_times_vectorized_numpy(flight_times):
+    """
+    Vectorized calculate_adjusted_flight_time: round up to the next 0.5 hour.
+    
+    Args:
+        flight_times: Array of raw flight times in hours
+    
+    Returns:
+        Array of adjusted flight times
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("NumPy required for vectorized computation. Install with: pip install numpy")
+    
+    return np.ceil(np.asarray(flight_times, dtype=float) * 2.0) / 2.0
+
+
+def compute_route_costs_vectorized_numpy(
+    distance_nm,
+    cruise_speed,
+    block_hour_cost,
+    is_charter,
+    fuel_burn_gal,
+    fuel_cost_gl,
+    mtow_kg,
+    airport_fee,
+    overflight_fee_rate=OVERFLIGHT_FEE_RATE,
+):
+    """
+    Vectorized cost part of compute_route_metrics, one array element per route.
+    
+    Per-route inputs are arrays (aircraft, provider and departure airport
+    parameters already gathered per route); overflight_fee_rate may be a
+    scalar or an array.
+    
+    Returns:
+        Dict of arrays: flight_time, adjusted_flight_time, block_hours_cost,
+        route_fuel_gls, fuel_cost, overflight_cost, airport_fees_cost, total_flight_cost
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("NumPy required for vectorized computation. Install with: pip install numpy")
+    
+    distance_nm = np.asarray(distance_nm, dtype=float)
+    cruise_speed = np.asarray(cruise_speed, dtype=float)
+    is_charter = np.asarray(is_charter, dtype=bool)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flight_time = np.where(cruise_speed > 0, distance_nm / cruise_speed, 0.0)
+    adjusted_flight_time = calculate_adjusted_flight_times_vectorized_numpy(flight_time)
+    
+    block_hours_cost = adjusted_flight_time * block_hour_cost
+    # Charter: all-inclusive rate rounded to the nearest 500, nothing else billed
+    block_hours_cost = np.where(is_charter, np.round(block_hours_cost / 500) * 500, block_hours_cost)
+    acmi = ~is_charter
+    route_fuel_gls = np.where(acmi, fuel_burn_gal * adjusted_flight_time, 0.0)
+    fuel_cost = np.where(acmi, fuel_cost_gl * route_fuel_gls, 0.0)
+    overflight_cost = np.where(acmi, distance_nm * overflight_fee_rate, 0.0)
+    airport_fees_cost = np.where(acmi, mtow_kg * airport_fee, 0.0)
+    total_flight_cost = block_hours_cost + fuel_cost + overflight_cost + airport_fees_cost
+    
+    return {
+        'flight_time': flight_time,
+        'adjusted_flight_time': adjusted_flight_time,
+        'block_hours_cost': block_hours_cost,
+        'route_fuel_gls': route_fuel_gls,
+        'fuel_cost': fuel_cost,
+        'overflight_cost': overflight_cost,
+        'airport_fees_cost': airport_fees_cost,
+        'total_flight_cost': total_flight_cost,
+    }
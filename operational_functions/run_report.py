@@ -0,0 +1,182 @@
+"""
+Run reports for the route generation pipeline.
+
+A RunReport collects per-stage wall-clock timings, counters and skip reasons
+while one entry point of routes_utils runs. The latest finished report is
+stored in the Django cache so it can be read from another process (e.g. the
+web server after a management command).
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from operational_functions.tracing import current_span, span
+
+LATEST_REPORT_KEY = 'route-run-report:latest'
+
+# Enable DEBUG on this logger to see a sample of individual skipped routes
+skip_logger = logging.getLogger('operational_functions.routes_utils.skips')
+
+# Log one in every N skips when the skip logger is at DEBUG
+DEFAULT_SKIP_SAMPLE_EVERY = 1000
+
+
+class SkipAggregator:
+    """
+    Count skipped route combinations by reason and aircraft.
+    
+    Replaces per-skip printing in the computation loop: counting is a dict
+    update, and individual skips are only formatted when the skip logger is
+    enabled for DEBUG, and then only one in every ``sample_every``.
+    """
+
+    def __init__(self, sample_every: int = DEFAULT_SKIP_SAMPLE_EVERY, logger: logging.Logger = skip_logger):
+        self.counts: Dict[Tuple[str, Optional[str]], int] = {}
+        self._logger = logger
+        self._sample_every = sample_every if sample_every > 0 and logger.isEnabledFor(logging.DEBUG) else 0
+        self._seen = 0
+
+    def add(
+        self,
+        reason: str,
+        aircraft: Optional[str] = None,
+        from_iata: Optional[str] = None,
+        to_iata: Optional[str] = None,
+        distance_nm: Optional[float] = None,
+    ) -> None:
+        """Count a single skip; route details are only used for sampled logging."""
+        key = (reason, aircraft)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        if self._sample_every:
+            self._seen += 1
+            if (self._seen - 1) % self._sample_every == 0:
+                self._logger.debug(
+                    'SKIP %s: %s for route %s-%s (distance=%s) [sampled 1/%d]',
+                    reason, aircraft, from_iata, to_iata, distance_nm, self._sample_every,
+                )
+
+    def add_count(self, reason: str, count: int, aircraft: Optional[str] = None) -> None:
+        """Fold in a count accumulated elsewhere (e.g. a local loop counter)."""
+        if count:
+            key = (reason, aircraft)
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def by_reason(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for (reason, _), count in self.counts.items():
+            totals[reason] = totals.get(reason, 0) + count
+        return totals
+
+    def by_aircraft(self) -> Dict[str, Dict[str, int]]:
+        """Per-aircraft breakdown: reason -> {aircraft short name: count}."""
+        breakdown: Dict[str, Dict[str, int]] = {}
+        for (reason, aircraft), count in self.counts.items():
+            if aircraft is not None:
+                breakdown.setdefault(reason, {})[aircraft] = count
+        return breakdown
+
+
+@dataclass
+class RunReport:
+    """Timings and counters for one pipeline run."""
+    entry_point: str
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    stages: Dict[str, float] = field(default_factory=dict)  # stage name -> seconds
+    counts: Dict[str, int] = field(default_factory=dict)
+    skips: SkipAggregator = field(default_factory=SkipAggregator)
+    routes_created: int = 0
+    total_seconds: float = 0.0
+    _clock_start: float = field(default_factory=time.perf_counter, repr=False)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block and add it to ``stages`` (repeated stages accumulate).
+        
+        The block is also a tracing span when a trace is active.
+        """
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def skip(self, reason: str, value: int = 1) -> None:
+        self.skips.add_count(reason, value)
+
+    @property
+    def skipped(self) -> Dict[str, int]:
+        """Skip totals by reason."""
+        return self.skips.by_reason()
+
+    @property
+    def insert_rows_per_second(self) -> Optional[float]:
+        seconds = self.stages.get('insert')
+        if not seconds or not self.routes_created:
+            return None
+        return self.routes_created / seconds
+
+    def finish(self, routes_created: int) -> RunReport:
+        """Record the result, close the report and publish it as the latest run."""
+        self.routes_created = routes_created
+        self.total_seconds = time.perf_counter() - self._clock_start
+        current_span().set_attribute('routes_created', routes_created)
+        store_latest_report(self)
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'entry_point': self.entry_point,
+            'started_at': self.started_at,
+            'total_seconds': self.total_seconds,
+            'routes_created': self.routes_created,
+            'insert_rows_per_second': self.insert_rows_per_second,
+            'stages': dict(self.stages),
+            'counts': dict(self.counts),
+            'skipped': self.skipped,
+            'skipped_by_aircraft': self.skips.by_aircraft(),
+        }
+
+    def format(self) -> str:
+        """Human-readable multi-line summary for management commands."""
+        lines = [f'Run report: {self.entry_point} ({self.total_seconds:.3f}s total)']
+        lines.append('  Stages:')
+        for name, seconds in self.stages.items():
+            lines.append(f'    {name:<24}{seconds:>10.3f}s')
+        if self.counts:
+            lines.append('  Counts:')
+            for name, value in self.counts.items():
+                lines.append(f'    {name:<24}{value:>10}')
+        skipped = self.skipped
+        if skipped:
+            by_aircraft = self.skips.by_aircraft()
+            lines.append('  Skipped:')
+            for reason, value in skipped.items():
+                lines.append(f'    {reason:<24}{value:>10}')
+                for aircraft, count in sorted(by_aircraft.get(reason, {}).items()):
+                    lines.append(f'      {aircraft:<22}{count:>10}')
+        rate = self.insert_rows_per_second
+        lines.append(f'  Routes created: {self.routes_created}'
+                     + (f' ({rate:,.0f} rows/s)' if rate else ''))
+        return '\n'.join(lines)
+
+
+def store_latest_report(report: RunReport) -> None:
+    from django.core.cache import cache
+    cache.set(LATEST_REPORT_KEY, report.as_dict(), timeout=None)
+
+
+def get_latest_report() -> Optional[Dict[str, Any]]:
+    """Return the latest published run report as a dict, or None."""
+    from django.core.cache import cache
+    return cache.get(LATEST_REPORT_KEY)
@@ -0,0 +1,329 @@
+"""
+What-if scenarios: re-price the route network under parameter overrides.
+
+A scenario is a list of overrides of the inputs to compute_route_metrics,
+each scoped by selectors:
+
+    {"parameter": "fuel_cost_gl", "region": "Caribbean", "pct": 15}
+    {"parameter": "block_hour_cost", "provider": "Majestic Air Cargo", "pct": 8}
+    {"parameter": "airport_fee", "airport": ["BOG", "MDE"], "value": 0.4}
+    {"parameter": "overflight_fee_rate", "delta": 0.05}
+
+Every stored route (from the columnar route store) is priced with the
+vectorized cost formulas twice, with current and with overridden parameters;
+only routes touched by an override are re-priced. Nothing is written to the
+database. Results are deltas per route, leg, provider and origin region.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from operational_functions.route_store import Dimensions, RouteTable, SERVICE_TYPES, get_route_store
+from operational_functions.routes_utils import (
+    OVERFLIGHT_FEE_RATE,
+    compute_route_costs_vectorized_numpy,
+    load_aircraft,
+    load_airports,
+    load_providers,
+)
+
+# parameter -> (entity it belongs to, selectors allowed)
+PARAMETERS = {
+    'fuel_cost_gl': ('airport', ('airport', 'country', 'region')),
+    'airport_fee': ('airport', ('airport', 'country', 'region')),
+    'block_hour_cost': ('provider', ('provider', 'aircraft', 'service_type')),
+    'fuel_burn_gal': ('aircraft', ('aircraft',)),
+    'cruise_speed': ('aircraft', ('aircraft',)),
+    'mtow_kg': ('aircraft', ('aircraft',)),
+    'overflight_fee_rate': ('global', ()),
+}
+
+CHANGE_KINDS = ('pct', 'value', 'delta')
+
+DEFAULT_TOP = 20
+
+
+@dataclass
+class Override:
+    parameter: str
+    kind: str
+    amount: float
+    selectors: Dict[str, List[Any]]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Override':
+        if not isinstance(data, dict):
+            raise ValueError(f'Each override must be an object, not {type(data).__name__}')
+        parameter = data.get('parameter')
+        if parameter not in PARAMETERS:
+            raise ValueError(f'Unknown parameter {parameter!r}; expected one of {", ".join(PARAMETERS)}')
+        kinds = [kind for kind in CHANGE_KINDS if kind in data]
+        if len(kinds) != 1:
+            raise ValueError(f'Override of {parameter} needs exactly one of {", ".join(CHANGE_KINDS)}')
+        allowed = PARAMETERS[parameter][1]
+        selectors = {}
+        for key, value in data.items():
+            if key in ('parameter',) + CHANGE_KINDS:
+                continue
+            if key not in allowed:
+                raise ValueError(f'{parameter} cannot be selected by {key!r}; use {", ".join(allowed) or "no selectors"}')
+            selectors[key] = value if isinstance(value, list) else [value]
+        return cls(parameter, kinds[0], float(data[kinds[0]]), selectors)
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        if self.kind == 'pct':
+            return values * (1.0 + self.amount / 100.0)
+        if self.kind == 'delta':
+            return values + self.amount
+        return np.full_like(values, self.amount)
+
+
+@dataclass
+class Parameters:
+    """compute_route_metrics inputs as arrays indexed by airport, aircraft or provider ID."""
+    fuel_cost_gl: np.ndarray
+    airport_fee: np.ndarray
+    block_hour_cost: np.ndarray
+    provider_service: np.ndarray
+    provider_aircraft: np.ndarray
+    fuel_burn_gal: np.ndarray
+    cruise_speed: np.ndarray
+    mtow_kg: np.ndarray
+    overflight_fee_rate: float = OVERFLIGHT_FEE_RATE
+
+
+def load_parameters(min_airports: int = 0, min_aircraft: int = 0, min_providers: int = 0) -> Parameters:
+    """Read current parameters with the pipeline's Layer 1 loaders."""
+    airports = load_airports()
+    aircraft = load_aircraft()
+    providers, _ = load_providers()
+
+    n_airports = max([min_airports] + [a.id + 1 for a in airports.values()])
+    n_aircraft = max([min_aircraft] + [a.id + 1 for a in aircraft.values()])
+    n_providers = max([min_providers] + [p.id + 1 for p in providers])
+
+    params = Parameters(
+        fuel_cost_gl=np.zeros(n_airports),
+        airport_fee=np.zeros(n_airports),
+        block_hour_cost=np.zeros(n_providers),
+        provider_service=np.full(n_providers, -1, dtype=np.int8),
+        provider_aircraft=np.full(n_providers, -1, dtype=np.int64),
+        fuel_burn_gal=np.zeros(n_aircraft),
+        cruise_speed=np.zeros(n_aircraft),
+        mtow_kg=np.zeros(n_aircraft),
+    )
+    for airport in airports.values():
+        params.fuel_cost_gl[airport.id] = airport.fuel_cost_gl
+        params.airport_fee[airport.id] = airport.airport_fee
+    for ac in aircraft.values():
+        params.fuel_burn_gal[ac.id] = ac.fuel_burn_gal
+        params.cruise_speed[ac.id] = ac.cruise_speed
+        params.mtow_kg[ac.id] = ac.mtow_kg
+    for provider in providers:
+        params.block_hour_cost[provider.id] = provider.block_hour_cost
+        params.provider_service[provider.id] = SERVICE_TYPES.index(provider.service_type)
+        params.provider_aircraft[provider.id] = provider.aircraft_id
+    return params
+
+
+def _ids_matching(labels: Dict[int, str], values: Sequence[Any], kind: str) -> List[int]:
+    ids = []
+    for value in values:
+        if isinstance(value, int) and value in labels:
+            ids.append(value)
+            continue
+        matched = [pk for pk, label in labels.items() if label == value]
+        if not matched:
+            raise ValueError(f'No {kind} matches {value!r}')
+        ids.extend(matched)
+    return ids
+
+
+def _selection_mask(override: Override, params: Parameters, dims: Dimensions, size: int) -> np.ndarray:
+    """Boolean mask over the override's entity IDs (airports, aircraft or providers)."""
+    mask = np.ones(size, dtype=bool)
+    for key, values in override.selectors.items():
+        selected = np.zeros(size, dtype=bool)
+        if key == 'airport':
+            selected[_ids_matching(dims.airports, values, 'airport')] = True
+        elif key in ('country', 'region'):
+            labels, codes = dims.airport_attributes[key]
+            wanted = []
+            for value in values:
+                if value not in labels:
+                    raise ValueError(f'No {key} matches {value!r}')
+                wanted.append(labels.index(value))
+            # codes carries a trailing sentinel; airports beyond it have no label
+            airport_codes = codes[:-1][:size]
+            selected[:len(airport_codes)] = np.isin(airport_codes, wanted)
+        elif key == 'provider':
+            selected[_ids_matching(dims.providers, values, 'provider')] = True
+        elif key == 'service_type':
+            unknown = set(values) - set(SERVICE_TYPES)
+            if unknown:
+                raise ValueError(f'Unknown service type(s): {", ".join(sorted(unknown))}')
+            selected = np.isin(params.provider_service, [SERVICE_TYPES.index(v) for v in values])
+        elif key == 'aircraft':
+            aircraft_ids = _ids_matching(dims.aircraft, values, 'aircraft')
+            if PARAMETERS[override.parameter][0] == 'provider':
+                selected = np.isin(params.provider_aircraft, aircraft_ids)
+            else:
+                selected[aircraft_ids] = True
+        mask &= selected
+    return mask
+
+
+def apply_overrides(params: Parameters, overrides: List[Override], dims: Dimensions):
+    """
+    Return (scenario parameters, changed) where ``changed`` maps 'airport',
+    'aircraft' and 'provider' to boolean masks of the IDs whose parameters
+    moved, and 'global' to whether a network-wide parameter did.
+    """
+    scenario = replace(params, **{
+        name: getattr(params, name).copy()
+        for name in ('fuel_cost_gl', 'airport_fee', 'block_hour_cost', 'fuel_burn_gal', 'cruise_speed', 'mtow_kg')
+    })
+    changed = {
+        'airport': np.zeros(len(params.fuel_cost_gl), dtype=bool),
+        'aircraft': np.zeros(len(params.cruise_speed), dtype=bool),
+        'provider': np.zeros(len(params.block_hour_cost), dtype=bool),
+        'global': False,
+    }
+    for override in overrides:
+        entity = PARAMETERS[override.parameter][0]
+        if entity == 'global':
+            scenario.overflight_fee_rate = float(override.apply(np.array([scenario.overflight_fee_rate]))[0])
+            changed['global'] = True
+            continue
+        values = getattr(scenario, override.parameter)
+        mask = _selection_mask(override, params, dims, len(values))
+        values[mask] = override.apply(values[mask])
+        changed[entity] |= mask
+    return scenario, changed
+
+
+def price_routes(data: np.ndarray, params: Parameters) -> np.ndarray:
+    """Total cost of each route in ``data`` (ROUTE_DTYPE rows) under ``params``."""
+    origin = data['origin']
+    aircraft = data['aircraft']
+    provider = data['provider']
+    costs = compute_route_costs_vectorized_numpy(
+        distance_nm=data['distance'],
+        cruise_speed=params.cruise_speed[aircraft],
+        block_hour_cost=params.block_hour_cost[provider],
+        is_charter=data['service_type'] == SERVICE_TYPES.index('charter'),
+        fuel_burn_gal=params.fuel_burn_gal[aircraft],
+        fuel_cost_gl=params.fuel_cost_gl[origin],
+        mtow_kg=params.mtow_kg[aircraft],
+        airport_fee=params.airport_fee[origin],
+        overflight_fee_rate=params.overflight_fee_rate,
+    )
+    return costs['total_flight_cost']
+
+
+def _impact(baseline: float, scenario: float, routes: int) -> Dict[str, Any]:
+    delta = scenario - baseline
+    return {
+        'routes': routes,
+        'baseline': baseline,
+        'scenario': scenario,
+        'delta': delta,
+        'delta_pct': delta / baseline * 100 if baseline else None,
+    }
+
+
+def _grouped(keys: np.ndarray, baseline: np.ndarray, scenario: np.ndarray, labels, top: Optional[int], name: str):
+    slots = keys.astype(np.int64) + 1
+    counts = np.bincount(slots)
+    base_sums = np.bincount(slots, weights=baseline)
+    scen_sums = np.bincount(slots, weights=scenario)
+    occupied = np.flatnonzero(counts)
+    order = occupied[np.argsort(-np.abs(scen_sums[occupied] - base_sums[occupied]), kind='stable')]
+    if top:
+        order = order[:top]
+    return [
+        {name: labels(int(slot) - 1), **_impact(float(base_sums[slot]), float(scen_sums[slot]), int(counts[slot]))}
+        for slot in order
+    ]
+
+
+def run_scenario(spec: Dict[str, Any], table: Optional[RouteTable] = None) -> Dict[str, Any]:
+    """
+    Price a scenario against the current route network.
+
+    spec: {"overrides": [...], "top": 20}. Returns the network-wide impact and
+    the ``top`` largest absolute changes by leg, provider, origin region and route.
+    """
+    start = time.perf_counter()
+    overrides = [Override.from_dict(item) for item in spec.get('overrides', [])]
+    if not overrides:
+        raise ValueError('A scenario needs at least one override')
+    top = int(spec.get('top', DEFAULT_TOP))
+
+    table = table if table is not None else get_route_store().table()
+    data, dims = table.data, table.dims
+    params = load_parameters(
+        min_airports=max(dims.airports, default=0) + 1,
+        min_aircraft=max(dims.aircraft, default=0) + 1,
+        min_providers=max(dims.providers, default=0) + 1,
+    )
+    scenario_params, changed = apply_overrides(params, overrides, dims)
+
+    baseline = price_routes(data, params)
+    if changed['global']:
+        affected = np.ones(len(data), dtype=bool)
+    else:
+        affected = (
+            changed['airport'][data['origin']]
+            | changed['aircraft'][data['aircraft']]
+            | changed['provider'][data['provider']]
+        )
+    scenario = baseline.copy()
+    scenario[affected] = price_routes(data[affected], scenario_params)
+    compute_seconds = time.perf_counter() - start
+
+    touched = data[affected]
+    base_touched = baseline[affected]
+    scen_touched = scenario[affected]
+    region_labels, region_codes = dims.airport_attributes['region']
+    regions = region_codes[np.where(touched['origin'] < len(region_codes) - 1, touched['origin'], -1)]
+    # Leg key: origin and destination airport IDs packed into one integer
+    leg_base = max(dims.airports, default=0) + 2
+    legs = (touched['origin'].astype(np.int64) + 1) * leg_base + touched['dest'] + 1
+    leg_keys, leg_slots = np.unique(legs, return_inverse=True)
+
+    def leg_label(slot):
+        key = int(leg_keys[slot])
+        origin, dest = divmod(key, leg_base)
+        return f"{dims.airports.get(origin - 1)} - {dims.airports.get(dest - 1)}"
+
+    route_order = np.argsort(-np.abs(scen_touched - base_touched), kind='stable')[:top]
+    routes = []
+    for i in route_order:
+        row = touched[i]
+        routes.append({
+            'route_id': int(row['id']),
+            'leg': f"{dims.airports.get(int(row['origin']))} - {dims.airports.get(int(row['dest']))}",
+            'aircraft': dims.aircraft.get(int(row['aircraft'])),
+            'provider': dims.providers.get(int(row['provider'])),
+            'service_type': SERVICE_TYPES[row['service_type']] if 0 <= row['service_type'] < len(SERVICE_TYPES) else None,
+            **_impact(float(base_touched[i]), float(scen_touched[i]), 1),
+        })
+
+    return {
+        'network': _impact(float(baseline.sum()), float(scenario.sum()), len(data)),
+        'affected': _impact(float(base_touched.sum()), float(scen_touched.sum()), int(affected.sum())),
+        'by_leg': _grouped(leg_slots, base_touched, scen_touched, leg_label, top, 'leg'),
+        'by_provider': _grouped(touched['provider'], base_touched, scen_touched, dims.providers.get, top, 'provider'),
+        'by_region': _grouped(regions, base_touched, scen_touched,
+                              lambda code: region_labels[code] if code >= 0 else None, top, 'region'),
+        'routes': routes,
+        'compute_ms': compute_seconds * 1000,
+        'elapsed_ms': (time.perf_counter() - start) * 1000,
+        'version': table.version,
+    }
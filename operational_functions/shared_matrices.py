@@ -0,0 +1,341 @@
+"""
+Read-only route matrices shared by every worker process.
+
+A dense index built per process (distance matrix, cheapest route per leg)
+costs its full size once per gunicorn/uvicorn worker. Here one builder
+writes each matrix set as .npy files into a directory named after the data
+versions it was built from, and every process maps them with
+np.load(mmap_mode='r'): the pages sit once in the OS page cache and are
+shared zero-copy, so memory stays flat as the worker count grows.
+
+    matrices = get_shared_matrices()
+    matrices.distance('JFK', 'LHR')
+    matrices.min_cost('JFK', 'LHR', 'acmi')
+
+Sets:
+    world   airport_codes  <U (airports,)       IATA codes, sorted; the matrix index
+            airport_ids    int32 (airports,)
+            distances      float32 (airports, airports)  great-circle nm, NaN without coordinates
+            aircraft_ids, provider_ids (int32) with names in meta.json
+            Keyed by world_snapshot.world_version() (airports, aircraft, providers).
+    costs   min_cost       float32 (service types, airports, airports)
+                           cheapest total_flight_cost per leg, NaN where there is no route
+            Keyed by the world version and DATA_VERSION. costs_aircraft_<id>
+            holds the same for one aircraft type, built on first request.
+
+A process reattaches when the version it holds is no longer current (one
+cache read per access). The first process to need a version that is not on
+disk builds it under a file lock while the others wait and then attach to
+its result; manage.py publish_matrices builds ahead of time. Superseded
+directories are removed, which only unlinks their files: a worker still
+mapping one keeps a valid view until it reattaches.
+
+Settings:
+    SHARED_MATRICES_DIR  Directory for matrix sets (default: <BASE_DIR>/.matrices)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("NumPy required for shared route matrices. Install with: pip install numpy")
+
+SERVICE_TYPES = ('charter', 'acmi')
+
+# Versions kept on disk per set, including the current one.
+KEEP_VERSIONS = 2
+
+# Origin rows computed per block when building the distance matrix, which
+# bounds the builder's working memory to a few (block, airports) arrays.
+DISTANCE_BLOCK_ROWS = 256
+
+META_FILE = 'meta.json'
+
+
+def matrices_dir() -> str:
+    from django.conf import settings
+    path = getattr(settings, 'SHARED_MATRICES_DIR', None) or os.path.join(settings.BASE_DIR, '.matrices')
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def set_path(name: str, version: str) -> str:
+    return os.path.join(matrices_dir(), f'{name}-{version}')
+
+
+class MatrixSet:
+    """The arrays of one published set, memory-mapped read-only."""
+
+    def __init__(self, name: str, version: str, path: str, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.name = name
+        self.version = version
+        self.path = path
+        self.arrays = arrays
+        self.meta = meta
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self.arrays[key]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+def attach(name: str, version: str) -> Optional[MatrixSet]:
+    """Map the published set for ``version``, or None if it has not been published."""
+    path = set_path(name, version)
+    try:
+        with open(os.path.join(path, META_FILE)) as fh:
+            meta = json.load(fh)
+    except FileNotFoundError:
+        return None
+    arrays = {
+        key: np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+        for key in meta['arrays']
+    }
+    return MatrixSet(name, version, path, arrays, meta)
+
+
+def publish(name: str, version: str, build: Callable[[str], Dict[str, Any]]) -> str:
+    """
+    Build a set into a private directory and rename it into place.
+
+    ``build(directory)`` writes one ``<key>.npy`` per array and returns the
+    metadata, which must list the keys under 'arrays'. meta.json is written
+    last, and the directory only appears under its final name complete.
+    """
+    final = set_path(name, version)
+    tmp = tempfile.mkdtemp(dir=matrices_dir(), prefix=f'.{name}-{version}.')
+    try:
+        meta = build(tmp)
+        meta.update({'name': name, 'version': version})
+        with open(os.path.join(tmp, META_FILE), 'w') as fh:
+            json.dump(meta, fh)
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            if not os.path.exists(os.path.join(final, META_FILE)):
+                raise
+            # Published meanwhile by a builder not holding our lock
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    prune(name)
+    return final
+
+
+def prune(name: str, keep: int = KEEP_VERSIONS) -> None:
+    directory = matrices_dir()
+    entries = []
+    for entry in os.listdir(directory):
+        if entry.startswith(name + '-'):
+            path = os.path.join(directory, entry)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+    for _, path in sorted(entries, reverse=True)[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _save(directory: str, key: str, array: np.ndarray) -> None:
+    np.save(os.path.join(directory, f'{key}.npy'), array, allow_pickle=False)
+
+
+# -----------------------------------------------------------------------------
+# Builders
+# -----------------------------------------------------------------------------
+
+def world_version() -> str:
+    from operational_functions.world_snapshot import world_version as snapshot_version
+    return snapshot_version()
+
+
+def costs_version() -> str:
+    from main.versioning import DATA_VERSION, get_version
+    return f'{world_version()}-{get_version(DATA_VERSION)}'
+
+
+def _distance_rows(lats: np.ndarray, lons: np.ndarray, start: int, stop: int) -> np.ndarray:
+    from operational_functions.routes_utils import compute_distances_vectorized_numpy
+    return compute_distances_vectorized_numpy(
+        lats[start:stop, np.newaxis], lons[start:stop, np.newaxis], lats[np.newaxis, :], lons[np.newaxis, :],
+    )
+
+
+def build_world(directory: str) -> Dict[str, Any]:
+    from operational_functions.world_snapshot import load_world
+
+    world = load_world()
+    codes = sorted(world.airports)
+    airports = [world.airports[code] for code in codes]
+    _save(directory, 'airport_codes', np.array(codes, dtype=f'<U{max(map(len, codes), default=1)}'))
+    _save(directory, 'airport_ids', np.array([airport.id for airport in airports], dtype=np.int32))
+
+    lats = np.array([np.nan if a.latitude is None else a.latitude for a in airports], dtype=np.float64)
+    lons = np.array([np.nan if a.longitude is None else a.longitude for a in airports], dtype=np.float64)
+    # Written block by block straight into the file
+    distances = np.lib.format.open_memmap(
+        os.path.join(directory, 'distances.npy'), mode='w+', dtype=np.float32, shape=(len(codes), len(codes)),
+    )
+    for start in range(0, len(codes), DISTANCE_BLOCK_ROWS):
+        stop = min(start + DISTANCE_BLOCK_ROWS, len(codes))
+        distances[start:stop] = _distance_rows(lats, lons, start, stop)
+    np.fill_diagonal(distances, 0)
+    distances.flush()
+    del distances
+
+    aircraft = sorted(world.aircraft.values(), key=lambda ac: ac.id)
+    _save(directory, 'aircraft_ids', np.array([ac.id for ac in aircraft], dtype=np.int32))
+    _save(directory, 'provider_ids', np.array([p.id for p in world.providers], dtype=np.int32))
+    return {
+        'arrays': ['airport_codes', 'airport_ids', 'distances', 'aircraft_ids', 'provider_ids'],
+        'aircraft': [[ac.id, ac.short_name] for ac in aircraft],
+        'providers': [[p.id, p.name, p.aircraft_id, p.service_type] for p in world.providers],
+    }
+
+
+def costs_set_name(aircraft_id: Optional[int] = None) -> str:
+    return 'costs' if aircraft_id is None else f'costs_aircraft_{aircraft_id}'
+
+
+def build_costs(directory: str, world: MatrixSet, aircraft_id: Optional[int] = None) -> Dict[str, Any]:
+    from django.db.models import FloatField, Min
+    from django.db.models.functions import Cast
+    from main.models import Route
+
+    index = {code: position for position, code in enumerate(world['airport_codes'].tolist())}
+    size = len(index)
+    min_cost = np.full((len(SERVICE_TYPES), size, size), np.nan, dtype=np.float32)
+    routes = Route.objects.order_by()
+    if aircraft_id is not None:
+        routes = routes.filter(aircraft_type_id=aircraft_id)
+    rows = (
+        routes
+        .values('leg', 'service_type')
+        .annotate(cost=Min(Cast('total_flight_cost', FloatField())))
+        .values_list('leg', 'service_type', 'cost')
+    )
+    service_codes = {service: code for code, service in enumerate(SERVICE_TYPES)}
+    layers, origins, destinations, costs = [], [], [], []
+    for leg, service_type, cost in rows.iterator(chunk_size=20000):
+        from_iata, _, to_iata = leg.partition(' - ')
+        origin = index.get(from_iata)
+        destination = index.get(to_iata)
+        layer = service_codes.get(service_type)
+        if origin is None or destination is None or layer is None or cost is None:
+            continue
+        layers.append(layer)
+        origins.append(origin)
+        destinations.append(destination)
+        costs.append(cost)
+    if costs:
+        min_cost[layers, origins, destinations] = costs
+    _save(directory, 'min_cost', min_cost)
+    return {
+        'arrays': ['min_cost'],
+        'world_version': world.version,
+        'service_types': list(SERVICE_TYPES),
+        'aircraft_id': aircraft_id,
+    }
+
+
+# -----------------------------------------------------------------------------
+# Per-process attachment
+# -----------------------------------------------------------------------------
+
+def attach_or_build(name: str, version: str, build: Callable[[str], Dict[str, Any]]) -> MatrixSet:
+    """The published set for ``version``, building it first if no process has."""
+    from operational_functions.single_flight import file_lock
+
+    matrix_set = attach(name, version)
+    if matrix_set is not None:
+        return matrix_set
+    with file_lock(f'matrices:{name}'):
+        matrix_set = attach(name, version)
+        if matrix_set is None:
+            publish(name, version, build)
+            matrix_set = attach(name, version)
+    return matrix_set
+
+
+class SharedMatrices:
+    """Process-wide attachments to the current matrix sets, reattached on version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sets: Dict[str, MatrixSet] = {}
+        self._airport_index: Tuple[Optional[str], Dict[str, int]] = (None, {})
+
+    def _get(self, name: str, version: str, build: Callable[[str], Dict[str, Any]]) -> MatrixSet:
+        matrix_set = self._sets.get(name)
+        if matrix_set is not None and matrix_set.version == version:
+            return matrix_set
+        with self._lock:
+            matrix_set = self._sets.get(name)
+            if matrix_set is None or matrix_set.version != version:
+                matrix_set = self._sets[name] = attach_or_build(name, version, build)
+            return matrix_set
+
+    def world(self) -> MatrixSet:
+        return self._get('world', world_version(), build_world)
+
+    def costs(self, aircraft_id: Optional[int] = None) -> MatrixSet:
+        world = self.world()
+        return self._get(
+            costs_set_name(aircraft_id), costs_version(), lambda directory: build_costs(directory, world, aircraft_id),
+        )
+
+    def airport_index(self, world: Optional[MatrixSet] = None) -> Dict[str, int]:
+        """IATA code -> position in the world matrices."""
+        world = world or self.world()
+        version, index = self._airport_index
+        if version != world.version:
+            index = {code: position for position, code in enumerate(world['airport_codes'].tolist())}
+            self._airport_index = (world.version, index)
+        return index
+
+    def distance(self, from_iata: str, to_iata: str) -> Optional[float]:
+        world = self.world()
+        index = self.airport_index(world)
+        if from_iata not in index or to_iata not in index:
+            return None
+        value = float(world['distances'][index[from_iata], index[to_iata]])
+        return None if np.isnan(value) else value
+
+    def min_cost(self, from_iata: str, to_iata: str, service_type: str) -> Optional[float]:
+        """Cheapest total_flight_cost on the leg for the service type, or None without a route."""
+        costs = self.costs()
+        index = self.airport_index()
+        if from_iata not in index or to_iata not in index or service_type not in SERVICE_TYPES:
+            return None
+        value = float(costs['min_cost'][SERVICE_TYPES.index(service_type), index[from_iata], index[to_iata]])
+        return None if np.isnan(value) else value
+
+    def attached(self) -> List[Dict[str, Any]]:
+        """The sets this process maps, without checking or attaching anything."""
+        return [
+            {'name': name, 'version': matrix_set.version, 'bytes': matrix_set.nbytes, 'path': matrix_set.path}
+            for name, matrix_set in sorted(self._sets.items())
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self._airport_index = (None, {})
+
+
+_matrices = SharedMatrices()
+
+
+def get_shared_matrices() -> SharedMatrices:
+    return _matrices
@@ -0,0 +1,110 @@
+"""
+Single-flight execution and named cross-process locks.
+
+SingleFlight de-duplicates concurrent calls within a process: the first
+caller for a key runs the function, callers arriving while it runs wait and
+receive the same result (or exception). file_lock() extends mutual exclusion
+to other worker processes with flock(2) on a per-name lock file, so work that
+must not run twice can check for its own results once it holds the lock.
+
+Settings:
+    SINGLE_FLIGHT_LOCK_DIR  Directory for lock files (default: <BASE_DIR>/.locks)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locks only
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self) -> Dict[Hashable, int]:
+        """Keys currently running, with the number of callers waiting on each."""
+        with self._lock:
+            return {key: call.waiters for key, call in self._calls.items()}
+
+
+def lock_dir() -> str:
+    from django.conf import settings
+    path = getattr(settings, 'SINGLE_FLIGHT_LOCK_DIR', None) or os.path.join(settings.BASE_DIR, '.locks')
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(name: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock named ``name`` across threads and processes.
+
+    Each acquisition opens its own file description, so flock() also excludes
+    other threads of this process. Without fcntl the lock is per process only.
+    """
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(name, threading.Lock())
+        with lock:
+            yield
+        return
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()[:16]
+    path = os.path.join(lock_dir(), f'{digest}.lock')
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,250 @@
+"""
+Deterministic synthetic world for profiling and benchmarking the route engine.
+
+Generates countries, airports, aircraft and charter providers with plausible
+values (coordinates clustered by region, mostly low-altitude airports with a
+tail of high-altitude ones, aircraft based on the freighter types we operate)
+and can materialize them in a throwaway test database so the whole pipeline,
+including Layer 1 loading and Layer 3 inserts, runs against them.
+"""
+
+from __future__ import annotations
+
+import random
+import string
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List
+
+from main.models import Aircraft, Airport, CharterProvider, Country
+
+KG_TO_LBS = 2.20462
+JET_A_LBS_PER_GAL = 6.7
+
+MAX_AIRPORTS = 26 ** 3  # unique 3-letter IATA codes
+
+# region -> (min lat, max lat, min lon, max lon)
+REGION_BOUNDS = {
+    'North America': (25.0, 50.0, -125.0, -70.0),
+    'Caribbean': (10.0, 26.0, -85.0, -60.0),
+    'South-Central America': (-40.0, 15.0, -80.0, -40.0),
+    'Western Europe': (36.0, 60.0, -10.0, 15.0),
+    'Eastern Europe': (42.0, 60.0, 15.0, 40.0),
+    'Africa': (-34.0, 32.0, -17.0, 45.0),
+    'Asia-Pacific': (-8.0, 45.0, 70.0, 140.0),
+    'Oceania': (-45.0, -10.0, 115.0, 178.0),
+}
+
+# (cumulative probability, min ft, max ft): most airports near sea level,
+# a tail in every payload-penalty band of get_payload_factor()
+ALTITUDE_BANDS = (
+    (0.80, 0, 1500),
+    (0.92, 1500, 5000),
+    (0.98, 5000, 9000),
+    (1.00, 9000, 13000),
+)
+
+# (manufacturer, model, short_name, mtow_kg, zero_fuel_kg, empty_weight_kg, max_payload_kg,
+#  fuel_capacity_gal, fuel_burn_gal, main deck, lower deck, cruise_speed,
+#  max_range_at_max_payload, max_range_with_max_fuel)
+AIRCRAFT_TEMPLATES = (
+    ('AIRBUS', 'A-321-P2F', 'A321F', 93500.0, 73799.57, 47500.25, 27000.0, 7930.0, 895.52, 14, 2, 470.0, 2384.0, 3144.0),
+    ('BOEING', '737-800BCF', 'B737-8F', 79015.88, 62731.9, 45812.88, 23949.71, 6875.0, 746.27, 12, 2, 470.0, 2388.0, 3343.0),
+    ('BOEING', '757-200F', 'B757F', 115666.19, 90718.58, 52557.81, 32753.94, 11276.0, 1268.66, 15, 2, 480.0, 2033.0, 3193.0),
+    ('BOEING', 'B-767-200-P2F', 'B767-200F', 159211.11, 117026.97, 80285.94, 42365.58, 18866.0, 1417.91, 16, 3, 480.0, 3613.0, 5300.0),
+    ('BOEING', 'B-767-300-P2F', 'B767-300F', 184612.31, 133809.91, 83143.58, 50802.41, 24149.0, 1567.16, 24, 3, 480.0, 4000.0, 6276.0),
+    ('BOEING', 'B-777-P2F', 'B777F', 347815.04, 249476.1, 144378.62, 102874.87, 47890.0, 2238.81, 27, 3, 480.0, 5834.0, 9164.0),
+)
+
+SYNTHETIC_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'synthetic-world',
+    }
+}
+
+
+@dataclass
+class SyntheticWorld:
+    """Unsaved model instances making up one synthetic dataset."""
+    seed: int
+    countries: List[Country]
+    airports: List[Airport]
+    aircraft: List[Aircraft]
+    providers: List[CharterProvider]
+
+
+def _iata_code(index: int) -> str:
+    letters = string.ascii_uppercase
+    return letters[index // 676] + letters[(index // 26) % 26] + letters[index % 26]
+
+
+def _altitude_ft(rng: random.Random) -> int:
+    draw = rng.random()
+    for cumulative, low, high in ALTITUDE_BANDS:
+        if draw <= cumulative:
+            return rng.randint(low, high)
+    return 0
+
+
+def generate_world(
+    n_airports: int = 100,
+    n_aircraft: int = 6,
+    n_providers: int = 12,
+    seed: int = 24,
+) -> SyntheticWorld:
+    """
+    Generate a synthetic world; the same arguments always give the same world.
+
+    Args:
+        n_airports: Number of airports (at most 17,576)
+        n_aircraft: Number of aircraft, cycling through AIRCRAFT_TEMPLATES
+        n_providers: Number of charter providers, split between charter and ACMI
+        seed: Random seed
+
+    Returns:
+        SyntheticWorld with unsaved instances (see populate_database)
+    """
+    if not 0 < n_airports <= MAX_AIRPORTS:
+        raise ValueError(f'n_airports must be between 1 and {MAX_AIRPORTS}')
+    rng = random.Random(seed)
+    regions = list(REGION_BOUNDS)
+
+    countries = []
+    for region_index, region in enumerate(regions):
+        for n in range(3):
+            code = f'{string.ascii_uppercase[region_index]}{string.ascii_uppercase[n]}'
+            countries.append(Country(
+                name=f'Synthetic {region} {n + 1}',
+                country_code=code,
+                currency='Synthetic dollar',
+                currency_code='SYD',
+                region=region,
+            ))
+
+    airports = []
+    for index in sorted(rng.sample(range(MAX_AIRPORTS), n_airports)):
+        country = rng.choice(countries)
+        min_lat, max_lat, min_lon, max_lon = REGION_BOUNDS[country.region]
+        code = _iata_code(index)
+        airports.append(Airport(
+            iata_code=code,
+            name=f'{code} Synthetic Airport',
+            city=f'{code} City',
+            country=country.name,
+            latitude=round(rng.uniform(min_lat, max_lat), 4),
+            longitude=round(rng.uniform(min_lon, max_lon), 4),
+            altitude_ft=_altitude_ft(rng),
+            fuel_cost_gl=round(rng.uniform(2.3, 4.5), 2),
+            cargo_handling_cost_kg=round(rng.uniform(0.05, 0.2), 2),
+            airport_fee=round(rng.uniform(0.01, 0.04), 3),
+            turnaround_cost=float(rng.choice((100, 150, 200, 250))),
+        ))
+
+    aircraft = []
+    for n in range(n_aircraft):
+        (manufacturer, model, short_name, mtow_kg, zero_fuel_kg, empty_weight_kg, max_payload_kg,
+         fuel_capacity_gal, fuel_burn_gal, main_deck, lower_deck, cruise_speed,
+         range_max_payload, range_max_fuel) = AIRCRAFT_TEMPLATES[n % len(AIRCRAFT_TEMPLATES)]
+        suffix = '' if n < len(AIRCRAFT_TEMPLATES) else f'-{n // len(AIRCRAFT_TEMPLATES)}'
+        aircraft.append(Aircraft(
+            aircraft_id=f'SYN{n + 1:04d}',
+            manufacturer=manufacturer,
+            model=model,
+            short_name=short_name + suffix,
+            mtow_kg=mtow_kg,
+            mtow_lbs=round(mtow_kg * KG_TO_LBS, 2),
+            zero_fuel_kg=zero_fuel_kg,
+            zero_fuel_lbs=round(zero_fuel_kg * KG_TO_LBS, 2),
+            empty_weight_kg=empty_weight_kg,
+            empty_weight_lbs=round(empty_weight_kg * KG_TO_LBS, 2),
+            max_payload_kg=max_payload_kg,
+            max_payload_lbs=round(max_payload_kg * KG_TO_LBS, 2),
+            fuel_capacity_gal=fuel_capacity_gal,
+            fuel_capacity_lbs=round(fuel_capacity_gal * JET_A_LBS_PER_GAL, 2),
+            fuel_burn_gal=fuel_burn_gal,
+            fuel_burn_lbs=round(fuel_burn_gal * JET_A_LBS_PER_GAL, 2),
+            cargo_positions_main_deck=main_deck,
+            cargo_positions_lower_deck=lower_deck,
+            cruise_speed=cruise_speed,
+            max_range_at_max_payload=range_max_payload,
+            max_range_with_max_fuel=range_max_fuel,
+        ))
+
+    providers = []
+    for n in range(n_providers):
+        service_type = 'charter' if n % 2 == 0 else 'acmi'
+        low, high = (8000, 25000) if service_type == 'charter' else (3000, 9000)
+        providers.append(CharterProvider(
+            name=f'Synthetic Cargo {n + 1}',
+            country=rng.choice(countries),
+            main_base=rng.choice(airports),
+            aircraft=aircraft[n % len(aircraft)],
+            block_hour_cost=rng.randrange(low, high, 500),
+            type=service_type,
+        ))
+
+    return SyntheticWorld(seed, countries, airports, aircraft, providers)
+
+
+def populate_database(world: SyntheticWorld) -> None:
+    """Bulk-insert a synthetic world into the current default database."""
+    Country.objects.bulk_create(world.countries)
+    Airport.objects.bulk_create(world.airports)
+    Aircraft.objects.bulk_create(world.aircraft)
+    for provider in world.providers:
+        # Re-assign so the FK ids pick up the primary keys set by bulk_create
+        provider.country = provider.country
+        provider.main_base = provider.main_base
+        provider.aircraft = provider.aircraft
+    CharterProvider.objects.bulk_create(world.providers)
+
+
+def _reset_route_storage() -> None:
+    """Forget route storage state tied to the previous settings and close its connections."""
+    from django.db import connections
+    from operational_functions import route_db, route_partitions
+
+    for connection in connections.all(initialized_only=True):
+        if route_db.is_route_connection(connection):
+            connection.close()
+    route_db._ensured.clear()
+    route_partitions._map_cache.clear()
+
+
+@contextmanager
+def synthetic_database(
+    n_airports: int = 100,
+    n_aircraft: int = 6,
+    n_providers: int = 12,
+    seed: int = 24,
+) -> Iterator[SyntheticWorld]:
+    """
+    Run a block against a fresh test database holding a synthetic world.
+
+    The real databases are never touched: blue/green route storage is turned
+    off, so Route rows live in the test database too, and world snapshots and
+    shared matrices go to a scratch directory. A private in-memory cache
+    replaces the configured one so no synthetic responses, run reports or
+    data versions leak into it. All of it is torn down on exit.
+    """
+    from django.conf import settings
+    from django.test.utils import override_settings, setup_databases, teardown_databases
+
+    route_database = {**getattr(settings, 'ROUTE_DATABASE', {}), 'ENABLED': False}
+    with tempfile.TemporaryDirectory(prefix='synthetic-world-') as scratch, override_settings(
+        CACHES=SYNTHETIC_CACHES,
+        ROUTE_DATABASE=route_database,
+        WORLD_SNAPSHOT_DIR=f'{scratch}/snapshots',
+        SHARED_MATRICES_DIR=f'{scratch}/matrices',
+    ):
+        _reset_route_storage()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            world = generate_world(n_airports, n_aircraft, n_providers, seed)
+            populate_database(world)
+            yield world
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            _reset_route_storage()
@@ -0,0 +1,200 @@
+"""
+Lightweight request tracing.
+
+A trace is a tree of timed spans. TracingMiddleware starts one for sampled
+requests; code anywhere below it (views, routes_utils layers via RunReport
+stages, entry points decorated with @traced) opens child spans with span().
+When no trace is active, span() yields a shared no-op span, so
+instrumentation costs next to nothing on unsampled requests.
+
+Finished traces go to an in-memory ring buffer (served by the debug traces
+endpoint) and, if settings.TRACING['JSONL_PATH'] is set, are appended to a
+JSONL file.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_TRACING = {
+    'SAMPLE_RATE': 0.0,
+    'BUFFER_SIZE': 200,
+    'JSONL_PATH': None,
+}
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'end', 'attributes')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def as_dict(self) -> Dict[str, Any]:
+        origin = self.trace.clock_start
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ms': (self.start - origin) * 1000,
+            'duration_ms': ((self.end or self.start) - self.start) * 1000,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.clock_start = time.perf_counter()
+        self.spans: List[Span] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        spans = sorted(self.spans, key=lambda s: s.start)
+        root = spans[0] if spans else None
+        return {
+            'trace_id': self.trace_id,
+            'started_at': self.started_at,
+            'name': root.name if root else None,
+            'duration_ms': root.as_dict()['duration_ms'] if root else 0.0,
+            'attributes': root.attributes if root else {},
+            'spans': [s.as_dict() for s in spans],
+        }
+
+
+def current_span():
+    """The active span, or the no-op span outside a sampled trace."""
+    return _current_span.get() or NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Open a child span of the active span; a no-op when nothing is being traced."""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.attributes['error'] = repr(exc)
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+        parent.trace.spans.append(child)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """Start a new trace with a root span and export it when the block exits."""
+    trace = Trace()
+    root = Span(trace, name, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as exc:
+        root.attributes['error'] = repr(exc)
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+        trace.spans.append(root)
+        export_trace(trace)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator wrapping a function call in a span named after the function."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# EXPORTERS
+# =============================================================================
+
+def tracing_settings() -> Dict[str, Any]:
+    from django.conf import settings
+    return {**DEFAULT_TRACING, **getattr(settings, 'TRACING', {})}
+
+
+class RingBufferExporter:
+    """Keeps the most recent traces in memory (per process)."""
+
+    def __init__(self, size: int):
+        self._traces: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def export(self, trace: Dict[str, Any]) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._traces))
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for trace in self._traces:
+                if trace['trace_id'] == trace_id:
+                    return trace
+        return None
+
+
+_ring_buffer: Optional[RingBufferExporter] = None
+_jsonl_lock = threading.Lock()
+
+
+def ring_buffer() -> RingBufferExporter:
+    global _ring_buffer
+    if _ring_buffer is None:
+        _ring_buffer = RingBufferExporter(tracing_settings()['BUFFER_SIZE'])
+    return _ring_buffer
+
+
+def export_trace(trace: Trace) -> None:
+    data = trace.as_dict()
+    ring_buffer().export(data)
+    path = tracing_settings()['JSONL_PATH']
+    if path:
+        line = json.dumps(data, default=str)
+        with _jsonl_lock:
+            with open(path, 'a', encoding='utf-8') as fh:
+                fh.write(line + '\n')
@@ -0,0 +1,181 @@
+"""
+Versioned binary snapshots of the route pipeline's Layer 1 data.
+
+A snapshot holds the airport, aircraft and provider rows read by the
+routes_utils loaders, stored column-wise (one list per field) in a single
+pickle file named after the data versions it was built from. CLI runs and
+worker processes call load_world() to start from the snapshot for the
+current versions instead of re-reading the database; any save or delete of
+an Airport, Aircraft or CharterProvider bumps its version (main.signals), so
+the next load misses and writes a fresh snapshot. Writes that bypass the
+signals (raw SQL, bulk_create) must call bump_version themselves.
+
+Settings:
+    WORLD_SNAPSHOT_DIR  Directory for snapshot files (default: <BASE_DIR>/.snapshots)
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from main.versioning import get_version
+from operational_functions.routes_utils import (
+    AIRCRAFT_COLUMNS,
+    AIRPORT_COLUMNS,
+    PROVIDER_COLUMNS,
+    AircraftData,
+    AirportData,
+    ProviderData,
+    aircraft_from_rows,
+    airports_from_rows,
+    load_aircraft_rows,
+    load_airport_rows,
+    load_provider_rows,
+    providers_from_rows,
+)
+
+SNAPSHOT_FORMAT = 1
+
+# Version counters (model names, see main.signals) a snapshot depends on.
+SNAPSHOT_VERSIONS = ('airport', 'aircraft', 'charterprovider')
+
+# Snapshots kept per directory; older ones are removed after each write.
+KEEP_SNAPSHOTS = 3
+
+_TABLES = (
+    ('airports', AIRPORT_COLUMNS),
+    ('aircraft', AIRCRAFT_COLUMNS),
+    ('providers', PROVIDER_COLUMNS),
+)
+
+
+@dataclass
+class World:
+    """Layer 1 data, as returned by load_all_data()."""
+    version: str
+    airports: Dict[str, AirportData]
+    aircraft: Dict[int, AircraftData]
+    providers: List[ProviderData]
+    providers_by_aircraft: Dict[int, List[ProviderData]]
+    from_snapshot: bool = False
+
+    @classmethod
+    def from_rows(cls, version: str, rows: Dict[str, List[Tuple]], from_snapshot: bool = False) -> 'World':
+        providers, providers_by_aircraft = providers_from_rows(rows['providers'])
+        return cls(
+            version=version,
+            airports=airports_from_rows(rows['airports']),
+            aircraft=aircraft_from_rows(rows['aircraft']),
+            providers=providers,
+            providers_by_aircraft=providers_by_aircraft,
+            from_snapshot=from_snapshot,
+        )
+
+
+def snapshot_dir() -> str:
+    from django.conf import settings
+    path = getattr(settings, 'WORLD_SNAPSHOT_DIR', None) or os.path.join(settings.BASE_DIR, '.snapshots')
+    os.makedirs(path, exist_ok=True)
+    return str(path)
+
+
+def world_version() -> str:
+    """Key of the current Layer 1 data: its per-model version counters."""
+    return '-'.join(str(get_version(name)) for name in SNAPSHOT_VERSIONS)
+
+
+def snapshot_path(version: str) -> str:
+    return os.path.join(snapshot_dir(), f'world-{version}.pickle')
+
+
+def read_rows() -> Dict[str, List[Tuple]]:
+    return {
+        'airports': load_airport_rows(),
+        'aircraft': load_aircraft_rows(),
+        'providers': load_provider_rows(),
+    }
+
+
+def write_snapshot(version: str, rows: Dict[str, List[Tuple]]) -> str:
+    """Atomically write the rows as the snapshot for ``version``; returns its path."""
+    payload = {'format': SNAPSHOT_FORMAT, 'version': version}
+    for table, columns in _TABLES:
+        payload[table] = {
+            'columns': columns,
+            'data': [list(column) for column in zip(*rows[table])] or [[] for _ in columns],
+        }
+    path = snapshot_path(version)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            pickle.dump(payload, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    prune_snapshots()
+    return path
+
+
+def read_snapshot(version: str) -> Optional[Dict[str, List[Tuple]]]:
+    """Rows stored for ``version``, or None if there is no usable snapshot."""
+    try:
+        with open(snapshot_path(version), 'rb') as fh:
+            payload = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    # A payload of the wrong shape (another writer, a format change without a
+    # SNAPSHOT_FORMAT bump) is a miss too: the caller rewrites the file.
+    try:
+        if payload.get('format') != SNAPSHOT_FORMAT or payload.get('version') != version:
+            return None
+        rows = {}
+        for table, columns in _TABLES:
+            stored = payload.get(table)
+            if stored is None or tuple(stored['columns']) != columns:
+                return None
+            rows[table] = list(zip(*stored['data']))
+    except (KeyError, TypeError, AttributeError):
+        return None
+    return rows
+
+
+def prune_snapshots(keep: int = KEEP_SNAPSHOTS) -> None:
+    directory = snapshot_dir()
+    entries = []
+    for name in os.listdir(directory):
+        if name.startswith('world-') and name.endswith('.pickle'):
+            path = os.path.join(directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                continue
+    for _, path in sorted(entries, reverse=True)[keep:]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def load_world(use_snapshot: bool = True) -> World:
+    """
+    Layer 1 data for the current data version.
+
+    Reads the snapshot for the current version if there is one; otherwise
+    reads the database and (with ``use_snapshot``) writes the snapshot.
+    """
+    version = world_version()
+    if use_snapshot:
+        rows = read_snapshot(version)
+        if rows is not None:
+            return World.from_rows(version, rows, from_snapshot=True)
+    rows = read_rows()
+    if use_snapshot:
+        write_snapshot(version, rows)
+    return World.from_rows(version, rows)